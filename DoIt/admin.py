@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from DoIt.models import List, Task
+from DoIt.models import Job, List, Task
 
 
 class TaskInLine(admin.StackedInline):
@@ -17,8 +17,17 @@ class ListAdmin(admin.ModelAdmin):
         (None, {'fields': ['name', 'user']}),
     ]
     inlines = [TaskInLine]
-    list_display = ('name', 'user')
+    list_display = ('name', 'user', 'open_task_count', 'done_task_count', 'remaining_minutes')
     search_fields = ['name']
 
 
 admin.site.register(List, ListAdmin)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'user', 'status', 'progress', 'total', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('started_at', 'finished_at')
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,202 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import PermissionDenied
+from django.forms.models import model_to_dict
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.views import generic
+
+from DoIt.async_views import aget_object_or_404, aload_user
+from DoIt.forms import ListForm, TaskForm
+from DoIt.jobs import delete_or_enqueue
+from DoIt.models import List, Task
+from DoIt.pagination import InvalidCursor, KeysetPaginator, get_page_size
+from DoIt.views import ListTasksView
+
+LIST_FIELDS = ('id', 'name', 'open_task_count', 'done_task_count', 'remaining_minutes')
+TASK_FIELDS = ('id', 'list') + TaskForm.Meta.fields
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super(ApiError, self).__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class ApiView(generic.View):
+    """
+    Base of the JSON API views. Requests are authenticated by the session,
+    objects are only looked up among the ones of the user (the for_user()
+    queryset of `model` unless aget_queryset() is overridden), and GET responses
+    carry an ETag so unchanged content is answered with 304. The views are
+    async: reads use the async ORM, writes run the forms in a thread.
+    """
+    model = None
+    fields = ()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if not (await aload_user(request)).is_authenticated:
+                raise ApiError(403, 'Authentication required')
+            return await super(ApiView, self).dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'detail': error.detail}, status=error.status)
+        except Http404:
+            return JsonResponse({'detail': 'Not found'}, status=404)
+        except PermissionDenied:
+            return JsonResponse({'detail': 'Permission denied'}, status=403)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        raise ApiError(405, 'Method not allowed')
+
+    async def aget_queryset(self):
+        return self.model.objects.for_user(self.request.user)
+
+    def get_fields(self):
+        """
+        Fields asked for with ?fields=a,b, all of them by default
+        """
+        if not self.request.GET.get('fields'):
+            return self.fields
+        fields = tuple(dict.fromkeys(field for field in self.request.GET['fields'].split(',') if field))
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise ApiError(400, 'Unknown fields: ' + ', '.join(sorted(unknown)))
+        return fields
+
+    def get_data(self):
+        try:
+            data = json.loads(self.request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Invalid JSON body')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'The JSON body must be an object')
+        return data
+
+    def respond(self, data, status=200):
+        response = JsonResponse(data, status=status)
+        if self.request.method in ('GET', 'HEAD'):
+            set_response_etag(response)
+            return get_conditional_response(self.request, etag=response['ETag'], response=response)
+        return response
+
+
+class ApiCollectionView(ApiView):
+    """
+    Lists the objects of `aget_queryset()` a page at a time with the keyset
+    cursor of the list tasks page, creates new ones on POST.
+    """
+    ordering = ('id',)
+    form_class = None
+
+    async def get(self, request, *args, **kwargs):
+        fields = self.get_fields()
+        # the ordering fields are selected too, the cursor is built from them
+        columns = dict.fromkeys(fields + tuple(name.lstrip('-') for name in self.ordering))
+        per_page = get_page_size(request, ListTasksView.paginate_by, ListTasksView.max_paginate_by)
+        paginator = KeysetPaginator((await self.aget_queryset()).values(*columns), self.ordering, per_page)
+        try:
+            page = await paginator.apage(request.GET.get('after'))
+        except InvalidCursor:
+            raise ApiError(400, 'Invalid cursor')
+        return self.respond({
+            'results': [{field: row[field] for field in fields} for row in page],
+            'next': page.next_cursor,
+        })
+
+    async def aprepare(self, instance):
+        pass
+
+    async def post(self, request, *args, **kwargs):
+        form = self.form_class(data=self.get_data())
+        await self.aprepare(form.instance)
+        return await sync_to_async(self.create)(form)
+
+    def create(self, form):
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+        return self.respond(serialize(form.save(), self.fields), status=201)
+
+
+class ApiObjectView(ApiView):
+    """
+    Retrieve (GET), replace (PUT), partially update (PATCH) or delete one object
+    """
+    form_class = None
+
+    async def aget_object(self):
+        return await aget_object_or_404(await self.aget_queryset(), pk=self.kwargs['pk'])
+
+    async def get(self, request, *args, **kwargs):
+        return self.respond(serialize(await self.aget_object(), self.get_fields()))
+
+    def save(self, obj, data):
+        form = self.form_class(data=data, instance=obj)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+        return self.respond(serialize(form.save(), self.fields))
+
+    async def put(self, request, *args, **kwargs):
+        return await sync_to_async(self.save)(await self.aget_object(), self.get_data())
+
+    async def patch(self, request, *args, **kwargs):
+        obj = await self.aget_object()
+        data = model_to_dict(obj, fields=self.form_class.Meta.fields)
+        data.update(self.get_data())
+        return await sync_to_async(self.save)(obj, data)
+
+    async def delete(self, request, *args, **kwargs):
+        await sync_to_async((await self.aget_object()).delete)()
+        return HttpResponse(status=204)
+
+
+def serialize(obj, fields):
+    return {field: obj.list_id if field == 'list' else getattr(obj, field) for field in fields}
+
+
+class ApiListsView(ApiCollectionView):
+    model = List
+    fields = LIST_FIELDS
+    form_class = ListForm
+
+    async def aprepare(self, instance):
+        instance.user = self.request.user
+
+
+class ApiListView(ApiObjectView):
+    model = List
+    fields = LIST_FIELDS
+    form_class = ListForm
+
+    async def delete(self, request, *args, **kwargs):
+        # big lists are deleted by a background job, like from the list delete page
+        job = await sync_to_async(delete_or_enqueue)(request.user, await self.aget_object())
+        if job is None:
+            return HttpResponse(status=204)
+        return JsonResponse({'detail': 'The list is being deleted', 'job': job.id}, status=202)
+
+
+class ApiListTasksView(ApiCollectionView):
+    model = Task
+    fields = TASK_FIELDS
+    form_class = TaskForm
+    ordering = ListTasksView.keyset_ordering
+
+    async def aget_task_list(self):
+        return await aget_object_or_404(List.objects.for_user(self.request.user), pk=self.kwargs['pk'])
+
+    async def aget_queryset(self):
+        return Task.objects.filter(list=await self.aget_task_list())
+
+    async def aprepare(self, instance):
+        # the position to add the task at is read with the list
+        instance.list = await aget_object_or_404(List.objects.for_user(self.request.user).with_last_position(),
+                                                 pk=self.kwargs['pk'])
+
+
+class ApiTaskView(ApiObjectView):
+    model = Task
+    fields = TASK_FIELDS
+    form_class = TaskForm
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DoitConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'DoIt'
+
+    def ready(self):
+        from DoIt import page_cache  # noqa: F401 connects the cache invalidation receivers
+        from DoIt import sqlite  # noqa: F401 connects the SQLite tuning receiver
+        from DoIt import profiling  # noqa: F401 connects the query recorder of the request profiles
+        from DoIt import metrics  # noqa: F401 connects the query counter of the metrics
@@ -0,0 +1,59 @@
+"""
+Async versions of the generic views, for the read pages. Under ASGI they
+run on the event loop and read the database with the async ORM, instead of
+taking a thread for the whole request; under WSGI Django runs them in an
+event loop of their own.
+
+The template is rendered after get() returns, in a thread, so everything the
+page shows should be read in get() first, with the async ORM.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import generic
+
+
+async def aload_user(request):
+    """
+    Resolve the lazy request.user, which reads the session and the user from
+    the database, in a thread. The user and the session (so the messages kept
+    in it) can be used afterwards without queries.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404('No %s matches the given query.' % queryset.model._meta.object_name)
+
+
+class AsyncViewMixin:
+    async def dispatch(self, request, *args, **kwargs):
+        await aload_user(request)
+        return await super(AsyncViewMixin, self).dispatch(request, *args, **kwargs)
+
+
+class AsyncListView(AsyncViewMixin, generic.ListView):
+    """
+    ListView reading the objects with the async ORM in aload(), which views
+    paginating or showing more than the objects override.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        await self.aload()
+        return self.render_to_response(self.get_context_data())
+
+    async def aload(self):
+        self.object_list = [obj async for obj in self.object_list]
+
+
+class AsyncDetailView(AsyncViewMixin, generic.DetailView):
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    async def aget_object(self):
+        return await aget_object_or_404(self.get_queryset(), pk=self.kwargs[self.pk_url_kwarg])
@@ -0,0 +1,17 @@
+"""
+The SQLite backend, starting transactions with `BEGIN <DOIT_SQLITE_BEGIN>`.
+
+With the default deferred BEGIN a transaction that reads before it writes,
+like saving a task whose search index trigger reads the index first, has to
+upgrade its read lock. In WAL mode that fails at once with "database is
+locked" if another connection committed in between, the busy timeout doesn't
+help. BEGIN IMMEDIATE takes the write lock up front, so writers queue on the
+busy timeout instead.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN %s' % settings.DOIT_SQLITE_BEGIN)
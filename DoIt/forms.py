@@ -0,0 +1,214 @@
+from django import forms
+from django.db.models import F, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from DoIt.models import List, Task
+
+
+class ListForm(forms.ModelForm):
+    class Meta:
+        model = List
+        fields = ('name',)
+
+
+class TaskForm(forms.ModelForm):
+    class Meta:
+        model = Task
+        fields = ('name', 'description', 'is_done', 'start_date', 'end_date', 'time_it_takes', 'is_important',
+                  'repeat', 'repeat_every', 'repeat_until')
+        widgets = {
+            'start_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'end_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'repeat_until': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        }
+
+
+class TaskImportForm(forms.Form):
+    FORMATS = (
+        ('csv', 'CSV with a header row'),
+        ('jsonl', 'JSON Lines, one task object per line'),
+    )
+
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=FORMATS, required=False,
+                               help_text='Guessed from the file extension when empty')
+
+    def clean(self):
+        cleaned_data = super(TaskImportForm, self).clean()
+        upload = cleaned_data.get('file')
+        if upload and not cleaned_data.get('format'):
+            extension = upload.name.rsplit('.', 1)[-1].lower()
+            if extension not in dict(self.FORMATS):
+                raise forms.ValidationError('Choose the format of the file')
+            cleaned_data['format'] = extension
+        return cleaned_data
+
+
+class MultipleIdField(forms.Field):
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(item) for item in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Invalid task selection')
+
+
+class TaskBulkActionForm(forms.Form):
+    ACTIONS = (
+        ('done', 'Mark as done'),
+        ('undone', 'Mark as not done'),
+        ('important', 'Mark as important'),
+        ('not_important', 'Mark as not important'),
+        ('move', 'Move to list'),
+        ('delete', 'Delete'),
+    )
+    UPDATES = {
+        'done': {'is_done': True},
+        'undone': {'is_done': False},
+        'important': {'is_important': True},
+        'not_important': {'is_important': False},
+    }
+
+    tasks = MultipleIdField()
+    action = forms.ChoiceField(choices=ACTIONS, widget=forms.Select(attrs={'class': 'form-select m-1'}))
+    target = forms.ModelChoiceField(queryset=List.objects.none(), required=False, empty_label='Move to list',
+                                    widget=forms.Select(attrs={'class': 'form-select m-1'}))
+
+    def __init__(self, user, *args, **kwargs):
+        super(TaskBulkActionForm, self).__init__(*args, **kwargs)
+        self.fields['target'].queryset = List.objects.for_user(user).only('id', 'name')
+
+    def clean(self):
+        cleaned_data = super(TaskBulkActionForm, self).clean()
+        if cleaned_data.get('action') == 'move' and not cleaned_data.get('target'):
+            self.add_error('target', 'Choose the list to move the tasks to')
+        return cleaned_data
+
+    def apply(self, tasks):
+        """
+        Apply the action to the selected tasks among `tasks` in a single
+        UPDATE or DELETE and return how many tasks were changed.
+        """
+        tasks = tasks.filter(id__in=self.cleaned_data['tasks'])
+        action = self.cleaned_data['action']
+        if action == 'delete':
+            return tasks.delete()[0]
+        if action == 'move':
+            # added after the last task of the list, in the order they had
+            target = self.cleaned_data['target']
+            last = Task.objects.filter(list=target).order_by('-position').values('position')[:1]
+            return tasks.exclude(list=target).update(
+                list=target, position=F('position') + Coalesce(Subquery(last), 0))
+        return tasks.update(**self.UPDATES[action])
+
+
+class TaskMoveForm(forms.Form):
+    """
+    Where a task was dropped in the order of its list: right after the task
+    `after`, right before the task `before`, or first without either.
+    """
+    after = forms.ModelChoiceField(queryset=Task.objects.none(), required=False, widget=forms.HiddenInput)
+    before = forms.ModelChoiceField(queryset=Task.objects.none(), required=False, widget=forms.HiddenInput)
+
+    def __init__(self, task, *args, **kwargs):
+        super(TaskMoveForm, self).__init__(*args, **kwargs)
+        neighbours = Task.objects.filter(list=task.list_id).exclude(pk=task.pk).only('id', 'position')
+        self.fields['after'].queryset = self.fields['before'].queryset = neighbours
+
+    def clean(self):
+        cleaned_data = super(TaskMoveForm, self).clean()
+        if cleaned_data.get('after') and cleaned_data.get('before'):
+            raise forms.ValidationError('Move the task after a task or before one, not both')
+        return cleaned_data
+
+
+class TaskFilterForm(forms.Form):
+    """
+    Filters and sort key of the tasks of a list, read from the query string.
+    Only the whitelisted sorts below are accepted, each one is backed by an
+    index starting with the list and ends with the id so it can be used for
+    keyset pagination. Fields with invalid values are left out of the filter.
+    """
+    SORTS = (
+        ('important', 'Important first'),
+        ('end_date', 'End date'),
+        ('-end_date', 'End date, latest first'),
+        ('start_date', 'Start date'),
+        ('-start_date', 'Start date, latest first'),
+        ('time', 'Shortest first'),
+        ('-time', 'Longest first'),
+        ('position', 'My order'),
+    )
+    ORDERINGS = {
+        'important': ('-is_important', 'id'),
+        'end_date': ('end_date', 'id'),
+        '-end_date': ('-end_date', '-id'),
+        'start_date': ('start_date', 'id'),
+        '-start_date': ('-start_date', '-id'),
+        'time': ('time_it_takes', 'id'),
+        '-time': ('-time_it_takes', '-id'),
+        'position': ('position', 'id'),
+    }
+    STATUSES = (
+        ('', 'Done or not'),
+        ('done', 'Done'),
+        ('undone', 'Not done'),
+    )
+    IMPORTANCES = (
+        ('', 'Important or not'),
+        ('yes', 'Important'),
+        ('no', 'Not important'),
+    )
+    # form field: lookup of the task field, both ends are inclusive
+    RANGES = {
+        'start_from': 'start_date__gte',
+        'start_to': 'start_date__lte',
+        'end_from': 'end_date__gte',
+        'end_to': 'end_date__lte',
+        'min_time': 'time_it_takes__gte',
+        'max_time': 'time_it_takes__lte',
+    }
+
+    status = forms.ChoiceField(choices=STATUSES, required=False,
+                               widget=forms.Select(attrs={'class': 'form-select m-1'}))
+    important = forms.ChoiceField(choices=IMPORTANCES, required=False,
+                                  widget=forms.Select(attrs={'class': 'form-select m-1'}))
+    start_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control m-1',
+                                                                               'type': 'date'}))
+    start_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control m-1',
+                                                                             'type': 'date'}))
+    end_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control m-1',
+                                                                             'type': 'date'}))
+    end_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'class': 'form-control m-1',
+                                                                           'type': 'date'}))
+    min_time = forms.IntegerField(required=False, min_value=0,
+                                  widget=forms.NumberInput(attrs={'class': 'form-control m-1',
+                                                                  'placeholder': 'Min minutes'}))
+    max_time = forms.IntegerField(required=False, min_value=0,
+                                  widget=forms.NumberInput(attrs={'class': 'form-control m-1',
+                                                                  'placeholder': 'Max minutes'}))
+    sort = forms.ChoiceField(choices=SORTS, required=False,
+                             widget=forms.Select(attrs={'class': 'form-select m-1'}))
+
+    def filter(self, tasks):
+        """
+        Filter `tasks` with the valid fields of the form, which must be bound.
+        """
+        self.is_valid()
+        values = self.cleaned_data
+        tasks = tasks.filter(**{lookup: values[name] for name, lookup in self.RANGES.items()
+                                if values.get(name) is not None})
+        if values.get('status') == 'done':
+            tasks = tasks.filter(is_done=True)
+        elif values.get('status') == 'undone':
+            tasks = tasks.filter(Q(is_done=False) | Q(is_done__isnull=True))
+        if values.get('important') == 'yes':
+            tasks = tasks.filter(is_important=True)
+        elif values.get('important') == 'no':
+            tasks = tasks.filter(Q(is_important=False) | Q(is_important__isnull=True))
+        return tasks
+
+    def ordering(self):
+        self.is_valid()
+        return self.ORDERINGS[self.cleaned_data.get('sort') or 'important']
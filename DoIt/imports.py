@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+
+from django import forms
+from django.db import transaction
+
+from DoIt.forms import TaskForm
+from DoIt.models import Task
+
+# rows with errors kept in the result, the others are only counted
+MAX_ERRORS = 100
+# values of the yes or no columns, lowercased, as the form reads them
+BOOLEANS = {
+    '': '', 'true': 'true', 'false': 'false', '1': 'true', '0': 'false', 'yes': 'true', 'no': 'false',
+    'y': 'true', 'n': 'false', 't': 'true', 'f': 'false',
+}
+BOOLEAN_FIELDS = tuple(name for name, field in TaskForm.base_fields.items() if isinstance(field, forms.BooleanField))
+
+
+class ImportResult:
+    def __init__(self, created=0, errors=(), line=0, error_count=None):
+        self.created = created
+        self.errors = list(errors)
+        # rows with errors, the ones not kept in `errors` included
+        self.error_count = len(self.errors) if error_count is None else error_count
+        # last line of the file whose tasks are inserted
+        self.line = line
+
+    def __str__(self):
+        return '%d task%s imported, %d row%s with errors' % (
+            self.created, '' if self.created == 1 else 's', self.error_count, '' if self.error_count == 1 else 's')
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, errors))
+
+
+def read_row(row):
+    """
+    The form data of `row`, with the yes or no columns written as true/false,
+    1/0, yes/no, y/n or t/f made readable by the form, and the errors of the
+    ones that are none of them.
+    """
+    data = {key: '' if value is None else value for key, value in row.items()}
+    errors = {}
+    for name in BOOLEAN_FIELDS:
+        value = data.get(name, '')
+        if isinstance(value, bool):
+            continue
+        data[name] = BOOLEANS.get(str(value).strip().lower())
+        if data[name] is None:
+            errors[name] = ['%r is not a yes or no value, use true or false' % value]
+            data[name] = ''
+    return data, errors
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def read_jsonl(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, None, 'Invalid JSON: ' + str(error)
+            continue
+        if not isinstance(row, dict):
+            yield number, None, 'Each line must be a JSON object'
+            continue
+        yield number, row, None
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def import_tasks(lst, stream, file_format, batch_size=500, progress=None, resume=None):
+    """
+    Validate every row of `stream` (a binary file) with the TaskForm rules and
+    insert the valid ones in `lst`, `batch_size` tasks per transaction. Rows
+    are read one at a time and invalid rows are reported in the result as
+    (line, {field: [messages]}) without stopping the import. `progress` is
+    called with the result after each batch, in the transaction inserting
+    it, so what it saves of the result matches the tasks inserted. Passing
+    such a saved result as `resume` goes on with an interrupted import after
+    the last line it inserted.
+    """
+    result = resume or ImportResult()
+    done = result.line
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    batch = []
+
+    def insert():
+        with transaction.atomic():
+            result.created += len(Task.objects.bulk_create(batch))
+            if progress:
+                progress(result)
+
+    try:
+        for line, row, error in READERS[file_format](lines):
+            if line <= done:
+                continue
+            result.line = line
+            if error:
+                result.add_error(line, {'__all__': [error]})
+                continue
+            data, errors = read_row(row)
+            form = TaskForm(data=data)
+            if not form.is_valid() or errors:
+                errors.update((field, list(messages)) for field, messages in form.errors.items())
+                result.add_error(line, errors)
+                continue
+            task = form.save(commit=False)
+            task.list = lst
+            batch.append(task)
+            if len(batch) >= batch_size:
+                insert()
+                batch = []
+    except UnicodeDecodeError:
+        result.add_error(None, {'__all__': ['The file must be UTF-8 encoded, the rest of it was skipped']})
+    except csv.Error as error:
+        result.add_error(None, {'__all__': ['Invalid CSV, the rest of the file was skipped: ' + str(error)]})
+    finally:
+        lines.detach()
+    if batch:
+        insert()
+    return result
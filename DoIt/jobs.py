@@ -0,0 +1,201 @@
+"""
+Database backed queue of the operations too slow to answer in a request:
+deleting big lists, importing big files, exporting and rebalancing the order
+of the tasks of a list in the background.
+Views enqueue a Job and redirect to its status page, and `manage.py run_jobs`
+runs the queued jobs in a bounded pool of threads, with no broker besides the
+database.
+
+A job kind is a function registered with @job_handler, which receives the
+claimed Job, may report its progress with job.set_progress() and returns the
+message shown when it's done. JobError fails the job with its message.
+"""
+import datetime
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.text import slugify
+
+from DoIt.exports import EXPORTERS
+from DoIt.imports import ImportResult, import_tasks
+from DoIt.models import Job, List
+
+HANDLERS = {}
+
+
+class JobError(Exception):
+    pass
+
+
+def job_handler(kind):
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+
+    return register
+
+
+def enqueue(user, kind, upload=None, **arguments):
+    """
+    Queue a job of `kind` for `user`. `upload` is a file the job reads, kept
+    in the job storage until the job has run.
+    """
+    if kind not in HANDLERS:
+        raise ValueError('Unknown job kind %s' % kind)
+    job = Job(user=user, kind=kind, arguments=arguments)
+    if upload is not None:
+        job.file.save(os.path.basename(upload.name), upload, save=False)
+    job.save()
+    return job
+
+
+def enqueue_once(user, kind, **arguments):
+    """
+    Queue a job of `kind` unless the same one is already waiting in the queue.
+    """
+    queued = Job.objects.filter(kind=kind, status=Job.QUEUED, arguments=arguments)
+    return queued.first() or enqueue(user, kind, **arguments)
+
+
+def run(job):
+    """
+    Run a claimed job and record how it ended. Unexpected errors fail the job
+    and are raised again for the worker to report.
+    """
+    try:
+        message = HANDLERS[job.kind](job)
+    except JobError as error:
+        finish(job, Job.FAILED, str(error))
+    except Exception:
+        finish(job, Job.FAILED, 'The job failed unexpectedly')
+        raise
+    else:
+        finish(job, Job.DONE, message)
+    return job
+
+
+def finish(job, status, message):
+    job.status = status
+    job.message = message[:400]
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'arguments', 'errors', 'file', 'progress', 'total', 'finished_at'])
+
+
+def requeue_lost():
+    """
+    Jobs still running after DOIT_JOB_TIMEOUT seconds lost their worker: they
+    are queued again, or failed once they were tried DOIT_JOB_ATTEMPTS times.
+    Returns the numbers of jobs queued again and failed.
+    """
+    now = timezone.now()
+    lost = Job.objects.filter(status=Job.RUNNING,
+                              started_at__lt=now - datetime.timedelta(seconds=settings.DOIT_JOB_TIMEOUT))
+    failed = lost.filter(attempts__gte=settings.DOIT_JOB_ATTEMPTS).update(
+        status=Job.FAILED, message='The job was interrupted too many times', finished_at=now)
+    return lost.update(status=Job.QUEUED), failed
+
+
+def delete_expired_exports():
+    """
+    Delete the files of the exports finished more than
+    DOIT_EXPORT_KEEP_SECONDS ago. Returns the number of files deleted.
+    """
+    expired = Job.objects.filter(kind='export', finished_at__lt=timezone.now() - datetime.timedelta(
+        seconds=settings.DOIT_EXPORT_KEEP_SECONDS)).exclude(file='')
+    found = list(expired.only('id', 'file'))
+    for job in found:
+        job.file.delete(save=False)
+    Job.objects.filter(pk__in=[job.pk for job in found]).update(file='')
+    return len(found)
+
+
+def delete_or_enqueue(user, lst):
+    """
+    Delete `lst` now, in chunks, or queue a job deleting it when it has
+    DOIT_JOB_DELETE_TASKS tasks or more. Returns the job, None when the list
+    is already deleted.
+    """
+    if lst.open_task_count + lst.done_task_count < settings.DOIT_JOB_DELETE_TASKS:
+        lst.delete_in_chunks()
+        return None
+    return enqueue(user, 'delete_list', list=lst.id)
+
+
+def get_list(job):
+    lst = List.objects.for_user(job.user).filter(pk=job.arguments['list']).first()
+    if lst is None:
+        raise JobError('The list was deleted')
+    return lst
+
+
+@job_handler('delete_list')
+def delete_list(job):
+    lst = List.objects.for_user(job.user).filter(pk=job.arguments['list']).first()
+    if lst is None:
+        return 'The list was already deleted'
+    job.set_progress(0, lst.open_task_count + lst.done_task_count)
+    job.progress = lst.delete_in_chunks(progress=job.set_progress)
+    return 'List %s deleted' % lst.name
+
+
+@job_handler('rebalance_list')
+def rebalance_list(job):
+    lst = get_list(job)
+    count = lst.rebalance_positions()
+    return 'Order of the %d task%s of %s spread out again' % (count, '' if count == 1 else 's', lst.name)
+
+
+@job_handler('export')
+def export(job):
+    """
+    Export all the lists of the user, or the one in arguments['list'], to a
+    file kept on the job.
+    """
+    lists = List.objects.for_user(job.user)
+    name = 'tasks'
+    if job.arguments.get('list'):
+        lst = get_list(job)
+        lists = lists.filter(pk=lst.pk)
+        name = slugify(lst.name) or 'list'
+    file_format = job.arguments['format']
+    counters = lists.aggregate(open=Sum('open_task_count'), done=Sum('done_task_count'))
+    job.set_progress(0, (counters['open'] or 0) + (counters['done'] or 0))
+    # no progress is written while the rows are read: SQLite refuses at once a
+    # write on a connection whose read cursor is older than a commit of another
+    # connection, busy_timeout doesn't wait for those
+    with tempfile.TemporaryFile() as output:
+        for chunk in EXPORTERS[file_format][0](lists):
+            output.write(chunk.encode())
+        job.arguments['filename'] = '%s.%s' % (name, file_format)
+        job.file.save(job.arguments['filename'], File(output), save=False)
+    job.progress = job.total
+    return '%d task%s exported' % (job.total, '' if job.total == 1 else 's')
+
+
+@job_handler('import')
+def import_file(job):
+    """
+    Import the uploaded file in the list. The result so far is saved on the
+    job with each batch of tasks, so an import interrupted and run again
+    goes on after the last batch inserted instead of inserting it twice.
+    """
+    lst = get_list(job)
+    resume = ImportResult(job.progress, job.errors, job.arguments.get('line', 0), job.arguments.get('error_count'))
+
+    def checkpoint(result):
+        job.progress, job.errors = result.created, result.errors
+        job.arguments.update(line=result.line, error_count=result.error_count)
+        Job.objects.filter(pk=job.pk).update(progress=job.progress, errors=job.errors, arguments=job.arguments)
+
+    try:
+        with job.file.open('rb') as stream:
+            result = import_tasks(lst, stream, job.arguments['format'], progress=checkpoint, resume=resume)
+    finally:
+        job.file.delete(save=False)
+    job.progress = result.created
+    job.errors = result.errors
+    return str(result).capitalize()
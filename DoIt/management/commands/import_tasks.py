@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DoIt.imports import READERS, import_tasks
+from DoIt.models import List
+
+
+class Command(BaseCommand):
+    help = 'Import tasks into a list from a CSV (with header) or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('list_id', type=int)
+        parser.add_argument('path', help="File to import, '-' to read from stdin")
+        parser.add_argument('--format', choices=sorted(READERS), help='Guessed from the file extension by default')
+        parser.add_argument('--batch-size', type=int, default=500, help='Tasks inserted per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            lst = List.objects.get(pk=options['list_id'])
+        except List.DoesNotExist:
+            raise CommandError('List %s does not exist' % options['list_id'])
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError('Unknown format, use --format')
+
+        if options['path'] == '-':
+            result = import_tasks(lst, sys.stdin.buffer, file_format, options['batch_size'])
+        else:
+            with open(options['path'], 'rb') as stream:
+                result = import_tasks(lst, stream, file_format, options['batch_size'])
+
+        for line, errors in result.errors:
+            for field, messages in errors.items():
+                self.stderr.write('%s%s%s' % ('line %s: ' % line if line else '',
+                                              '' if field == '__all__' else field + ': ', ' '.join(messages)))
+        self.stdout.write(self.style.SUCCESS(str(result).capitalize()))
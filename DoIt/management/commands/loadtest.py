@@ -0,0 +1,144 @@
+import http.client
+import http.cookiejar
+import itertools
+import json
+import os
+import re
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from DoIt.models import List, Task
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def read_pages(user):
+    """
+    The read pages of the user: the index, its first list and task, the API and the export.
+    """
+    lit = List.objects.filter(user=user).order_by('id').first()
+    task = Task.objects.filter(list=lit).order_by('id').first() if lit else None
+    if task is None:
+        raise CommandError('The user needs a list with at least one task')
+    return {
+        'index': reverse('DoIt:index'),
+        'tasks': reverse('DoIt:tasks', kwargs={'pk': lit.id}),
+        'details': reverse('DoIt:details', kwargs={'pk': task.id}),
+        'api_lists': reverse('DoIt:api_lists'),
+        'api_list_tasks': reverse('DoIt:api_list_tasks', kwargs={'pk': lit.id}),
+        'list_export': reverse('DoIt:list_export', kwargs={'pk': lit.id, 'file_format': 'csv'}),
+    }
+
+
+def percentiles(timings):
+    cuts = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {'p50': round(cuts[49], 2), 'p95': round(cuts[94], 2), 'p99': round(cuts[98], 2),
+            'max': round(max(timings), 2)}
+
+
+class Command(BaseCommand):
+    help = ('Load test the read pages of a running server, logged in as a user, and record the requests per '
+            'second and latency percentiles under a label, to compare WSGI and ASGI deployments')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Root URL of the server, like http://127.0.0.1:8000')
+        parser.add_argument('--label', required=True, help='Name of the deployment in the report, like wsgi')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', default=os.environ.get('DOIT_LOADTEST_PASSWORD'),
+                            help='Password of the user, DOIT_LOADTEST_PASSWORD by default')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at the same time')
+        parser.add_argument('--requests', type=int, default=1200, help='Requests to send, spread over the pages')
+        parser.add_argument('--report', default='loadtest_report.json',
+                            help='JSON file the results are added to, under the label')
+
+    def handle(self, *args, **options):
+        if not options['password']:
+            raise CommandError('Pass --password or set DOIT_LOADTEST_PASSWORD')
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('No user %s' % options['username'])
+        root = options['url'].rstrip('/')
+        cookies = self.log_in(root, options['username'], options['password'])
+        pages = read_pages(user)
+        timings = {name: [] for name in pages}
+        errors = dict.fromkeys(pages, 0)
+        lock = threading.Lock()
+        local = threading.local()
+
+        def fetch(name):
+            if not hasattr(local, 'opener'):
+                local.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+            start = time.perf_counter()
+            try:
+                with local.opener.open(root + pages[name]) as response:
+                    response.read()
+                failed = False
+            except (OSError, http.client.HTTPException):
+                failed = True
+            milliseconds = (time.perf_counter() - start) * 1000
+            with lock:
+                if failed:
+                    errors[name] += 1
+                else:
+                    timings[name].append(milliseconds)
+
+        names = itertools.islice(itertools.cycle(pages), options['requests'])
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            list(executor.map(fetch, names))
+        seconds = time.perf_counter() - start
+
+        result = {
+            'url': root,
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'errors': sum(errors.values()),
+            'requests_per_second': round(options['requests'] / seconds, 1),
+            'latency_ms': percentiles([ms for page in timings.values() for ms in page] or [0.0]),
+            'pages': {name: dict(percentiles(timings[name] or [0.0]), errors=errors[name]) for name in pages},
+        }
+        report = {}
+        if os.path.exists(options['report']):
+            with open(options['report']) as existing:
+                report = json.load(existing)
+        report[options['label']] = result
+        with open(options['report'], 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+        self.write_comparison(report)
+
+    def log_in(self, root, username, password):
+        cookies = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+        login_url = root + settings.LOGIN_URL.rstrip('/') + '/'
+        try:
+            with opener.open(login_url) as response:
+                token = CSRF_INPUT.search(response.read().decode())
+            data = urllib.parse.urlencode({'username': username, 'password': password,
+                                           'csrfmiddlewaretoken': token.group(1) if token else ''})
+            request = urllib.request.Request(login_url, data.encode(), headers={'Referer': login_url})
+            with opener.open(request) as response:
+                response.read()
+        except (OSError, http.client.HTTPException) as error:
+            raise CommandError('Could not log in at %s: %s' % (login_url, error))
+        if not any(cookie.name == settings.SESSION_COOKIE_NAME for cookie in cookies):
+            raise CommandError('Could not log in as %s, check the password' % username)
+        return cookies
+
+    def write_comparison(self, report):
+        self.stdout.write('%-16s %8s %8s %8s %8s %8s %7s' % ('label', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms',
+                                                             'max ms', 'errors'))
+        for label, result in sorted(report.items()):
+            latency = result['latency_ms']
+            self.stdout.write('%-16s %8s %8s %8s %8s %8s %7s' % (
+                label, result['requests_per_second'], latency['p50'], latency['p95'], latency['p99'],
+                latency['max'], result['errors']))
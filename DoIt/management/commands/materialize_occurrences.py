@@ -0,0 +1,23 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from DoIt.recurrence import materialize
+
+
+class Command(BaseCommand):
+    help = ('Store as tasks the occurrences of the repeating tasks due in the next days, run it periodically, '
+            'e.g. daily from cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.DOIT_RECURRENCE_DAYS,
+                            help='Days ahead to store, DOIT_RECURRENCE_DAYS by default')
+        parser.add_argument('--batch-size', type=int, default=500, help='Repeating tasks per transaction')
+
+    def handle(self, *args, **options):
+        until = timezone.localdate() + datetime.timedelta(days=options['days'])
+        created = materialize(until, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Stored %d occurrence%s up to %s' % (
+            created, '' if created == 1 else 's', until)))
@@ -0,0 +1,83 @@
+import bisect
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from DoIt.management.commands.loadtest import percentiles
+
+# upper bounds in milliseconds of the buckets of the wall time histograms
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+def histogram(timings):
+    counts = [0] * (len(BUCKETS) + 1)
+    for milliseconds in timings:
+        counts[bisect.bisect_left(BUCKETS, milliseconds)] += 1
+    labels = ['<=%d' % bound for bound in BUCKETS] + ['>%d' % BUCKETS[-1]]
+    return dict(zip(labels, counts))
+
+
+def summarize(records, top):
+    """
+    Per view: the number of requests, percentiles and histogram of the wall
+    time, the mean query count, database and template time, and the `top`
+    slowest statements seen.
+    """
+    views = defaultdict(list)
+    for record in records:
+        views[record['view'] or '<unresolved>'].append(record)
+    summary = {}
+    for view, requests in views.items():
+        slowest = {}
+        for record in requests:
+            for milliseconds, sql in record['slowest']:
+                slowest[sql] = max(milliseconds, slowest.get(sql, 0))
+        timings = [record['total_ms'] for record in requests]
+        summary[view] = {
+            'requests': len(requests),
+            'total_ms': percentiles(timings),
+            'histogram_ms': histogram(timings),
+            'mean_queries': round(sum(record['queries'] for record in requests) / len(requests), 1),
+            'mean_db_ms': round(sum(record['db_ms'] for record in requests) / len(requests), 2),
+            'mean_template_ms': round(sum(record['template_ms'] for record in requests) / len(requests), 2),
+            'slowest_sql': sorted(([ms, sql] for sql, ms in slowest.items()), reverse=True)[:top],
+        }
+    return summary
+
+
+class Command(BaseCommand):
+    help = 'Summarize per view the request profiles recorded in DOIT_PROFILING_LOG'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.DOIT_PROFILING_LOG, help='Profile log to read')
+        parser.add_argument('--view', action='append', help='Only this URL name, like DoIt:tasks (repeatable)')
+        parser.add_argument('--top', type=int, default=3, help='Slowest statements shown per view')
+        parser.add_argument('--json', action='store_true', help='Write the summary as JSON')
+        parser.add_argument('--clear', action='store_true', help='Empty the log after reading it')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['log']):
+            raise CommandError('No profile log at %s, run with DOIT_PROFILING=1 first' % options['log'])
+        with open(options['log']) as log:
+            records = [json.loads(line) for line in log if line.strip()]
+        if options['view']:
+            records = [record for record in records if record['view'] in options['view']]
+        summary = summarize(records, options['top'])
+        if options['clear']:
+            open(options['log'], 'w').close()
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2, sort_keys=True))
+            return
+        for view, stats in sorted(summary.items(), key=lambda item: -item[1]['total_ms']['p95']):
+            total = stats['total_ms']
+            self.stdout.write(self.style.MIGRATE_HEADING(view))
+            self.stdout.write('  %d requests, p50 %s ms, p95 %s ms, p99 %s ms, max %s ms' % (
+                stats['requests'], total['p50'], total['p95'], total['p99'], total['max']))
+            self.stdout.write('  %s queries, %s ms in the database, %s ms rendering on average' % (
+                stats['mean_queries'], stats['mean_db_ms'], stats['mean_template_ms']))
+            self.stdout.write('  ' + '  '.join('%s: %d' % bucket for bucket in stats['histogram_ms'].items()))
+            for milliseconds, sql in stats['slowest_sql']:
+                self.stdout.write('  %8.2f ms  %s' % (milliseconds, sql))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from DoIt.models import List
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored open/done task counters and remaining minutes of lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('list_ids', nargs='*', type=int, help='Only rebuild these lists')
+
+    def handle(self, *args, **options):
+        lists = List.objects.all()
+        if options['list_ids']:
+            lists = lists.filter(pk__in=options['list_ids'])
+        updated = lists.rebuild_counters()
+        self.stdout.write(self.style.SUCCESS('Rebuilt counters of %d list%s' % (updated, '' if updated == 1 else 's')))
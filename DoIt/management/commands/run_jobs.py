@@ -0,0 +1,74 @@
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from DoIt import jobs
+from DoIt.models import Job
+
+# how often the files of expired exports are looked for, in seconds
+CLEANUP_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = ('Run the background jobs, like deletes of big lists, imports and exports, with a bounded number of '
+            'threads claiming jobs from the database queue')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.DOIT_JOB_WORKERS,
+                            help='Jobs run at the same time, DOIT_JOB_WORKERS by default')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        requeued, failed = jobs.requeue_lost()
+        if requeued or failed:
+            self.stdout.write('%d lost job(s) queued again, %d failed' % (requeued, failed))
+        self.delete_expired_exports()
+        cleaned = time.monotonic()
+        stop = threading.Event()
+        threads = [threading.Thread(target=self.work, args=(stop, options), name='job-worker-%d' % number)
+                   for number in range(max(options['workers'], 1))]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+                    if time.monotonic() - cleaned >= CLEANUP_INTERVAL:
+                        self.delete_expired_exports()
+                        cleaned = time.monotonic()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping once the running jobs are finished')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def delete_expired_exports(self):
+        deleted = jobs.delete_expired_exports()
+        if deleted:
+            self.stdout.write('%d expired export file(s) deleted' % deleted)
+
+    def work(self, stop, options):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = Job.objects.claim()
+                if job is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll'])
+                    continue
+                start = time.perf_counter()
+                try:
+                    jobs.run(job)
+                except Exception:
+                    self.stderr.write('%s failed:\n%s' % (job, traceback.format_exc()))
+                    continue
+                self.stdout.write('%s %s in %.1fs: %s' % (job, job.status, time.perf_counter() - start,
+                                                          job.message))
+        finally:
+            connections.close_all()
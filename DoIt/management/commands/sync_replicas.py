@@ -0,0 +1,56 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def sqlite_path(name):
+    """
+    The file of an SQLite database NAME, which can be a file: URI.
+    """
+    name = str(name)
+    if name.startswith('file:'):
+        name = name[len('file:'):].split('?', 1)[0]
+    return name
+
+
+def copy_sqlite_database(source, target):
+    """
+    Copy the SQLite database file `source` over `target` with the online
+    backup API, which is safe while both are being used.
+    """
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        source_connection.backup(target_connection)
+    finally:
+        target_connection.close()
+        source_connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Copy the default SQLite database to the SQLite replicas in DOIT_DB_REPLICAS, a stand-in for '
+            'replication in development')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep copying every INTERVAL seconds instead of copying once')
+
+    def handle(self, *args, **options):
+        aliases = ['default'] + settings.DOIT_DB_REPLICAS
+        databases = [settings.DATABASES[alias] for alias in aliases]
+        if any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError('Only SQLite databases can be copied')
+        source = sqlite_path(databases[0]['NAME'])
+        targets = [sqlite_path(database['NAME']) for database in databases[1:]]
+        if not targets:
+            raise CommandError('No replicas in DOIT_DB_REPLICAS, set DOIT_SQLITE_REPLICAS to add some')
+        while True:
+            for target in targets:
+                copy_sqlite_database(source, target)
+            self.stdout.write(self.style.SUCCESS('Copied %s to %s' % (source, ', '.join(targets))))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
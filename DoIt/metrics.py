@@ -0,0 +1,271 @@
+"""
+Prometheus metrics of the process, served as text at /metrics:
+- requests and their latency, by URL name, method and status
+- database queries, by URL name
+- page cache hits and misses
+- business gauges: lists, tasks, open tasks, users and signups
+
+The request path never takes a lock nor queries the database: each thread
+counts in a dict of its own, summed when the metrics are scraped, and the
+business gauges are computed from aggregates at most every
+DOIT_METRICS_GAUGES_SECONDS and kept in the page cache.
+
+Each process counts its own requests, with several worker processes each
+scrape sees one of them.
+"""
+import datetime
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db.backends.signals import connection_created
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views import generic
+
+from DoIt.models import List
+
+# upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+GAUGES_KEY = 'doit:metrics:gauges'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+METRICS = {
+    'doit_http_requests_total': ('counter', 'Requests answered, by URL name, method and status.'),
+    'doit_http_request_duration_seconds': ('histogram', 'Time to answer a request, up to the response headers.'),
+    'doit_db_queries_total': ('counter', 'Database queries run while answering requests, by URL name.'),
+    'doit_page_cache_requests_total': ('counter', 'Page cache lookups, by result.'),
+    'doit_page_cache_hit_ratio': ('gauge', 'Share of the page cache lookups that were hits.'),
+    'doit_lists': ('gauge', 'Lists of all the users.'),
+    'doit_tasks': ('gauge', 'Tasks of all the lists.'),
+    'doit_open_tasks': ('gauge', 'Tasks not done yet.'),
+    'doit_users': ('gauge', 'Registered users.'),
+    'doit_signups_last_day': ('gauge', 'Users registered in the last 24 hours.'),
+}
+
+# counted database queries of the current request
+_queries = ContextVar('doit_metrics_queries', default=None)
+
+
+class Registry:
+    """
+    Counters and histograms sharded by thread. A shard is only written by its
+    thread, so counting needs no lock; collect() sums them and folds the
+    shards of finished threads into one.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = defaultdict(float)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = defaultdict(float)
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def inc(self, name, labels=(), amount=1):
+        self._shard()[name, labels] += amount
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        shard = self._shard()
+        # every bucket is written, scrapers expect all of them
+        for bound in buckets:
+            shard[name + '_bucket', labels + (('le', repr(bound)),)] += value <= bound
+        shard[name + '_bucket', labels + (('le', '+Inf'),)] += 1
+        shard[name + '_sum', labels] += value
+        shard[name + '_count', labels] += 1
+
+    def collect(self):
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    for key, value in shard.items():
+                        self._retired[key] += value
+            self._shards = alive
+            totals = defaultdict(float, self._retired)
+            for _, shard in alive:
+                # dict.copy() doesn't let the thread of the shard change it halfway
+                for key, value in shard.copy().items():
+                    totals[key] += value
+        return totals
+
+    def clear(self):
+        with self._lock:
+            for _, shard in self._shards:
+                shard.clear()
+            self._retired.clear()
+
+
+registry = Registry()
+
+
+def count_query(execute, sql, params, many, context):
+    queries = _queries.get()
+    if queries is not None:
+        queries[0] += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # execute_wrappers outlive reconnections
+    if settings.DOIT_METRICS and count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def count_page_cache(hit):
+    registry.inc('doit_page_cache_requests_total', (('result', 'hit' if hit else 'miss'),))
+
+
+class MetricsMiddleware:
+    """
+    Counts the requests, their latency and queries by URL name, when
+    DOIT_METRICS is on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DOIT_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = [0]
+        token = _queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _queries.reset(token)
+        return self.record(request, response, time.perf_counter() - start, queries[0])
+
+    async def __acall__(self, request):
+        queries = [0]
+        token = _queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _queries.reset(token)
+        return self.record(request, response, time.perf_counter() - start, queries[0])
+
+    def record(self, request, response, seconds, queries):
+        view = request.resolver_match.view_name if request.resolver_match else ''
+        registry.inc('doit_http_requests_total',
+                     (('view', view), ('method', request.method), ('status', str(response.status_code))))
+        registry.observe('doit_http_request_duration_seconds', (('view', view),), seconds)
+        if queries:
+            registry.inc('doit_db_queries_total', (('view', view),), queries)
+        return response
+
+
+def business_gauges():
+    """
+    The business gauges, from the list counters and one aggregate of the
+    users, computed again every DOIT_METRICS_GAUGES_SECONDS at most.
+    """
+    cache = caches[settings.DOIT_PAGE_CACHE]
+    gauges = cache.get(GAUGES_KEY)
+    if gauges is None:
+        lists = List.objects.aggregate(lists=Count('id'), open_tasks=Coalesce(Sum('open_task_count'), 0),
+                                       done_tasks=Coalesce(Sum('done_task_count'), 0))
+        day_ago = timezone.now() - datetime.timedelta(days=1)
+        users = User.objects.aggregate(users=Count('id'),
+                                       signups_last_day=Count('id', filter=Q(date_joined__gte=day_ago)))
+        gauges = {
+            'doit_lists': lists['lists'],
+            'doit_tasks': lists['open_tasks'] + lists['done_tasks'],
+            'doit_open_tasks': lists['open_tasks'],
+            'doit_users': users['users'],
+            'doit_signups_last_day': users['signups_last_day'],
+        }
+        cache.set(GAUGES_KEY, gauges, settings.DOIT_METRICS_GAUGES_SECONDS)
+    return gauges
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{%s}' % ','.join('%s="%s"' % (name, value) for (name, _), value in zip(labels, escaped))
+
+
+def exposition():
+    """
+    All the metrics in the Prometheus text format.
+    """
+    samples = defaultdict(list)
+    totals = registry.collect()
+    for (name, labels), value in totals.items():
+        family = name.rsplit('_', 1)[0] if name.endswith(('_bucket', '_sum', '_count')) else name
+        samples[family].append((name, labels, value))
+    hits = totals.get(('doit_page_cache_requests_total', (('result', 'hit'),)), 0)
+    lookups = hits + totals.get(('doit_page_cache_requests_total', (('result', 'miss'),)), 0)
+    samples['doit_page_cache_hit_ratio'].append(('doit_page_cache_hit_ratio', (), hits / lookups if lookups else 0))
+    for name, value in business_gauges().items():
+        samples[name].append((name, (), value))
+    lines = []
+    for family, (kind, help_text) in METRICS.items():
+        if not samples[family]:
+            continue
+        lines.append('# HELP %s %s' % (family, help_text))
+        lines.append('# TYPE %s %s' % (family, kind))
+        for name, labels, value in sorted(samples[family], key=sort_key):
+            lines.append('%s%s %s' % (name, format_labels(labels), format_value(value)))
+    return '\n'.join(lines) + '\n'
+
+
+def sort_key(sample):
+    # the buckets of each series in increasing order, then its sum and count
+    name, labels, _ = sample
+    series = tuple(label for label in labels if label[0] != 'le')
+    part = next((index for index, suffix in enumerate(('_bucket', '_sum', '_count')) if name.endswith(suffix)), 0)
+    bound = dict(labels).get('le')
+    return series, part, float(bound) if bound else 0.0
+
+
+class MetricsView(generic.View):
+    """
+    The metrics for Prometheus. Scrapers must send DOIT_METRICS_TOKEN as a
+    bearer token, otherwise only logged in staff users see them, so the
+    metrics are never public.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not self.allowed(request):
+            raise PermissionDenied
+        return HttpResponse(exposition(), content_type=CONTENT_TYPE)
+
+    def allowed(self, request):
+        token = settings.DOIT_METRICS_TOKEN
+        if token and constant_time_compare(request.headers.get('Authorization', ''), 'Bearer ' + token):
+            return True
+        return request.user.is_active and request.user.is_staff
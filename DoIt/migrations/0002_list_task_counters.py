@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    List = apps.get_model('DoIt', 'List')
+    Task = apps.get_model('DoIt', 'Task')
+    undone = Q(is_done=False) | Q(is_done__isnull=True)
+    per_list = Task.objects.filter(list=OuterRef('pk')).order_by().values('list')
+
+    def counter(aggregate):
+        return Coalesce(Subquery(per_list.annotate(value=aggregate).values('value')), 0)
+
+    List.objects.update(
+        open_task_count=counter(Count('id', filter=undone)),
+        done_task_count=counter(Count('id', filter=Q(is_done=True))),
+        remaining_minutes=counter(Sum('time_it_takes', filter=undone)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DoIt', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='list',
+            name='done_task_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='open_task_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='remaining_minutes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
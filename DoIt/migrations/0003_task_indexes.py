@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DoIt', '0002_list_task_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='list',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='DoIt.list'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', '-is_important', 'id'], name='task_list_important_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', 'is_done', 'time_it_takes', 'is_important'], name='task_list_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', 'end_date'], name='task_list_end_date_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:13
+
+import DoIt.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+from DoIt.search import create_search_index, drop_search_index
+
+
+def create_index(apps, schema_editor):
+    create_search_index(schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DoIt', '0004_list_task_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSearchIndex',
+            fields=[
+                ('task', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='DoIt.task')),
+                ('name', models.TextField()),
+                ('description', models.TextField()),
+                ('document', DoIt.models.FullTextField(db_column='doit_task_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'doit_task_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DoIt', '0006_task_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', 'end_date', 'is_done'], name='task_due_idx'),
+        ),
+    ]
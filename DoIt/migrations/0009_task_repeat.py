@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:26
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+from DoIt.search import create_search_index
+
+
+def create_index(apps, schema_editor):
+    # adding the repeat column rebuilds the task table on SQLite, which drops
+    # the triggers of the search index
+    create_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DoIt', '0008_job'),
+    ]
+
+    operations = [
+        # run last when unapplied, after the columns are removed
+        migrations.RunPython(migrations.RunPython.noop, create_index),
+        migrations.AddField(
+            model_name='task',
+            name='materialized_until',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='repeat',
+            field=models.CharField(blank=True, choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='repeat_every',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Repeat every how many days, weeks or months'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='repeat_until',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='series',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='occurrences', to='DoIt.task'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('materialized_until__isnull', False)), fields=['list', 'materialized_until'], name='task_series_idx'),
+        ),
+        migrations.RunPython(create_index, migrations.RunPython.noop),
+    ]
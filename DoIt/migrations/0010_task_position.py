@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:02
+
+from django.db import migrations, models
+from django.db.models import F
+
+from DoIt.search import create_search_index
+
+# DOIT_POSITION_GAP when the migration was written
+POSITION_GAP = 2 ** 16
+
+
+def create_index(apps, schema_editor):
+    # adding the position column rebuilds the task table on SQLite, which
+    # drops the triggers of the search index
+    create_search_index(schema_editor)
+
+
+def spread_positions(apps, schema_editor):
+    # the existing tasks keep the order they were created in
+    Task = apps.get_model('DoIt', 'Task')
+    Task.objects.using(schema_editor.connection.alias).update(position=F('id') * POSITION_GAP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DoIt', '0009_task_repeat'),
+    ]
+
+    operations = [
+        # run last when unapplied, after the column is removed
+        migrations.RunPython(migrations.RunPython.noop, create_index),
+        migrations.AddField(
+            model_name='task',
+            name='position',
+            field=models.BigIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(spread_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['list', 'position'], name='task_list_position_idx'),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('delete_list', 'List deletion'), ('export', 'Export'), ('import', 'Import'), ('rebalance_list', 'Task order rebalance')], max_length=30),
+        ),
+        migrations.RunPython(create_index, migrations.RunPython.noop),
+    ]
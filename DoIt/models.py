@@ -1,16 +1,331 @@
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.db import connections, models, router, transaction
+from django.db.models import Case, Count, F, Func, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+
+# sent by Task and TaskQuerySet, which skip the model signals on bulk
+# operations, with the ids of the lists whose tasks were created, changed or
+# deleted and the ids of their users, or None when they aren't known
+tasks_changed = Signal()
+
+
+def task_stats(prefix=''):
+    """
+    Aggregate expressions for the task numbers shown around the app. `prefix`
+    is the lookup path to Task, e.g. 'task__' to annotate them on List.
+    """
+    undone = Q(**{prefix + 'is_done': False}) | Q(**{prefix + 'is_done__isnull': True})
+    return {
+        'remaining_time': Coalesce(Sum(prefix + 'time_it_takes', filter=undone), 0),
+        'total_count': Count(prefix + 'id'),
+        'done_count': Count(prefix + 'id', filter=Q(**{prefix + 'is_done': True})),
+        'undone_count': Count(prefix + 'id', filter=undone),
+        'important_count': Count(prefix + 'id', filter=Q(**{prefix + 'is_important': True})),
+    }
+
+
+def update_list_counters(removed=(), added=()):
+    """
+    Apply to the stored list counters the difference between the `removed`
+    and `added` task contributions, as returned by Task.counters(), with one
+    UPDATE per list involved, which also stamps the list as changed.
+    """
+    deltas = {}
+    for contributions, sign in ((removed, -1), (added, 1)):
+        for counted in contributions:
+            if counted is None:
+                continue
+            list_id, values = counted[0], counted[1:]
+            current = deltas.get(list_id, (0, 0, 0))
+            deltas[list_id] = tuple(total + sign * value for total, value in zip(current, values))
+    now = timezone.now()
+    for list_id, (open_tasks, done_tasks, minutes) in deltas.items():
+        changes = {'changed_at': now}
+        if open_tasks or done_tasks or minutes:
+            changes.update(
+                open_task_count=F('open_task_count') + open_tasks,
+                done_task_count=F('done_task_count') + done_tasks,
+                remaining_minutes=F('remaining_minutes') + minutes,
+            )
+        List.objects.filter(pk=list_id).update(**changes)
+
+
+def fill_positions(tasks):
+    """
+    Give the `tasks` without a position the next ones at the end of their
+    lists, DOIT_POSITION_GAP apart. The last position of a list is taken from
+    its last_position annotation when it was loaded with_last_position(),
+    else read for all the lists in one query.
+    """
+    tasks = [task for task in tasks if task.position is None]
+    last = {}
+    for task in tasks:
+        if Task.list.is_cached(task) and hasattr(task.list, 'last_position'):
+            last.setdefault(task.list_id, task.list.last_position)
+    unknown = {task.list_id for task in tasks} - set(last)
+    if unknown:
+        last.update(List.objects.filter(pk__in=unknown).with_last_position().values_list('pk', 'last_position'))
+    for task in tasks:
+        last[task.list_id] = task.position = (last.get(task.list_id) or 0) + settings.DOIT_POSITION_GAP
+        if Task.list.is_cached(task) and hasattr(task.list, 'last_position'):
+            task.list.last_position = task.position
+
+
+class ListQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """
+        The lists of `user`, none for anonymous users. Views look lists up in
+        it, so a list of another user isn't found.
+        """
+        if not user.is_authenticated:
+            return self.none()
+        return self.filter(user=user)
+
+    def with_stats(self):
+        return self.annotate(**task_stats('task__'))
+
+    def with_important_count(self):
+        """
+        Annotate the number of important tasks of each list, counted on the
+        important index of the list's tasks.
+        """
+        important = Task.objects.filter(list=OuterRef('pk'), is_important=True).order_by().values('list')
+        return self.annotate(important_count=Coalesce(Subquery(important.annotate(count=Count('id')).values('count')), 0))
+
+    def with_last_position(self):
+        """
+        Annotate the position of the last task of each list, read from the
+        end of the position index, so tasks can be added after it.
+        """
+        last = Task.objects.filter(list=OuterRef('pk')).order_by('-position').values('position')[:1]
+        return self.annotate(last_position=Subquery(last))
+
+    def rebuild_counters(self, **fields):
+        """
+        Recompute the stored task counters of every list in the queryset from
+        its tasks, in a single UPDATE that also sets the extra `fields` given.
+        Returns the number of lists updated.
+        """
+        stats = task_stats()
+        per_list = Task.objects.filter(list=OuterRef('pk')).order_by().values('list')
+
+        def counter(name):
+            return Coalesce(Subquery(per_list.annotate(value=stats[name]).values('value')), 0)
+
+        return self.update(
+            open_task_count=counter('undone_count'),
+            done_task_count=counter('done_count'),
+            remaining_minutes=counter('remaining_time'),
+            **fields
+        )
 
 
 class List(models.Model):
     name = models.CharField(max_length=200)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    open_task_count = models.IntegerField(default=0, editable=False)
+    done_task_count = models.IntegerField(default=0, editable=False)
+    remaining_minutes = models.IntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # last time the list or any of its tasks changed, tasks deleted included
+    changed_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = ListQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('open_task_count', 'done_task_count', 'remaining_minutes')
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(List, cls).from_db(db, field_names, values)
+        # the owner as stored, so the pages of the previous owner are
+        # invalidated when the list is given to another user
+        instance._saved_user_id = instance.__dict__.get('user_id')
+        return instance
+
+    def stats(self):
+        """
+        The task numbers of task_stats() read from the stored counters, the
+        important count from the with_important_count() annotation.
+        """
+        return {
+            'remaining_time': self.remaining_minutes,
+            'total_count': self.open_task_count + self.done_task_count,
+            'done_count': self.done_task_count,
+            'undone_count': self.open_task_count,
+            'important_count': self.important_count,
+        }
+
+    def save(self, *args, **kwargs):
+        # the counters are only written by Task, saving the copy loaded here
+        # would overwrite updates made by tasks saved meanwhile, even when
+        # they are named in update_fields
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            else:
+                update_fields = list(update_fields) + ['changed_at']
+            kwargs['update_fields'] = [name for name in dict.fromkeys(update_fields)
+                                       if name not in self.COUNTER_FIELDS]
+        self.changed_at = timezone.now()
+        super(List, self).save(*args, **kwargs)
+        self._saved_user_id = self.user_id
+
+    def delete_in_chunks(self, chunk_size=None, progress=None):
+        """
+        Delete the list, its tasks first in transactions of `chunk_size`
+        tasks (DOIT_DELETE_CHUNK_SIZE by default), so the database is only
+        locked for one chunk at a time instead of all the tasks. Each chunk is
+        one DELETE of the ids of a subquery, without loading the tasks. Tasks
+        added meanwhile are deleted too. `progress` is called with the number
+        of tasks deleted after each chunk. Returns that number.
+        """
+        using = router.db_for_write(Task, instance=self)
+        connection = connections[using]
+        chunk_size = chunk_size or settings.DOIT_DELETE_CHUNK_SIZE
+        chunk = Task.objects.using(using).filter(list=self).order_by().values('id')[:chunk_size]
+        subquery, params = chunk.query.sql_with_params()
+        sql = 'DELETE FROM %s WHERE id IN (%s)' % (connection.ops.quote_name(Task._meta.db_table), subquery)
+        deleted = 0
+        while True:
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                count = cursor.rowcount
+            if not count:
+                break
+            deleted += count
+            if progress:
+                progress(deleted)
+            # a short chunk was the last one, the list delete below takes
+            # the tasks added since
+            if count < chunk_size:
+                break
+        # no tasks left for the collector to cascade to
+        self.delete(using=using)
+        return deleted
+
+    def rebalance_positions(self, batch_size=300):
+        """
+        Spread the positions of the tasks of the list DOIT_POSITION_GAP apart
+        again, in their current order, so any task can be moved between two
+        others with a single-row update again. The list row is written first,
+        which takes the write lock on SQLite, so no task moves between the
+        read of the order and the updates. Returns the number of tasks.
+        """
+        gap = settings.DOIT_POSITION_GAP
+        with transaction.atomic():
+            List.objects.filter(pk=self.pk).update(changed_at=timezone.now())
+            ids = list(Task.objects.filter(list=self).order_by('position', 'id').values_list('id', flat=True))
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                # the order isn't an edit of the tasks, their updated_at is kept
+                Task.objects.filter(pk__in=batch).update(
+                    position=Case(*[When(pk=pk, then=Value((start + index + 1) * gap))
+                                    for index, pk in enumerate(batch)]),
+                    updated_at=F('updated_at'))
+        return len(ids)
+
+
+class TaskQuerySet(models.QuerySet):
+    COUNTED_FIELDS = {'list', 'list_id', 'is_done', 'time_it_takes'}
+
+    def for_user(self, user):
+        """
+        The tasks of the lists of `user`, none for anonymous users. The owner
+        is checked in the same query as the tasks are read, joining the list
+        by its primary key.
+        """
+        if not user.is_authenticated:
+            return self.none()
+        return self.filter(list__user=user)
+
+    def stats(self):
+        return self.aggregate(**task_stats())
+
+    def undone(self):
+        return self.filter(Q(is_done=False) | Q(is_done__isnull=True))
+
+    def due(self, user, until, today):
+        """
+        The tasks of `user` not done yet and due until the date `until`,
+        overdue ones included. Every task is annotated with the number of
+        tasks overdue and due from `today` on, counted in the same query.
+        """
+        due = self.for_user(user).filter(end_date__lte=until).undone()
+
+        def count(tasks):
+            return Subquery(tasks.order_by().annotate(count=Func('id', function='COUNT')).values('count'))
+
+        return due.annotate(overdue_count=count(due.filter(end_date__lt=today)),
+                            due_soon_count=count(due.filter(end_date__gte=today)))
+
+    def update(self, **kwargs):
+        """
+        Update the tasks in one statement. The lists involved are stamped as
+        changed and, when a field their counters depend on changes, their
+        counters are rebuilt.
+        """
+        now = timezone.now()
+        kwargs.setdefault('updated_at', now)
+        with transaction.atomic(using=self.db):
+            list_ids, user_ids = self._lists_and_users()
+            updated = super(TaskQuerySet, self).update(**kwargs)
+            target = kwargs.get('list', kwargs.get('list_id'))
+            if isinstance(target, List):
+                list_ids.add(target.pk)
+                user_ids.add(target.user_id)
+            elif target is not None:
+                list_ids.add(target)
+                user_ids = None
+            if updated and self.COUNTED_FIELDS.intersection(kwargs):
+                List.objects.filter(pk__in=list_ids).rebuild_counters(changed_at=now)
+            elif updated:
+                List.objects.filter(pk__in=list_ids).update(changed_at=now)
+        if updated:
+            tasks_changed.send(sender=self.model, list_ids=list_ids, user_ids=user_ids)
+        return updated
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            list_ids, user_ids = self._lists_and_users()
+            deleted = super(TaskQuerySet, self).delete()
+            if deleted[0]:
+                List.objects.filter(pk__in=list_ids).rebuild_counters(changed_at=timezone.now())
+        if deleted[0]:
+            tasks_changed.send(sender=self.model, list_ids=list_ids, user_ids=user_ids)
+        return deleted
+
+    def _lists_and_users(self):
+        rows = self.order_by().values_list('list', 'list__user').distinct()
+        return {list_id for list_id, _ in rows}, {user_id for _, user_id in rows}
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        fill_positions(objs)
+        with transaction.atomic(using=self.db):
+            objs = super(TaskQuerySet, self).bulk_create(objs, *args, **kwargs)
+            update_list_counters(added=[obj.counters() for obj in objs])
+        if objs:
+            known = all(self.model.list.is_cached(obj) for obj in objs)
+            tasks_changed.send(sender=self.model, list_ids={obj.list_id for obj in objs},
+                               user_ids={obj.list.user_id for obj in objs} if known else None)
+        return objs
+
 
 class Task(models.Model):
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    REPEATS = ((DAILY, 'Daily'), (WEEKLY, 'Weekly'), (MONTHLY, 'Monthly'))
+
     name = models.CharField(max_length=200)
     description = models.CharField(max_length=400, blank=True, null=True)
     is_done = models.BooleanField(blank=True, null=True)
@@ -18,7 +333,274 @@ class Task(models.Model):
     end_date = models.DateField(blank=True, null=True)
     time_it_takes = models.IntegerField('How much time it takes in minutes', blank=True, null=True)
     is_important = models.BooleanField(blank=True, null=True)
-    list = models.ForeignKey(List, on_delete=models.CASCADE)
+    # indexed by the composite indexes below, which all start with list
+    list = models.ForeignKey(List, on_delete=models.CASCADE, db_index=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # a task with a repeat rule is the first occurrence of a series, see DoIt.recurrence
+    repeat = models.CharField(max_length=10, choices=REPEATS, blank=True)
+    repeat_every = models.PositiveSmallIntegerField('Repeat every how many days, weeks or months', blank=True,
+                                                    null=True, validators=[MinValueValidator(1)])
+    repeat_until = models.DateField(blank=True, null=True)
+    # the series an occurrence was stored from. DO_NOTHING and no constraint, like the search index, so deleting
+    # tasks never has to look for their occurrences and lists are still deleted without loading their tasks
+    series = models.ForeignKey('self', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                               blank=True, null=True, editable=False, related_name='occurrences')
+    # date of the last occurrence of the series stored as a task, None for tasks that don't repeat
+    materialized_until = models.DateField(blank=True, null=True, editable=False)
+    # the order chosen by the user, sparse so a task is moved with a single-row update, see move()
+    position = models.BigIntegerField(editable=False)
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['list', '-is_important', 'id'], name='task_list_important_idx'),
+            # covers every column task_stats() reads so the aggregate never touches the table
+            models.Index(fields=['list', 'is_done', 'time_it_takes', 'is_important'], name='task_list_done_idx'),
+            models.Index(fields=['list', 'end_date'], name='task_list_end_date_idx'),
+            # the sorts of TaskFilterForm, the id comes free as the rowid at the end of each index
+            models.Index(fields=['list', 'start_date'], name='task_list_start_date_idx'),
+            models.Index(fields=['list', 'time_it_takes'], name='task_list_time_idx'),
+            # TaskQuerySet.due(), which counts the tasks due from this index alone
+            models.Index(fields=['list', 'end_date', 'is_done'], name='task_due_idx'),
+            # the repeating tasks only, read by the due tasks page and `manage.py materialize_occurrences`
+            models.Index(fields=['list', 'materialized_until'], name='task_series_idx',
+                         condition=Q(materialized_until__isnull=False)),
+            # the order of the user, and the last position of a list to add tasks after it
+            models.Index(fields=['list', 'position'], name='task_list_position_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    def clean(self):
+        if self.repeat and self.end_date is None and self.start_date is None:
+            raise ValidationError({'repeat': 'A repeating task needs a start or an end date'})
+        # set here too for the imports, which bulk create the tasks of their forms
+        self._start_series()
+
+    def _start_series(self):
+        if not self.repeat:
+            self.materialized_until = None
+        elif self.materialized_until is None:
+            # the task itself is the first occurrence
+            self.materialized_until = self.end_date or self.start_date
+
+    def counters(self):
+        """
+        What this task adds to the counters of its list, as
+        (list_id, open tasks, done tasks, remaining minutes). None if the
+        fields needed are deferred.
+        """
+        if any(name not in self.__dict__ for name in ('list_id', 'is_done', 'time_it_takes')):
+            return None
+        if self.is_done:
+            return self.list_id, 0, 1, 0
+        return self.list_id, 1, 0, int(self.time_it_takes or 0)
+
+    def _stored_counters(self):
+        # what the stored row adds to the counters, read in the transaction
+        # changing it so a concurrent or stale edit isn't counted twice: the
+        # row is locked until the commit where rows can be, and SQLite
+        # transactions hold the write lock from their BEGIN IMMEDIATE
+        stored = Task.objects.select_for_update().filter(pk=self.pk).only('list', 'is_done', 'time_it_takes')
+        stored = stored.first()
+        return stored.counters() if stored else None
+
+    def _user_ids(self, list_ids):
+        if list_ids == {self.list_id} and Task.list.is_cached(self):
+            return {self.list.user_id}
+        return None
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        self._start_series()
+        if adding:
+            fill_positions([self])
+        update_fields = kwargs.get('update_fields')
+        # saving other fields only, like a move, leaves the counters alone
+        recount = update_fields is None or not TaskQuerySet.COUNTED_FIELDS.isdisjoint(update_fields)
+        old = new = None
+        if not recount:
+            # a single UPDATE, it needs no transaction of its own
+            super(Task, self).save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                if not adding:
+                    old = self._stored_counters()
+                    if old and old[0] != self.list_id:
+                        # moved to another list, it goes after its last task
+                        self.position = None
+                        fill_positions([self])
+                        if update_fields is not None:
+                            kwargs['update_fields'] = {*update_fields, 'position'}
+                super(Task, self).save(*args, **kwargs)
+                # deferred fields aren't saved, what was is read back
+                new = self.counters() or self._stored_counters()
+                update_list_counters(removed=[old], added=[new])
+        list_ids = {counted[0] for counted in (old, new) if counted} or {self.list_id}
+        tasks_changed.send(sender=Task, list_ids=list_ids, user_ids=self._user_ids(list_ids))
+
+    def move(self, after=None, before=None):
+        """
+        Put the task right after the task `after` or right before the task
+        `before` of its list, or first without either. The task gets a
+        position between its new neighbours and only its row is updated, the
+        positions of the list are spread again first when there is no room
+        left between them. The positions are read and written in one
+        transaction, so a move or rebalance made meanwhile can't leave two
+        tasks at the same place. Returns whether the room left is getting
+        small, the list should then be rebalanced soon.
+        """
+        with transaction.atomic():
+            anchor = after or before
+            if anchor is not None:
+                # read again in the transaction, the one of the form may be stale
+                anchor.position = Task.objects.filter(pk=anchor.pk, list=self.list_id).values_list(
+                    'position', flat=True).select_for_update().first()
+                if anchor.position is None:
+                    return False
+            others = Task.objects.filter(list=self.list_id).exclude(pk=self.pk).values_list('position', flat=True)
+            low = high = None
+            if after is not None:
+                low = after.position
+                high = others.filter(Q(position__gt=low) | Q(position=low, id__gt=after.id)).order_by(
+                    'position', 'id').first()
+            elif before is not None:
+                high = before.position
+                low = others.filter(Q(position__lt=high) | Q(position=high, id__lt=before.id)).order_by(
+                    '-position', '-id').first()
+            else:
+                high = others.order_by('position', 'id').first()
+            if low is None and high is None:
+                return False
+            if low is not None and high is not None and high - low < 2:
+                # no room left, the positions can't wait for the rebalance job
+                self.list.rebalance_positions()
+                return self.move(after, before)
+            if low is None:
+                self.position = high - settings.DOIT_POSITION_GAP
+            elif high is None:
+                self.position = low + settings.DOIT_POSITION_GAP
+            else:
+                self.position = (low + high) // 2
+            self.save(update_fields=['position'])
+        if low is None or high is None:
+            return False
+        return min(self.position - low, high - self.position) < settings.DOIT_POSITION_MIN_GAP
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            old = self._stored_counters()
+            result = super(Task, self).delete(*args, **kwargs)
+            update_list_counters(removed=[old])
+        if old:
+            tasks_changed.send(sender=Task, list_ids={old[0]}, user_ids=self._user_ids({old[0]}))
+        return result
+
+
+class FullTextField(models.TextField):
+    """
+    The hidden column of an FTS5 table named like the table, which matches
+    a full-text query against all of its columns.
+    """
+
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s MATCH %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+class TaskSearchIndex(models.Model):
+    """
+    The FTS5 index of the task names and descriptions, see DoIt.search. Only
+    exists on SQLite, and is written by triggers on the task table.
+    """
+    task = models.OneToOneField(Task, primary_key=True, db_column='rowid', db_constraint=False,
+                                on_delete=models.DO_NOTHING, related_name='search_entry')
+    name = models.TextField()
+    description = models.TextField()
+    document = FullTextField(db_column='doit_task_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'doit_task_fts'
+
+
+class JobQuerySet(models.QuerySet):
+    def for_user(self, user):
+        if not user.is_authenticated:
+            return self.none()
+        return self.filter(user=user)
+
+    def claim(self):
+        """
+        Mark the oldest queued job as running and return it, None when the
+        queue is empty. The conditional UPDATE lets only one worker win a job.
+        """
+        while True:
+            job_id = self.filter(status=Job.QUEUED).order_by('id').values_list('id', flat=True).first()
+            if job_id is None:
+                return None
+            if self.filter(pk=job_id, status=Job.QUEUED).update(status=Job.RUNNING, started_at=timezone.now(),
+                                                                attempts=F('attempts') + 1):
+                return self.select_related('user').get(pk=job_id)
+
+
+class Job(models.Model):
+    """
+    An operation too slow to answer in a request, run in the background by
+    `manage.py run_jobs`, see DoIt.jobs.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = ((QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed'))
+    # each one run by the DoIt.jobs handler of the same name
+    KINDS = (('delete_list', 'List deletion'), ('export', 'Export'), ('import', 'Import'),
+             ('rebalance_list', 'Task order rebalance'))
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=30, choices=KINDS)
+    arguments = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    # steps done out of total, like tasks deleted or exported
+    progress = models.IntegerField(default=0)
+    total = models.IntegerField(blank=True, null=True)
+    message = models.CharField(max_length=400, blank=True)
+    # import errors as (line, {field: [messages]})
+    errors = models.JSONField(default=list)
+    # the file uploaded for an import, the file written by an export
+    file = models.FileField(upload_to='jobs/%Y/%m/%d', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # the queue, claimed oldest first
+            models.Index(fields=['status', 'id'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return '%s #%s' % (self.kind, self.pk)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def set_progress(self, progress, total=None):
+        self.progress = progress
+        if total is not None:
+            self.total = total
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, total=self.total)
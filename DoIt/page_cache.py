@@ -0,0 +1,216 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from DoIt.metrics import count_page_cache
+from DoIt.models import List, tasks_changed
+from DoIt.routers import read_from_replica
+
+
+def get_cache():
+    return caches[settings.DOIT_PAGE_CACHE]
+
+
+def user_lists_version_key(user_id):
+    return 'doit:version:user-lists:%s' % user_id
+
+
+def user_tasks_version_key(user_id):
+    return 'doit:version:user-tasks:%s' % user_id
+
+
+def list_version_key(list_id):
+    return 'doit:version:list:%s' % list_id
+
+
+def new_version():
+    # not 1, so a version evicted from the cache can't come back with the
+    # value of pages cached before it was evicted
+    return time.time_ns()
+
+
+def get_versions(keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    """
+    Invalidate the pages depending on `keys` now and again when the current
+    transaction commits, so a page rendered before the commit with the old
+    data doesn't stay cached.
+    """
+    def bump():
+        cache = get_cache()
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, new_version(), None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=List)
+@receiver(post_delete, sender=List)
+def list_changed(sender, instance, **kwargs):
+    # a list given to another user leaves the index of its previous owner too
+    user_ids = {instance.user_id, getattr(instance, '_saved_user_id', None)} - {None}
+    bump_versions([list_version_key(instance.pk)] + [user_lists_version_key(user_id) for user_id in user_ids])
+
+
+@receiver(tasks_changed)
+def list_tasks_changed(sender, list_ids, user_ids, **kwargs):
+    # the index page shows the counters of the lists of the user
+    if user_ids is None:
+        user_ids = set(List.objects.filter(pk__in=list_ids).values_list('user', flat=True))
+    bump_versions([list_version_key(list_id) for list_id in list_ids]
+                  + [user_tasks_version_key(user_id) for user_id in user_ids])
+
+
+def is_cacheable(request):
+    """
+    Whether the page rendered for `request` can be reused: only pages of a
+    logged in user holding a CSRF cookie, with no messages to show.
+    """
+    return (request.user.is_authenticated and settings.CSRF_COOKIE_NAME in request.COOKIES
+            and not len(get_messages(request)))
+
+
+class BaseConditionalGetMixin:
+    """
+    Answer GET requests with 304 Not Modified when the browser already has the
+    page, before the view runs its queries. get_last_modified() returns when
+    what the page shows last changed, or None to render the page anyway. The
+    ETag also depends on the user, the CSRF cookie and get_etag_parts(), so a
+    page is never reused across sessions.
+    """
+
+    def get_etag_parts(self):
+        return []
+
+    def get_etag(self, last_modified):
+        parts = [str(self.request.user.pk), self.request.COOKIES[settings.CSRF_COOKIE_NAME],
+                 last_modified.isoformat()]
+        parts.extend(str(part) for part in self.get_etag_parts())
+        return quote_etag(hashlib.md5('\n'.join(parts).encode()).hexdigest())
+
+    def get_not_modified_response(self, etag, last_modified):
+        return get_conditional_response(self.request, etag=etag, last_modified=int(last_modified.timestamp()))
+
+    def patch_response(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+            # the browser must ask again each time, shared caches must not keep it
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ConditionalGetMixin(BaseConditionalGetMixin):
+    def get_last_modified(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        last_modified = self.get_last_modified() if is_cacheable(request) else None
+        if last_modified is None:
+            return super(ConditionalGetMixin, self).get(request, *args, **kwargs)
+        etag = self.get_etag(last_modified)
+        response = self.get_not_modified_response(etag, last_modified)
+        if response is None:
+            response = super(ConditionalGetMixin, self).get(request, *args, **kwargs)
+        return self.patch_response(response, etag, last_modified)
+
+
+class AsyncConditionalGetMixin(BaseConditionalGetMixin):
+    """
+    ConditionalGetMixin of the async views, the last modification is read
+    with the async ORM by aget_last_modified().
+    """
+
+    async def aget_last_modified(self):
+        return None
+
+    async def get(self, request, *args, **kwargs):
+        last_modified = await self.aget_last_modified() if is_cacheable(request) else None
+        if last_modified is None:
+            return await super(AsyncConditionalGetMixin, self).get(request, *args, **kwargs)
+        etag = self.get_etag(last_modified)
+        response = self.get_not_modified_response(etag, last_modified)
+        if response is None:
+            response = await super(AsyncConditionalGetMixin, self).get(request, *args, **kwargs)
+        return self.patch_response(response, etag, last_modified)
+
+
+class BaseVersionedPageCacheMixin:
+    """
+    Cache the pages rendered for a logged in user until one of the versions
+    returned by get_cache_versions() is bumped. Pages with messages to show
+    are never cached nor served from the cache. The CSRF cookie is part of
+    the key, so cached forms always carry a token valid for the session, and
+    requests without it are not cached. Pages read from a replica aren't
+    cached either: the replica may not have the changes that bumped the
+    versions yet, and the page would stay under the current key.
+    """
+
+    def get_version_keys(self):
+        return [user_lists_version_key(self.request.user.pk), user_tasks_version_key(self.request.user.pk)]
+
+    def get_page_cache_key(self):
+        request = self.request
+        parts = [request.get_full_path(), str(request.user.pk), request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')]
+        parts.extend(str(version) for version in get_versions(self.get_version_keys()))
+        return 'doit:page:' + hashlib.md5('\n'.join(parts).encode()).hexdigest()
+
+    def get_cached_response(self, key):
+        content = get_cache().get(key)
+        count_page_cache(hit=content is not None)
+        return None if content is None else HttpResponse(content)
+
+    def cache_response(self, response, key):
+        def store(rendered):
+            # checked once rendered, the template may have read too
+            if not read_from_replica():
+                get_cache().set(key, rendered.content, settings.DOIT_PAGE_CACHE_TIMEOUT)
+
+        if response.status_code == 200:
+            response.add_post_render_callback(store)
+
+
+class VersionedPageCacheMixin(BaseVersionedPageCacheMixin):
+    def get(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return super(VersionedPageCacheMixin, self).get(request, *args, **kwargs)
+        key = self.get_page_cache_key()
+        response = self.get_cached_response(key)
+        if response is None:
+            response = super(VersionedPageCacheMixin, self).get(request, *args, **kwargs)
+            self.cache_response(response, key)
+        return response
+
+
+class AsyncVersionedPageCacheMixin(BaseVersionedPageCacheMixin):
+    async def get(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return await super(AsyncVersionedPageCacheMixin, self).get(request, *args, **kwargs)
+        key = self.get_page_cache_key()
+        response = self.get_cached_response(key)
+        if response is None:
+            response = await super(AsyncVersionedPageCacheMixin, self).get(request, *args, **kwargs)
+            self.cache_response(response, key)
+        return response
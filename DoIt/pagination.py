@@ -0,0 +1,175 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.http import Http404
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor(cursor)
+    return values
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by "seeking" past the last row of the previous page
+    instead of using OFFSET, so every page costs the same no matter how deep
+    it is. `ordering` must end with a unique field (usually 'id'); NULLs are
+    treated as the smallest value, matching SQLite's default ordering.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        self.per_page = per_page
+
+    def order_by(self):
+        return [F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_first=True)
+                for field, descending in self.ordering]
+
+    def field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def parse_cursor(self, cursor):
+        # the cursor comes from the client: every value must be one its
+        # ordering field could hold before it goes in a filter
+        values = decode_cursor(cursor, len(self.ordering))
+        try:
+            return [self.field(field).to_python(value) for (field, _), value in zip(self.ordering, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+
+    def seek(self, values):
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, values):
+            if value is None:
+                after = Q(pk__in=[]) if descending else Q(**{field + '__isnull': False})
+            elif descending:
+                after = Q(**{field + '__lt': value}) | Q(**{field + '__isnull': True})
+            else:
+                after = Q(**{field + '__gt': value})
+            condition |= equal & after
+            equal &= Q(**{field + '__isnull': True}) if value is None else Q(**{field: value})
+        return condition
+
+    def get_page_queryset(self, cursor):
+        queryset = self.queryset.order_by(*self.order_by())
+        if cursor:
+            queryset = queryset.filter(self.seek(self.parse_cursor(cursor)))
+        return queryset[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        return self.make_page(list(self.get_page_queryset(cursor)), cursor)
+
+    async def apage(self, cursor=None):
+        return self.make_page([obj async for obj in self.get_page_queryset(cursor)], cursor)
+
+    def make_page(self, object_list, cursor):
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[:self.per_page]
+            last = object_list[-1]
+            next_cursor = encode_cursor(last[field] if isinstance(last, dict) else getattr(last, field)
+                                        for field, _ in self.ordering)
+        return KeysetPage(object_list, next_cursor, cursor)
+
+
+def get_page_size(request, default, maximum, kwarg='page_size'):
+    try:
+        size = int(request.GET.get(kwarg, default))
+    except ValueError:
+        size = default
+    return max(1, min(size, maximum))
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin replacing the default OFFSET pagination with keyset
+    pagination. The page size comes from `?page_size=` (bounded by
+    `max_paginate_by`) and the position from the opaque `?after=` cursor.
+    The ordering can depend on the request by overriding
+    get_keyset_ordering().
+    """
+    paginate_by = 50
+    max_paginate_by = 500
+    keyset_ordering = ('id',)
+    cursor_kwarg = 'after'
+    page_size_kwarg = 'page_size'
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def get_paginate_by(self, queryset):
+        return get_page_size(self.request, self.paginate_by, self.max_paginate_by, self.page_size_kwarg)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.get_keyset_ordering(), page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class AsyncKeysetPaginationMixin(KeysetPaginationMixin):
+    """
+    KeysetPaginationMixin of the async list views: the page is read with the
+    async ORM by aload() and get_context_data() shows it.
+    """
+
+    async def aload(self):
+        paginator = KeysetPaginator(self.object_list, self.get_keyset_ordering(),
+                                    self.get_paginate_by(self.object_list))
+        try:
+            page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        self.keyset_page = paginator, page
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page = self.keyset_page
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,185 @@
+"""
+Opt-in request profiling, on when settings.DOIT_PROFILING is set. For every
+request ProfilingMiddleware measures the wall time, the number and time of
+the database queries, the template render time and the slowest statements.
+The numbers go to the browser in a Server-Timing header, and a JSON line per
+request tagged with the URL name is appended to DOIT_PROFILING_LOG, which
+`manage.py profile_report` summarizes per view.
+
+Queries are seen by an execute wrapper installed on every connection, which
+reports to the profile of the current request through a context variable, so
+the queries of async views, run in other threads, are counted too.
+"""
+import datetime
+import heapq
+import json
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# longest SQL kept for a slow statement
+SQL_LENGTH = 500
+
+_profile = ContextVar('doit_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        # (seconds, sql) of the slowest statements, a min-heap
+        self.slowest = []
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.db_time += seconds
+        entry = (seconds, sql[:SQL_LENGTH])
+        if len(self.slowest) < settings.DOIT_PROFILING_SLOW_QUERIES:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def stop(self):
+        self.total = time.perf_counter() - self.start
+
+    def server_timing(self):
+        return 'total;dur=%.1f, db;dur=%.1f;desc="%d queries", template;dur=%.1f' % (
+            self.total * 1000, self.db_time * 1000, self.queries, self.template_time * 1000)
+
+    def as_record(self, request, response):
+        match = request.resolver_match
+        return {
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(self.total * 1000, 2),
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'slowest': [[round(seconds * 1000, 2), sql] for seconds, sql in sorted(self.slowest, reverse=True)],
+        }
+
+
+def record_query(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # execute_wrappers outlive reconnections
+    if settings.DOIT_PROFILING and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def write_record(record):
+    with open(settings.DOIT_PROFILING_LOG, 'a') as log:
+        log.write(json.dumps(record) + '\n')
+
+
+class ProfilingMiddleware:
+    """
+    Profiles every request when DOIT_PROFILING is on, it should be the first
+    middleware so the time of the others is counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DOIT_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _profile.reset(token)
+        return self.finish(request, response, profile)
+
+    def process_template_response(self, request, response):
+        profile = _profile.get()
+        if profile is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                profile.template_time += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, profile):
+        profile.stop()
+        response['Server-Timing'] = profile.server_timing()
+        if not response.streaming:
+            write_record(profile.as_record(request, response))
+        elif response.is_async:
+            response.streaming_content = self.aprofile_stream(response.streaming_content, request, response, profile)
+        else:
+            response.streaming_content = self.profile_stream(response.streaming_content, request, response, profile)
+        return response
+
+    # the rows of streamed responses are read after the headers are sent, the
+    # record is written once they are all out
+
+    def profile_stream(self, content, request, response, profile):
+        chunks = iter(content)
+        try:
+            while True:
+                token = _profile.set(profile)
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                finally:
+                    _profile.reset(token)
+                yield chunk
+        finally:
+            profile.stop()
+            write_record(profile.as_record(request, response))
+
+    async def aprofile_stream(self, content, request, response, profile):
+        chunks = aiter(content)
+        try:
+            while True:
+                token = _profile.set(profile)
+                try:
+                    chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _profile.reset(token)
+                yield chunk
+        finally:
+            profile.stop()
+            write_record(profile.as_record(request, response))
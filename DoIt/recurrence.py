@@ -0,0 +1,157 @@
+"""
+Repeating tasks. A task with a repeat rule (daily, weekly or monthly, every
+`repeat_every` days, weeks or months, until `repeat_until`) is the first
+occurrence of a series, and every later occurrence is the task shifted by a
+whole number of steps.
+
+Occurrences aren't stored ahead forever: the series keeps the date of the
+last one stored as a task in `materialized_until`, the ones after it are
+computed on the fly for the dates a page shows, and
+`manage.py materialize_occurrences`, run periodically, stores in bulk the
+ones of the next DOIT_RECURRENCE_DAYS days so they can be done, edited and
+counted like any task.
+"""
+import calendar
+import datetime
+import heapq
+import itertools
+import operator
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from DoIt.models import List, Task
+
+# what steps() and occurrence() read of a repeating task
+SERIES_FIELDS = ('id', 'name', 'description', 'time_it_takes', 'is_important', 'list_id', 'start_date', 'end_date',
+                 'repeat', 'repeat_every', 'repeat_until', 'materialized_until')
+
+
+def add_months(day, months):
+    # the 31st of the month repeats on the last day of shorter months
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def shift(day, repeat, count):
+    if day is None:
+        return None
+    if repeat == Task.MONTHLY:
+        return add_months(day, count)
+    return day + datetime.timedelta(days=count * (7 if repeat == Task.WEEKLY else 1))
+
+
+def anchor(task):
+    # the date the rule repeats, the end date when the task has one
+    return task.end_date or task.start_date
+
+
+def first_step(task, after):
+    # the step of the occurrence on or before `after` closest to it, found
+    # without walking the series from its first occurrence
+    first, every = anchor(task), task.repeat_every or 1
+    if after <= first:
+        return 1
+    if task.repeat == Task.MONTHLY:
+        elapsed = (after.year - first.year) * 12 + after.month - first.month
+    else:
+        elapsed = (after - first).days // (7 if task.repeat == Task.WEEKLY else 1)
+    return max(elapsed // every, 1)
+
+
+def steps(task, after, until):
+    """
+    The steps of the occurrences of the repeating `task` falling after the
+    date `after` and on or before `until`, in order, as (date, step).
+    """
+    first, every = anchor(task), task.repeat_every or 1
+    if task.repeat_until:
+        until = min(until, task.repeat_until)
+    step = first_step(task, after)
+    while True:
+        day = shift(first, task.repeat, step * every)
+        if day > until:
+            return
+        if day > after:
+            yield day, step
+        step += 1
+
+
+def occurrence(task, step):
+    every = task.repeat_every or 1
+    return Task(name=task.name, description=task.description, time_it_takes=task.time_it_takes,
+                is_important=task.is_important, list_id=task.list_id, series_id=task.id,
+                start_date=shift(task.start_date, task.repeat, step * every),
+                end_date=shift(task.end_date, task.repeat, step * every))
+
+
+def occurrences(task, after, until):
+    """
+    The occurrences of the repeating `task` falling after the date `after`
+    and on or before `until`, in order, as unsaved tasks of the series.
+    """
+    for _, step in steps(task, after, until):
+        stored = occurrence(task, step)
+        if Task.list.is_cached(task):
+            stored.list = task.list
+        yield stored
+
+
+def pending(series, until):
+    """
+    The repeating tasks of the `series` queryset with occurrences after the
+    last one stored and on or before `until`.
+    """
+    return series.filter(materialized_until__lt=until).filter(
+        Q(repeat_until__isnull=True) | Q(repeat_until__gt=F('materialized_until')))
+
+
+def upcoming(series, since, until, limit):
+    """
+    The first `limit` occurrences not stored yet of the repeating tasks of
+    the `series` queryset, from the date `since` to `until`, soonest first.
+    Occurrences are generated lazily: the repeating tasks are read as plain
+    rows, one step of each is computed to merge them, and only the
+    occurrences returned are built as tasks.
+    """
+    after = since - datetime.timedelta(days=1)
+    rows = pending(series, until).values(*SERIES_FIELDS, list_name=F('list__name'))
+    streams = []
+    for row in rows:
+        row = SimpleNamespace(**row)
+        streams.append(tagged_steps(row, max(row.materialized_until, after), until))
+    found = []
+    for _, step, row in itertools.islice(heapq.merge(*streams, key=operator.itemgetter(0)), limit):
+        task = occurrence(row, step)
+        task.list = List(id=row.list_id, name=row.list_name)
+        found.append(task)
+    return found
+
+
+def tagged_steps(row, after, until):
+    for day, step in steps(row, after, until):
+        yield day, step, row
+
+
+def materialize(until, batch_size=500):
+    """
+    Store as tasks the occurrences of every repeating task on or before
+    `until`. The series are read `batch_size` at a time, and the occurrences
+    of each batch are inserted with one bulk insert in the transaction that
+    moves their `materialized_until`, so running it again or after a crash
+    doesn't store an occurrence twice. Returns the number of tasks created.
+    """
+    series = pending(Task.objects.all(), until).select_related('list').order_by('id')
+    created = last_id = 0
+    while True:
+        batch = list(series.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return created
+        last_id = batch[-1].id
+        stored = [occurrence for task in batch for occurrence in occurrences(task, task.materialized_until, until)]
+        with transaction.atomic():
+            Task.objects.bulk_create(stored)
+            Task.objects.filter(pk__in=[task.pk for task in batch]).update(materialized_until=until)
+        created += len(stored)
@@ -0,0 +1,152 @@
+"""
+Sends the reads of the DoIt models made while answering GET and HEAD
+requests to the read replicas in settings.DOIT_DB_REPLICAS, in turn. All the
+rest, writes, the reads of other apps and of management commands, goes to the
+default database.
+
+A user who just wrote something keeps reading from the default database for
+DOIT_READ_YOUR_WRITES_SECONDS, long enough for the replicas to catch up, so
+they never see a page without their own change. A replica that can't be
+connected to is skipped for DOIT_REPLICA_RETRY_SECONDS. Whether a request
+read from a replica is kept, see read_from_replica(), so what may lag behind
+the default database isn't cached as current.
+"""
+import itertools
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PRIMARY_COOKIE = 'doit_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# per request state set up by ReadYourWritesMiddleware, None outside requests
+_request_state = ContextVar('doit_request_state', default=None)
+_turns = itertools.count()
+_unhealthy_until = {}
+
+
+class RequestState:
+    def __init__(self, primary):
+        # reads go to the default database
+        self.primary = primary
+        # a DoIt model was written during the request
+        self.wrote = False
+        # a DoIt model was read from a replica during the request
+        self.replica_read = False
+
+
+def get_replicas():
+    return list(getattr(settings, 'DOIT_DB_REPLICAS', []))
+
+
+def is_healthy(alias):
+    if _unhealthy_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _unhealthy_until[alias] = time.monotonic() + settings.DOIT_REPLICA_RETRY_SECONDS
+        return False
+    _unhealthy_until.pop(alias, None)
+    return True
+
+
+def read_from_replica():
+    """
+    Whether the current request read anything from a replica so far.
+    """
+    state = _request_state.get()
+    return state is not None and state.replica_read
+
+
+def choose_replica():
+    """
+    The next healthy replica in round-robin order, or the default database
+    when none of them is.
+    """
+    replicas = get_replicas()
+    if replicas:
+        turn = next(_turns)
+        for offset in range(len(replicas)):
+            alias = replicas[(turn + offset) % len(replicas)]
+            if is_healthy(alias):
+                return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    app_label = 'DoIt'
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if model._meta.app_label != self.app_label or state is None or state.primary:
+            return DEFAULT_DB_ALIAS
+        alias = choose_replica()
+        if alias != DEFAULT_DB_ALIAS:
+            state.replica_read = True
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and model._meta.app_label == self.app_label:
+            state.primary = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the default database
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Lets ReplicaRouter use the replicas for requests with a safe method,
+    unless the user wrote less than DOIT_READ_YOUR_WRITES_SECONDS ago, which
+    is remembered in a cookie. It runs sync or async like the rest of the
+    middleware, so async views aren't moved to a thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        state = RequestState(primary=request.method not in SAFE_METHODS or PRIMARY_COOKIE in request.COOKIES)
+        return state, _request_state.set(state)
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(PRIMARY_COOKIE, '1', max_age=settings.DOIT_READ_YOUR_WRITES_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,103 @@
+"""
+Full-text search of the tasks. On SQLite the name and the description of the
+tasks are indexed in an FTS5 table kept in sync by triggers, so bulk creates,
+updates and cascading deletes, which skip the model signals, are indexed too.
+Other databases fall back to scanning the tasks with icontains.
+"""
+import functools
+import sqlite3
+
+from django.db import connections
+from django.db.models import F, Q, Value
+
+INDEX_TABLE = 'doit_task_fts'
+
+INDEX_SQL = [
+    # the names weigh 10 times more than the descriptions in the ranking
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS doit_task_fts USING fts5(
+        name, description, content='DoIt_task', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    "INSERT INTO doit_task_fts(doit_task_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS doit_task_fts_insert AFTER INSERT ON DoIt_task BEGIN
+        INSERT INTO doit_task_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS doit_task_fts_delete AFTER DELETE ON DoIt_task BEGIN
+        INSERT INTO doit_task_fts(doit_task_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS doit_task_fts_update AFTER UPDATE OF name, description ON DoIt_task BEGIN
+        INSERT INTO doit_task_fts(doit_task_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO doit_task_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO doit_task_fts(doit_task_fts) VALUES ('rebuild')",
+]
+
+DROP_INDEX_SQL = [
+    'DROP TRIGGER IF EXISTS doit_task_fts_insert',
+    'DROP TRIGGER IF EXISTS doit_task_fts_delete',
+    'DROP TRIGGER IF EXISTS doit_task_fts_update',
+    'DROP TABLE IF EXISTS doit_task_fts',
+]
+
+
+@functools.lru_cache()
+def sqlite_has_fts5():
+    try:
+        sqlite3.connect(':memory:').execute('CREATE VIRTUAL TABLE fts5_test USING fts5(text)')
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def has_search_index(using='default'):
+    return connections[using].vendor == 'sqlite' and sqlite_has_fts5()
+
+
+def create_search_index(schema_editor):
+    """
+    Create the index and its triggers and index the existing tasks. Safe to
+    run again, e.g. after a migration rebuilt the task table, which drops its
+    triggers.
+    """
+    if has_search_index(schema_editor.connection.alias):
+        for sql in INDEX_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(schema_editor):
+    if has_search_index(schema_editor.connection.alias):
+        for sql in DROP_INDEX_SQL:
+            schema_editor.execute(sql)
+
+
+def match_expression(terms):
+    # every term is quoted so FTS5 operators typed by the user are taken
+    # literally, and matched as a prefix so results show up while typing
+    return ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+
+
+def search_tasks(queryset, query):
+    """
+    Filter a Task queryset down to the tasks matching every word of `query`
+    in their name or description, annotated with `search_rank`, lower is a
+    better match. Without the index every match ranks the same.
+    """
+    terms = query.split()
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0)).none()
+    if has_search_index(queryset.db):
+        return queryset.filter(search_entry__document__match=match_expression(terms)).annotate(
+            search_rank=F('search_entry__rank'))
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(description__icontains=term)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0))
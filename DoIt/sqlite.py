@@ -0,0 +1,26 @@
+"""
+Tunes every new SQLite connection with the pragmas of
+settings.DOIT_SQLITE_PRAGMAS. The defaults of SQLite lock the whole database
+while a task is saved, so a reader and a writer, or two writers, make each
+other fail with "database is locked" under load. WAL, turned on with
+DOIT_SQLITE_WAL=1 since it's stored in the database file, lets readers and a
+writer work at the same time and the busy timeout makes writers wait for each
+other instead of failing.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.DOIT_SQLITE_PRAGMAS.items():
+            if name == 'journal_mode':
+                # stored in the database, changing it needs all other connections to be idle
+                cursor.execute('PRAGMA journal_mode')
+                if cursor.fetchone()[0].lower() == str(value).lower():
+                    continue
+            cursor.execute('PRAGMA %s = %s' % (name, value))
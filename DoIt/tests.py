@@ -1,11 +1,42 @@
-from django.contrib.auth.models import User
+import datetime
+import io
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
 from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import F
 from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.test import TestCase
+from django.test import Client, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from DoIt.models import List, Task
+from DoIt import urls
+from DoIt.forms import TaskFilterForm, TaskForm
+from DoIt.models import Job, List, Task, task_stats
+from DoIt import jobs, metrics, profiling, routers
+from DoIt.management.commands.loadtest import percentiles, read_pages
+from DoIt.management.commands.sync_replicas import copy_sqlite_database, sqlite_path
+from DoIt.pagination import KeysetPaginator, encode_cursor
+from DoIt.imports import import_tasks
+from DoIt.recurrence import materialize, occurrences
+from DoIt.search import has_search_index, search_tasks
 
 
 def create_user(username, password):
@@ -513,6 +544,560 @@ class ListTasksTest(TestCase):
         self.assertContains(response, str(task5.name))
 
 
+    def test_tasks_paginated_by_cursor(self):
+        """
+        if the list has more tasks than the page size, page shows only the first page\
+        and a cursor that leads to the next tasks, keeping the importance ordering
+        """
+        user = create_user('test', 'super123*secure')
+        self.client.force_login(user)
+        listest = create_list('list1', user)
+        task1 = create_task('task1', listest)
+        task2 = create_task('task2', listest, is_important=False)
+        task3 = create_task('task3', listest, is_important=True)
+        task4 = create_task('task4', listest)
+        task5 = create_task('task5', listest, is_important=True)
+        url = reverse('DoIt:tasks', kwargs={'pk': listest.id})
+        pages = []
+        response = self.client.get(url, {'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(list(response.context['list_of_task']))
+            if not response.context['page_obj'].has_next():
+                break
+            response = self.client.get(url, {'page_size': 2, 'after': response.context['page_obj'].next_cursor})
+        self.assertEqual(pages, [[task3, task5], [task2, task1], [task4]])
+        self.assertContains(response, 'First page')
+        self.assertNotContains(response, 'Next page')
+
+    def test_tasks_invalid_cursor(self):
+        """
+        if the cursor can't be decoded page returns code 404
+        """
+        user = create_user('test', 'super123*secure')
+        self.client.force_login(user)
+        listest = create_list('list1', user)
+        response = self.client.get(reverse('DoIt:tasks', kwargs={'pk': listest.id}), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tasks_cursor_wrong_types(self):
+        """
+        if the values of the cursor don't fit the fields of the ordering page returns code 404
+        """
+        user = create_user('test', 'super123*secure')
+        self.client.force_login(user)
+        listest = create_list('list1', user)
+        create_task('task1', listest)
+        url = reverse('DoIt:tasks', kwargs={'pk': listest.id})
+        for values, params in [(['x', 1], {}), ([True, 'abc'], {}), ([[1], {}], {}),
+                               (['tomorrow', 1], {'sort': 'end_date'}), ([1.5, 'abc'], {'sort': 'position'})]:
+            response = self.client.get(url, {'after': encode_cursor(values), **params})
+            self.assertEqual(response.status_code, 404, values)
+
+
+class TaskFilterTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.listest = create_list('list1', self.user)
+        self.tasks = [
+            Task.objects.create(name='task0', list=self.listest, is_done=True, start_date='2021-08-01',
+                                end_date='2021-08-10', time_it_takes=30),
+            Task.objects.create(name='task1', list=self.listest, is_important=True, start_date='2021-08-05',
+                                end_date='2021-08-20', time_it_takes=10),
+            Task.objects.create(name='task2', list=self.listest, is_done=False, time_it_takes=60),
+            Task.objects.create(name='task3', list=self.listest, is_important=False, start_date='2021-09-01',
+                                end_date='2021-09-02'),
+        ]
+
+    def get(self, **params):
+        response = self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.listest.id}), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertTasks(self, params, indexes):
+        self.assertSequenceEqual(self.get(**params).context['list_of_task'], [self.tasks[i] for i in indexes])
+
+    def test_filters(self):
+        """
+        tasks can be filtered by status, importance and ranges of dates and durations
+        """
+        self.assertTasks({'status': 'done'}, [0])
+        self.assertTasks({'status': 'undone'}, [1, 3, 2])
+        self.assertTasks({'important': 'yes'}, [1])
+        self.assertTasks({'important': 'no'}, [3, 0, 2])
+        self.assertTasks({'start_from': '2021-08-05'}, [1, 3])
+        self.assertTasks({'start_from': '2021-08-01', 'start_to': '2021-08-31'}, [1, 0])
+        self.assertTasks({'end_from': '2021-08-11', 'end_to': '2021-09-01'}, [1])
+        self.assertTasks({'min_time': '10', 'max_time': '30'}, [1, 0])
+        self.assertTasks({'status': 'undone', 'max_time': '60'}, [1, 2])
+
+    def test_sorts(self):
+        """
+        tasks can be sorted by dates and durations both ways, empty values count as the smallest
+        """
+        self.assertTasks({}, [1, 3, 0, 2])
+        self.assertTasks({'sort': 'end_date'}, [2, 0, 1, 3])
+        self.assertTasks({'sort': '-end_date'}, [3, 1, 0, 2])
+        self.assertTasks({'sort': 'start_date'}, [2, 0, 1, 3])
+        self.assertTasks({'sort': 'time'}, [3, 1, 0, 2])
+        self.assertTasks({'sort': '-time', 'status': 'undone'}, [2, 1, 3])
+
+    def test_invalid_values_ignored(self):
+        """
+        invalid values and unknown sorts are left out of the filter and reported
+        """
+        response = self.get(status='done', end_from='yesterday', sort='name', min_time='-1')
+        self.assertSequenceEqual(response.context['list_of_task'], [self.tasks[0]])
+        self.assertContains(response, 'Enter a valid date.')
+        self.assertContains(response, 'Select a valid choice.')
+
+    def test_pagination_keeps_filters(self):
+        """
+        the next page links keep the filters and the sort
+        """
+        response = self.get(status='undone', sort='-time', page_size=1)
+        self.assertContains(response, '?status=undone&amp;sort=-time&amp;page_size=1&after=')
+        response = self.get(status='undone', sort='-time', page_size=1,
+                            after=response.context['page_obj'].next_cursor)
+        self.assertSequenceEqual(response.context['list_of_task'], [self.tasks[1]])
+
+    def test_no_match(self):
+        """
+        the filters are still shown when no task matches them
+        """
+        response = self.get(status='done', important='yes')
+        self.assertContains(response, 'No tasks available for this list')
+        self.assertContains(response, 'name="status"')
+
+
+class TaskStatsTest(TestCase):
+
+    def test_stats_of_list(self):
+        """
+        stats are computed in one query and only count the tasks of the filtered list
+        """
+        user = create_user('test', 'super123*secure')
+        list1 = create_list('list1', user)
+        list2 = create_list('list2', user)
+        create_task('task1', list1, 20, is_done=True)
+        create_task('task2', list1, 45, is_important=True)
+        create_task('task3', list1, is_done=False, is_important=True)
+        create_task('task4', list2, 350)
+        with self.assertNumQueries(1):
+            stats = Task.objects.filter(list=list1).stats()
+        self.assertEqual(stats, {
+            'remaining_time': 45,
+            'total_count': 3,
+            'done_count': 1,
+            'undone_count': 2,
+            'important_count': 2,
+        })
+
+    def test_stats_annotated_on_lists(self):
+        """
+        lists annotated with stats show the same numbers as the task aggregate,\
+        including lists without tasks
+        """
+        user = create_user('test', 'super123*secure')
+        list1 = create_list('list1', user)
+        list2 = create_list('list2', user)
+        create_task('task1', list1, 20, is_done=True)
+        create_task('task2', list1, 45)
+        lists = {lst.id: lst for lst in List.objects.with_stats()}
+        self.assertEqual(lists[list1.id].remaining_time, 45)
+        self.assertEqual(lists[list1.id].done_count, 1)
+        self.assertEqual(lists[list2.id].remaining_time, 0)
+        self.assertEqual(lists[list2.id].total_count, 0)
+
+
+class ListCountersTest(TestCase):
+
+    def assertCounters(self, lst, open_tasks, done_tasks, minutes):
+        lst.refresh_from_db()
+        self.assertEqual((lst.open_task_count, lst.done_task_count, lst.remaining_minutes),
+                         (open_tasks, done_tasks, minutes))
+
+    def test_stale_copies(self):
+        """
+        saving or deleting copies of a task loaded before another change doesn't count that change twice
+        """
+        listest = create_list('list1', create_user('test', 'super123*secure'))
+        task = create_task('task1', listest, 30)
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+        first.is_done = second.is_done = True
+        first.save()
+        second.save()
+        self.assertCounters(listest, 0, 1, 0)
+        first.time_it_takes = 10
+        first.is_done = False
+        first.save()
+        self.assertCounters(listest, 1, 0, 10)
+        task.delete()
+        second.delete()
+        self.assertCounters(listest, 0, 0, 0)
+
+    def test_counters_follow_task_views(self):
+        """
+        creating, editing and deleting tasks through the views keeps the counters of the list up to date
+        """
+        user = create_user('test', 'super123*secure')
+        self.client.force_login(user)
+        listest = create_list('list1', user)
+        self.client.post(reverse('DoIt:new_task', kwargs={'pk': listest.id}), {
+            'name': 'task1',
+            'time_it_takes': '30',
+        })
+        self.client.post(reverse('DoIt:new_task', kwargs={'pk': listest.id}), {
+            'name': 'task2',
+            'time_it_takes': '15',
+        })
+        self.assertCounters(listest, 2, 0, 45)
+
+        task = Task.objects.get(name='task1')
+        self.client.post(reverse('DoIt:task_edit', kwargs={'pk': task.id}), {
+            'name': 'task1',
+            'time_it_takes': '30',
+            'is_done': 'true',
+        })
+        self.assertCounters(listest, 1, 1, 15)
+
+        self.client.post(reverse('DoIt:task_delete', kwargs={'pk': task.id}))
+        self.assertCounters(listest, 1, 0, 15)
+
+    def test_counters_when_task_moves_list(self):
+        """
+        moving a task to another list updates the counters of both lists
+        """
+        user = create_user('test', 'super123*secure')
+        list1 = create_list('list1', user)
+        list2 = create_list('list2', user)
+        task = create_task('task1', list1, 10)
+        self.assertCounters(list1, 1, 0, 10)
+        task.list = list2
+        task.save()
+        self.assertCounters(list1, 0, 0, 0)
+        self.assertCounters(list2, 1, 0, 10)
+
+    def test_saving_list_keeps_counters(self):
+        """
+        saving a list loaded before its tasks changed doesn't overwrite the counters
+        """
+        user = create_user('test', 'super123*secure')
+        listest = create_list('list1', user)
+        stale = List.objects.get(id=listest.id)
+        create_task('task1', listest, 10)
+        stale.name = 'listupdated'
+        stale.save()
+        self.assertCounters(listest, 1, 0, 10)
+        self.assertEqual(listest.name, 'listupdated')
+        stale.save(update_fields=['name', 'open_task_count'])
+        self.assertCounters(listest, 1, 0, 10)
+        self.assertGreater(listest.changed_at, listest.updated_at)
+
+    def test_rebuild_counters_command(self):
+        """
+        the rebuild_list_counters command recomputes counters that got out of sync
+        """
+        user = create_user('test', 'super123*secure')
+        list1 = create_list('list1', user)
+        list2 = create_list('list2', user)
+        create_task('task1', list1, 10)
+        create_task('task2', list1, 5, is_done=True)
+        List.objects.update(open_task_count=7, done_task_count=7, remaining_minutes=7)
+        call_command('rebuild_list_counters', stdout=StringIO())
+        self.assertCounters(list1, 1, 1, 10)
+        self.assertCounters(list2, 0, 0, 0)
+
+
+class TaskIndexesTest(TestCase):
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertRegex(plan, 'USING (COVERING )?INDEX ' + index)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def setUp(self):
+        user = create_user('test', 'super123*secure')
+        self.listest = create_list('list1', user)
+        for i in range(20):
+            create_task('task' + str(i), self.listest, i, is_important=i % 3 == 0, is_done=i % 2 == 0)
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_listing_uses_index(self):
+        """
+        the list tasks page query, first and next pages, is served by the (list, -is_important, id) index\
+        without sorting
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN output is SQLite specific')
+        paginator = KeysetPaginator(Task.objects.filter(list=self.listest), ('-is_important', 'id'), 5)
+        queryset = paginator.queryset.order_by(*paginator.order_by())
+        self.assertUsesIndex(queryset[:6], 'task_list_important_idx')
+        self.assertUsesIndex(queryset.filter(paginator.seek([True, 3]))[:6], 'task_list_important_idx')
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_filters_use_index(self):
+        """
+        the stats aggregate and the done/end date lookups of a list use the composite indexes
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN output is SQLite specific')
+        stats = Task.objects.filter(list=self.listest).order_by().values('list').annotate(**task_stats())
+        self.assertUsesIndex(stats, 'task_list_done_idx')
+        self.assertIn('COVERING INDEX', stats.explain())
+        self.assertUsesIndex(Task.objects.filter(list=self.listest, is_done__isnull=True), 'task_list_done_idx')
+        self.assertUsesIndex(Task.objects.filter(list=self.listest, end_date__lte='2021-08-20').order_by(
+            'end_date'), 'task_(list_end_date|due)_idx')
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_due_counts_use_index(self):
+        """
+        the due tasks are found by list and end date, and counted from the index alone
+        """
+        today = timezone.localdate()
+        plan = Task.objects.due(self.listest.user, today + datetime.timedelta(days=7), today).explain()
+        self.assertIn('USING INDEX task_due_idx', plan)
+        self.assertEqual(plan.count('USING COVERING INDEX task_due_idx'), 2)
+
+    @skipUnlessDBFeature('supports_explaining_query_execution')
+    def test_filter_sorts_use_index(self):
+        """
+        every sort of the task filters reads its index in order, also past a cursor
+        """
+        indexes = {'important': 'task_list_important_idx', 'end_date': 'task_list_end_date_idx',
+                   'start_date': 'task_list_start_date_idx', 'time': 'task_list_time_idx',
+                   'position': 'task_list_position_idx'}
+        for sort, _ in TaskFilterForm.SORTS:
+            form = TaskFilterForm({'sort': sort})
+            paginator = KeysetPaginator(form.filter(Task.objects.filter(list=self.listest)), form.ordering(), 10)
+            tasks = paginator.queryset.order_by(*paginator.order_by())
+            with self.subTest(sort=sort):
+                self.assertUsesIndex(tasks, indexes[sort.lstrip('-')])
+                self.assertUsesIndex(tasks.filter(paginator.seek([None, 5])), indexes[sort.lstrip('-')])
+
+
+class PageCacheTests:
+    """
+    Page cache tests, run by the subclasses below against each cache backend
+    """
+
+    def setUp(self):
+        caches[settings.DOIT_PAGE_CACHE].clear()
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        self.listest = create_list('list1', self.user)
+        self.task = create_task('task1', self.listest, 10)
+
+    def test_index_served_from_cache(self):
+        """
+        the second visit to the index only queries the session and the user, until a list changes
+        """
+        response = self.client.get(reverse('DoIt:index'))
+        with self.assertNumQueries(2):
+            cached = self.client.get(reverse('DoIt:index'))
+        self.assertEqual(cached.content, response.content)
+
+        create_list('list2', self.user)
+        self.assertContains(self.client.get(reverse('DoIt:index')), 'list2')
+        self.listest.name = 'listupdated'
+        self.listest.save()
+        self.assertContains(self.client.get(reverse('DoIt:index')), 'listupdated')
+
+    def test_index_follows_list_owner(self):
+        """
+        a list given to another user leaves the cached index of its previous owner
+        """
+        other = create_user('other', 'super123*secure')
+        self.assertContains(self.client.get(reverse('DoIt:index')), 'list1')
+        lst = List.objects.get(pk=self.listest.pk)
+        lst.user = other
+        lst.save()
+        self.assertNotContains(self.client.get(reverse('DoIt:index')), 'list1')
+        list2 = create_list('list2', self.user)
+        self.assertContains(self.client.get(reverse('DoIt:index')), 'list2')
+        list2.user = other
+        list2.save()
+        self.assertNotContains(self.client.get(reverse('DoIt:index')), 'list2')
+
+    def test_index_follows_task_counters(self):
+        """
+        the counters shown on the cached index are updated when a task of the list changes
+        """
+        self.assertContains(self.client.get(reverse('DoIt:index')), '1 open, 0 done')
+        create_task('task2', self.listest, 5)
+        self.assertContains(self.client.get(reverse('DoIt:index')), '2 open, 0 done')
+        Task.objects.filter(list=self.listest).update(is_done=True)
+        self.assertContains(self.client.get(reverse('DoIt:index')), '0 open, 2 done')
+
+    def test_list_tasks_served_from_cache(self):
+        """
+        the list tasks page is cached per list and per page, and dropped when a task of the list changes
+        """
+        url = reverse('DoIt:tasks', kwargs={'pk': self.listest.id})
+        self.client.get(url)
+        # session, user and the time the list last changed
+        with self.assertNumQueries(3):
+            self.assertContains(self.client.get(url), 'task1')
+        self.assertEqual(self.client.get(url, {'page_size': 1}).context['paginator'].per_page, 1)
+
+        self.task.name = 'taskupdated'
+        self.task.save()
+        self.assertContains(self.client.get(url), 'taskupdated')
+        self.task.delete()
+        self.assertContains(self.client.get(url), 'No tasks available')
+
+    def test_other_list_doesnt_invalidate(self):
+        """
+        changing the tasks of a list doesn't drop the cached page of another list
+        """
+        other = create_list('list2', self.user)
+        url = reverse('DoIt:tasks', kwargs={'pk': self.listest.id})
+        self.client.get(url)
+        create_task('task2', other)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_messages_not_cached(self):
+        """
+        pages showing messages are rendered every time and never cached
+        """
+        self.client.get(reverse('DoIt:index'))
+        response = self.client.post(reverse('DoIt:new_list'), {'name': 'list2'}, follow=True)
+        self.assertContains(response, 'List list2 created successfully')
+        response = self.client.get(reverse('DoIt:index'))
+        self.assertNotContains(response, 'created successfully')
+        self.assertContains(response, 'list2')
+
+    def test_replica_reads_not_cached(self):
+        """
+        pages read from a replica, which may lag behind the versions, are rendered every time and never cached
+        """
+        with mock.patch('DoIt.page_cache.read_from_replica', return_value=True):
+            self.client.get(reverse('DoIt:index'))
+            with self.assertNumQueries(3):
+                self.client.get(reverse('DoIt:index'))
+        self.client.get(reverse('DoIt:index'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('DoIt:index'))
+
+
+class LocMemPageCacheTest(PageCacheTests, TestCase):
+    pass
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'doit-page-cache-tests'),
+}})
+class FileBasedPageCacheTest(PageCacheTests, TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super(FileBasedPageCacheTest, cls).tearDownClass()
+        shutil.rmtree(os.path.join(tempfile.gettempdir(), 'doit-page-cache-tests'), ignore_errors=True)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        caches[settings.DOIT_PAGE_CACHE].clear()
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        self.listest = create_list('list1', self.user)
+        self.task = create_task('task1', self.listest, 10)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_list_tasks_not_modified(self):
+        """
+        the list tasks page is answered with 304 from the time the list last changed, without the task query
+        """
+        url = reverse('DoIt:tasks', kwargs={'pk': self.listest.id})
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        # session, user and the time the list last changed
+        with CaptureQueriesContext(connection) as queries:
+            response = self.revalidate(url, response)
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('COUNT', queries[-1]['sql'])
+        self.assertNotIn('"open_task_count"', queries[-1]['sql'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_list_tasks_modified(self):
+        """
+        adding, editing or deleting a task, or renaming the list, changes the validators of the list tasks page
+        """
+        url = reverse('DoIt:tasks', kwargs={'pk': self.listest.id})
+        response = self.client.get(url)
+        task = create_task('task2', self.listest)
+        response = self.revalidate(url, response)
+        self.assertContains(response, 'task2')
+        Task.objects.filter(pk=task.pk).update(is_important=True)
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        task.delete()
+        response = self.revalidate(url, response)
+        self.assertNotContains(response, 'task2')
+        self.listest.name = 'renamed'
+        self.listest.save()
+        self.assertContains(self.revalidate(url, response), 'renamed')
+
+    def test_list_tasks_other_list_renamed(self):
+        """
+        renaming another list of the user changes the list tasks page, it's one of the lists to move tasks to
+        """
+        other = create_list('list2', self.user)
+        url = reverse('DoIt:tasks', kwargs={'pk': self.listest.id})
+        response = self.client.get(url)
+        other.name = 'renamed'
+        other.save()
+        self.assertContains(self.revalidate(url, response), 'renamed')
+
+    def test_task_details(self):
+        """
+        the task details page is answered with 304 until the task or its list change
+        """
+        url = reverse('DoIt:details', kwargs={'pk': self.task.id})
+        response = self.client.get(url)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.listest.name = 'renamed'
+        self.listest.save()
+        response = self.revalidate(url, response)
+        self.assertContains(response, 'renamed')
+        self.task.name = 'task2'
+        self.task.save()
+        self.assertContains(self.revalidate(url, response), 'task2')
+
+    def test_other_session(self):
+        """
+        a page isn't reused by another user, nor after logging out
+        """
+        url = reverse('DoIt:tasks', kwargs={'pk': self.listest.id})
+        response = self.client.get(url)
+        self.client.force_login(create_user('test2', 'super123*secure'))
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        self.assertEqual(self.revalidate(url, response).status_code, 404)
+        self.client.logout()
+        response = self.revalidate(url, response)
+        self.assertContains(response, 'Access Forbidden')
+        self.assertNotIn('ETag', response)
+
+    def test_unknown_task(self):
+        """
+        a task that doesn't exist is still not found
+        """
+        response = self.client.get(reverse('DoIt:details', kwargs={'pk': 999}), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
 class NewListTest(TestCase):
 
     def test_user_not_authenticated(self):
@@ -583,7 +1168,19 @@ class EditListTest(TestCase):
         self.assertTrue(response.context['user'].is_authenticated)
         self.assertEqual(response.context['object'], listest)
         self.assertContains(response, ' value="' + str(listest.name) + '"')
-        self.assertContains(response, 'selected>' + str(listest.user))
+        self.assertNotContains(response, 'name="user"')
+
+    def test_owner_not_changed(self):
+        """
+        only the name of the list can be edited, a user posted with it doesn't move the list to that user
+        """
+        user = create_user('test', 'super123*secure')
+        other = create_user('other', 'super123*secure')
+        self.client.force_login(user)
+        listest = create_list('list1', user)
+        self.client.post(reverse('DoIt:list_edit', kwargs={'pk': listest.id}), {'name': 'renamed', 'user': other.id})
+        listest.refresh_from_db()
+        self.assertEqual((listest.name, listest.user), ('renamed', user))
 
 
 class DeleteListTest(TestCase):
@@ -615,6 +1212,24 @@ class DeleteListTest(TestCase):
         self.assertEqual(len(messages), 1)
         self.assertEqual(str(messages[0]), 'List ' + str(listest.name) + ' deleted successfully')
 
+    def test_delete_in_chunks(self):
+        """
+        a list deleted in chunks loses its tasks chunk by chunk, their search entries included, and only its own
+        """
+        user = create_user('test', 'super123*secure')
+        listest = create_list('list1', user)
+        other = create_list('list2', user)
+        for i in range(5):
+            create_task('bread' + str(i), listest)
+        create_task('bread', other)
+        progress = []
+        self.assertEqual(listest.delete_in_chunks(chunk_size=2, progress=progress.append), 5)
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertFalse(List.objects.filter(id=listest.id).exists())
+        self.assertEqual(list(Task.objects.values_list('name', flat=True)), ['bread'])
+        if has_search_index():
+            self.assertEqual([task.name for task in search_tasks(Task.objects.all(), 'bread')], ['bread'])
+
 
 class NewTaskTest(TestCase):
 
@@ -679,6 +1294,864 @@ class NewTaskTest(TestCase):
         self.assertEqual(str(messages[1]), 'Task test2 created successfully')
 
 
+class ImportTasksTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.listest = create_list('list1', self.user)
+
+    def test_import_csv(self):
+        """
+        if every row is valid, tasks are created, page redirects to the list tasks with the message\
+        '*n* tasks imported, 0 rows with errors' and the counters of the list are updated
+        """
+        upload = SimpleUploadedFile('tasks.csv', b'name,time_it_takes,is_done,end_date\n'
+                                                 b'task1,10,false,2021-08-20\n'
+                                                 b'task2,5,true,\n')
+        response = self.client.post(reverse('DoIt:task_import', kwargs={'pk': self.listest.id}), {'file': upload})
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('DoIt:tasks', kwargs={'pk': self.listest.id}))
+        self.assertEqual(str(messages[0]), '2 tasks imported, 0 rows with errors')
+        self.assertSequenceEqual(Task.objects.filter(list=self.listest).order_by('id').values_list(
+            'name', 'time_it_takes', 'is_done'), [('task1', 10, False), ('task2', 5, True)])
+        self.listest.refresh_from_db()
+        self.assertEqual((self.listest.open_task_count, self.listest.done_task_count,
+                          self.listest.remaining_minutes), (1, 1, 10))
+
+    def test_import_jsonl_with_errors(self):
+        """
+        invalid rows are reported with their line number and don't stop the import of the valid ones
+        """
+        upload = SimpleUploadedFile('tasks.jsonl', b'{"name": "task1", "is_important": true}\n'
+                                                   b'{"name": ""}\n'
+                                                   b'not json\n'
+                                                   b'\n'
+                                                   b'{"name": "task2", "time_it_takes": "many"}\n'
+                                                   b'{"name": "task3"}\n')
+        response = self.client.post(reverse('DoIt:task_import', kwargs={'pk': self.listest.id}), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '2 tasks imported, 3 rows with errors')
+        self.assertContains(response, 'Line 2:')
+        self.assertContains(response, 'Line 3:')
+        self.assertContains(response, 'Line 5:')
+        self.assertEqual([line for line, errors in response.context['result'].errors], [2, 3, 5])
+        self.assertSequenceEqual(Task.objects.filter(list=self.listest).order_by('id').values_list(
+            'name', 'is_important'), [('task1', True), ('task3', None)])
+
+    def test_import_booleans(self):
+        """
+        yes or no columns can be written as true/false, 1/0 or yes/no, other values are errors of their row
+        """
+        upload = SimpleUploadedFile('tasks.csv', b'name,is_done,is_important\n'
+                                                 b'task1,1,yes\n'
+                                                 b'task2,0,No\n'
+                                                 b'task3,,TRUE\n'
+                                                 b'task4,maybe,1\n')
+        response = self.client.post(reverse('DoIt:task_import', kwargs={'pk': self.listest.id}), {'file': upload})
+        self.assertContains(response, '3 tasks imported, 1 row with errors')
+        self.assertEqual(response.context['result'].errors,
+                         [(5, {'is_done': ["'maybe' is not a yes or no value, use true or false"]})])
+        self.assertSequenceEqual(Task.objects.filter(list=self.listest).order_by('id').values_list(
+            'name', 'is_done', 'is_important'), [('task1', True, True), ('task2', False, False), ('task3', None, True)])
+
+    def test_errors_capped(self):
+        """
+        only the first rows with errors are kept in the result, the others are counted
+        """
+        stream = io.BytesIO(b'name,time_it_takes\n' + b''.join(b'task,x\n' if i % 2 else b'task,1\n' for i in range(300)))
+        result = import_tasks(self.listest, stream, 'csv')
+        self.assertEqual(len(result.errors), 100)
+        self.assertEqual(result.error_count, 150)
+        self.assertEqual(str(result), '150 tasks imported, 150 rows with errors')
+
+    def test_unknown_format(self):
+        """
+        if the format can't be guessed from the file name the page asks for it
+        """
+        upload = SimpleUploadedFile('tasks.txt', b'name\ntask1\n')
+        response = self.client.post(reverse('DoIt:task_import', kwargs={'pk': self.listest.id}), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Choose the format of the file')
+        self.assertFalse(Task.objects.exists())
+
+    def test_import_command(self):
+        """
+        the import_tasks command inserts the tasks in batches and reports the invalid rows
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('name,time_it_takes\n')
+            for i in range(25):
+                csv_file.write('task%d,%s\n' % (i, 'x' if i == 7 else i))
+        self.addCleanup(os.remove, csv_file.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_tasks', self.listest.id, csv_file.name, batch_size=10, stdout=stdout, stderr=stderr)
+        self.assertIn('24 tasks imported, 1 row with errors', stdout.getvalue())
+        self.assertIn('line 9: time_it_takes: Enter a whole number.', stderr.getvalue())
+        self.assertEqual(Task.objects.filter(list=self.listest).count(), 24)
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.list1 = create_list('list 1', self.user)
+        self.list2 = create_list('list 2', self.user)
+        create_task('task1', self.list1, 10, is_done=True)
+        create_task('task2', self.list1, is_important=True)
+        create_task('task3', self.list2, 5)
+        create_task('task4', create_list('other', create_user('other', 'super123*secure')))
+
+    def test_export_all_lists_csv(self):
+        """
+        export streams the tasks of every list of the user, and only of that user, as CSV
+        """
+        response = self.client.get(reverse('DoIt:export', kwargs={'file_format': 'csv'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            'list,name,description,is_done,start_date,end_date,time_it_takes,is_important,repeat,repeat_every,'
+            'repeat_until',
+            'list 1,task2,,,,,,True,,,',
+            'list 1,task1,,True,,,10,,,,',
+            'list 2,task3,,,,,5,,,,',
+        ])
+
+    def test_export_list_jsonl(self):
+        """
+        list export streams only the tasks of that list as JSON Lines
+        """
+        response = self.client.get(reverse('DoIt:list_export', kwargs={'pk': self.list2.id, 'file_format': 'jsonl'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="list-2.jsonl"')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows, [{
+            'list': 'list 2', 'name': 'task3', 'description': None, 'is_done': None, 'start_date': None,
+            'end_date': None, 'time_it_takes': 5, 'is_important': None, 'repeat': '', 'repeat_every': None,
+            'repeat_until': None,
+        }])
+
+    def test_export_can_be_imported(self):
+        """
+        a list exported as CSV can be imported back into another list
+        """
+        response = self.client.get(reverse('DoIt:list_export', kwargs={'pk': self.list1.id, 'file_format': 'csv'}))
+        upload = SimpleUploadedFile('list.csv', b''.join(response.streaming_content))
+        self.client.post(reverse('DoIt:task_import', kwargs={'pk': self.list2.id}), {'file': upload})
+        self.assertSequenceEqual(Task.objects.filter(list=self.list2).order_by('id').values_list(
+            'name', 'is_done', 'time_it_takes', 'is_important'),
+            [('task3', None, 5, None), ('task2', None, None, True), ('task1', True, 10, None)])
+
+    def test_export_not_allowed(self):
+        """
+        exports return 403 if user isn't logged in, 404 for lists of other users and unknown formats
+        """
+        other = List.objects.get(name='other')
+        response = self.client.get(reverse('DoIt:list_export', kwargs={'pk': other.id, 'file_format': 'csv'}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('DoIt:export', kwargs={'file_format': 'xml'}))
+        self.assertEqual(response.status_code, 404)
+        self.client.logout()
+        response = self.client.get(reverse('DoIt:export', kwargs={'file_format': 'csv'}))
+        self.assertEqual(response.status_code, 403)
+
+
+class DueTasksTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.list1 = create_list('list1', self.user)
+        self.list2 = create_list('list2', self.user)
+        today = timezone.localdate()
+
+        def due(name, lit, days, **kwargs):
+            return Task.objects.create(name=name, list=lit, end_date=today + datetime.timedelta(days=days), **kwargs)
+
+        self.overdue = due('overdue', self.list2, -3)
+        self.today = due('today', self.list1, 0, is_done=False)
+        self.soon = due('soon', self.list2, 7)
+        due('done', self.list1, 1, is_done=True)
+        due('later', self.list1, 8)
+        create_task('no date', self.list1)
+        due('other', create_list('other', create_user('other', 'super123*secure')), 1)
+
+    def get(self, **params):
+        return self.client.get(reverse('DoIt:due_tasks'), params)
+
+    def test_due_tasks(self):
+        """
+        the tasks not done of every list of the user that are overdue or due in the next 7 days, soonest first, \
+        are shown with their counts in a single query
+        """
+        # session, user, the tasks with their counts and the repeating tasks
+        with self.assertNumQueries(4):
+            response = self.get()
+        self.assertSequenceEqual(response.context['list_of_task'], [self.overdue, self.today, self.soon])
+        self.assertEqual(response.context['overdue_count'], 1)
+        self.assertEqual(response.context['due_soon_count'], 2)
+        self.assertContains(response, '1 overdue, 2 due in the next 7 days')
+        self.assertContains(response, 'list2')
+
+    def test_days(self):
+        """
+        the number of days ahead comes from the query string and is bounded
+        """
+        response = self.get(days=1)
+        self.assertSequenceEqual(response.context['list_of_task'], [self.overdue, self.today])
+        self.assertEqual(response.context['due_soon_count'], 1)
+        self.assertEqual(self.get(days=10000).context['days'], settings.DOIT_DUE_MAX_DAYS)
+        self.assertEqual(self.get(days='soon').context['days'], settings.DOIT_DUE_DAYS)
+
+    def test_pagination(self):
+        """
+        every page has the counts of all the tasks due, the next page link keeps the days
+        """
+        response = self.get(days=8, page_size=2)
+        self.assertContains(response, '?days=8&after=')
+        response = self.get(days=8, page_size=2, after=response.context['page_obj'].next_cursor)
+        self.assertEqual(len(response.context['list_of_task']), 2)
+        self.assertEqual(response.context['overdue_count'], 1)
+        self.assertEqual(response.context['due_soon_count'], 3)
+
+    def test_not_logged_in(self):
+        """
+        the due tasks are forbidden to anonymous users
+        """
+        self.client.logout()
+        self.assertContains(self.get(), 'Access Forbidden')
+
+
+class RecurrenceTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.list = create_list('list', self.user)
+        self.today = timezone.localdate()
+
+    def repeating(self, name, repeat, days=0, **kwargs):
+        kwargs.setdefault('list', self.list)
+        return Task.objects.create(name=name, repeat=repeat, end_date=self.today + datetime.timedelta(days=days),
+                                   **kwargs)
+
+    def test_occurrences(self):
+        """
+        occurrences are the task shifted by whole steps of the rule, months keep their day or end on the last one, \
+        and stop at the repeat until date
+        """
+        task = Task(name='rent', list=self.list, repeat=Task.MONTHLY, start_date=datetime.date(2025, 1, 20),
+                    end_date=datetime.date(2025, 1, 31))
+        dates = [(occurrence.start_date, occurrence.end_date)
+                 for occurrence in occurrences(task, task.end_date, datetime.date(2025, 4, 30))]
+        self.assertEqual(dates, [(datetime.date(2025, 2, 20), datetime.date(2025, 2, 28)),
+                                 (datetime.date(2025, 3, 20), datetime.date(2025, 3, 31)),
+                                 (datetime.date(2025, 4, 20), datetime.date(2025, 4, 30))])
+        task = Task(name='bins', list=self.list, repeat=Task.WEEKLY, repeat_every=2,
+                    start_date=datetime.date(2025, 1, 6), repeat_until=datetime.date(2025, 2, 10))
+        dates = [occurrence.start_date for occurrence in occurrences(task, task.start_date, datetime.date.max)]
+        self.assertEqual(dates, [datetime.date(2025, 1, 20), datetime.date(2025, 2, 3)])
+
+    def test_occurrences_far_from_the_first(self):
+        """
+        the occurrences after a date far from the first one are the same as walking the whole series
+        """
+        first = datetime.date(2020, 1, 31)
+        for repeat, every in ((Task.DAILY, 3), (Task.WEEKLY, 2), (Task.MONTHLY, 5)):
+            with self.subTest(repeat=repeat):
+                task = Task(name='task', list=self.list, repeat=repeat, repeat_every=every, end_date=first)
+                walked = [occurrence.end_date for occurrence in occurrences(task, first, datetime.date(2025, 6, 30))]
+                after = datetime.date(2024, 12, 31)
+                self.assertEqual([occurrence.end_date for occurrence in occurrences(
+                    task, after, datetime.date(2025, 6, 30))], [day for day in walked if day > after])
+
+    def test_repeat_needs_a_date(self):
+        """
+        a repeating task needs a start or an end date, the first one it repeats from
+        """
+        form = TaskForm({'name': 'task', 'repeat': Task.DAILY})
+        self.assertEqual(form.errors, {'repeat': ['A repeating task needs a start or an end date']})
+        form = TaskForm({'name': 'task', 'repeat': Task.DAILY, 'start_date': '2025-03-01'})
+        task = form.save(commit=False)
+        self.assertEqual(task.materialized_until, datetime.date(2025, 3, 1))
+        task.list = self.list
+        task.save()
+        form = TaskForm({'name': 'task', 'start_date': '2025-03-01'}, instance=task)
+        self.assertIsNone(form.save().materialized_until)
+
+    def test_due_tasks_show_upcoming_occurrences(self):
+        """
+        the due tasks page computes the occurrences of the repeating tasks from today to its last day without \
+        storing them, soonest first and at most a page of them
+        """
+        daily = self.repeating('daily', Task.DAILY)
+        weekly = self.repeating('weekly', Task.WEEKLY, -8)
+        self.repeating('other', Task.DAILY, list=create_list('other', create_user('other', 'super123*secure')))
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('DoIt:due_tasks'), {'days': 3})
+        self.assertEqual([(task.series_id, task.end_date) for task in response.context['upcoming']],
+                         [(daily.id, self.today + datetime.timedelta(days=1)),
+                          (daily.id, self.today + datetime.timedelta(days=2)),
+                          (daily.id, self.today + datetime.timedelta(days=3))])
+        self.assertContains(response, 'Coming up from repeating tasks')
+        self.assertContains(response, reverse('DoIt:details', kwargs={'pk': daily.id}))
+        response = self.client.get(reverse('DoIt:due_tasks'), {'days': 365, 'page_size': 5})
+        self.assertEqual(len(response.context['upcoming']), 5)
+        response = self.client.get(reverse('DoIt:due_tasks'), {'days': 7})
+        shown = [(task.series_id, task.end_date) for task in response.context['upcoming']]
+        self.assertIn((weekly.id, self.today + datetime.timedelta(days=6)), shown)
+        self.assertNotIn((weekly.id, self.today - datetime.timedelta(days=1)), shown)
+        self.assertEqual(Task.objects.count(), 3)
+
+    def test_materialize_occurrences(self):
+        """
+        the command stores the occurrences of the next days as tasks, counted and searchable, and running it \
+        again stores nothing more
+        """
+        daily = self.repeating('water the plants', Task.DAILY, time_it_takes=5)
+        self.repeating('rent', Task.MONTHLY)
+        self.repeating('ended', Task.DAILY, -10, repeat_until=self.today - datetime.timedelta(days=8))
+        out = StringIO()
+        call_command('materialize_occurrences', days=3, stdout=out)
+        self.assertIn('Stored 5 occurrences', out.getvalue())
+        stored = Task.objects.filter(series=daily).order_by('end_date')
+        self.assertEqual([task.end_date for task in stored],
+                         [self.today + datetime.timedelta(days=days) for days in (1, 2, 3)])
+        self.assertEqual(Task.objects.filter(series__name='ended').count(), 2)
+        self.assertIsNone(stored[0].materialized_until)
+        self.list.refresh_from_db()
+        self.assertEqual((self.list.open_task_count, self.list.remaining_minutes), (8, 20))
+        self.assertEqual(search_tasks(Task.objects.all(), 'plants').count(), 4)
+        call_command('materialize_occurrences', days=3, stdout=out)
+        self.assertIn('Stored 0 occurrences', out.getvalue())
+        response = self.client.get(reverse('DoIt:due_tasks'), {'days': 3})
+        self.assertEqual(response.context['upcoming'], [])
+
+    def test_materialize_in_bulk(self):
+        """
+        the occurrences of many repeating tasks are stored with a few queries per batch, not per task
+        """
+        for number in range(100):
+            self.repeating('task %d' % number, Task.DAILY)
+        with CaptureQueriesContext(connection) as queries:
+            created = materialize(self.today + datetime.timedelta(days=14), batch_size=50)
+        self.assertEqual(created, 1400)
+        # inserts of as many tasks as SQLite takes parameters, and per batch the series, counters and stamps
+        self.assertLess(len(queries), 50)
+
+
+class TaskSearchTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.listest = create_list('list1', self.user)
+        self.bread = Task.objects.create(name='Comprar pão', description='na padaria', list=self.listest)
+        self.milk = Task.objects.create(name='Buy milk', description='and bread', list=self.listest)
+        create_task('bread', create_list('other', create_user('other', 'super123*secure')))
+
+    def search(self, query, **params):
+        return self.client.get(reverse('DoIt:task_search'), dict(params, q=query))
+
+    def results(self, query):
+        return list(search_tasks(Task.objects.filter(list__user=self.user), query).order_by('search_rank', 'id'))
+
+    def test_search(self):
+        """
+        search finds the tasks of the user by a word of their name or description, names rank first
+        """
+        response = self.search('bread')
+        self.assertEqual(response.status_code, 200)
+        self.assertSequenceEqual(response.context['results'], [self.milk])
+        self.assertContains(response, 'list1')
+        self.assertEqual(self.results('pao'), [self.bread])
+        self.assertEqual(self.results('padaria comprar'), [self.bread])
+        self.assertEqual(self.results('b'), [self.milk])
+        self.assertEqual(self.results('milk padaria'), [])
+
+    @skipUnless(has_search_index(), 'needs SQLite with FTS5')
+    def test_ranking(self):
+        """
+        tasks matching by their name rank before tasks matching by their description
+        """
+        task = create_task('milk the cow', self.listest)
+        self.milk.name = 'Buy bread'
+        self.milk.description = 'and milk'
+        self.milk.save()
+        self.assertEqual(self.results('milk'), [task, self.milk])
+
+    def test_index_follows_changes(self):
+        """
+        tasks are found after being created in bulk, updated in bulk or edited, and not after being deleted
+        """
+        Task.objects.bulk_create([Task(name='cheese', list=self.listest)])
+        self.assertEqual(len(self.results('cheese')), 1)
+        Task.objects.filter(name='cheese').update(name='butter')
+        self.assertEqual(self.results('cheese'), [])
+        self.assertEqual(len(self.results('butter')), 1)
+        self.milk.description = 'cheese'
+        self.milk.save()
+        self.assertEqual(self.results('cheese'), [self.milk])
+        self.milk.delete()
+        self.assertEqual(self.results('cheese'), [])
+        self.listest.delete()
+        self.assertEqual(self.results('butter'), [])
+
+    def test_query_syntax_is_literal(self):
+        """
+        quotes and search operators typed by the user are searched as words, not errors
+        """
+        self.assertEqual(self.search('"bread OR NOT (milk*').status_code, 200)
+        self.assertEqual(self.results('milk NOT'), [])
+        self.assertSequenceEqual(self.search('').context['results'], [])
+
+    @skipUnless(has_search_index(), 'needs SQLite with FTS5')
+    def test_uses_search_index(self):
+        """
+        search is answered from the FTS5 index, without scanning the tasks
+        """
+        plan = search_tasks(Task.objects.filter(list__user=self.user), 'bread').explain()
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+        self.assertNotIn('SCAN DoIt_task', plan)
+
+    def test_fallback(self):
+        """
+        without the FTS5 index search falls back to matching every word anywhere in the name or description
+        """
+        with mock.patch('DoIt.search.has_search_index', return_value=False):
+            self.assertEqual(self.results('brea'), [self.milk])
+            self.assertEqual(self.results('pão padaria'), [self.bread])
+
+    def test_pagination(self):
+        """
+        results are paginated with a cursor that keeps the query
+        """
+        create_task('Buy eggs', self.listest)
+        response = self.search('buy', page_size=1)
+        self.assertEqual(len(response.context['results']), 1)
+        self.assertContains(response, '?q=buy&after=')
+        response = self.search('buy', page_size=1, after=response.context['page_obj'].next_cursor)
+        self.assertEqual(len(response.context['results']), 1)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_not_logged_in(self):
+        """
+        search is forbidden to anonymous users
+        """
+        self.client.logout()
+        self.assertContains(self.search('bread'), 'Access Forbidden')
+
+
+class TaskBulkActionTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.list1 = create_list('list1', self.user)
+        self.list2 = create_list('list2', self.user)
+        self.tasks = [create_task('task' + str(i), self.list1, 10) for i in range(4)]
+        self.other = create_task('other', create_list('other', create_user('other', 'super123*secure')), 10)
+        self.url = reverse('DoIt:task_bulk', kwargs={'pk': self.list1.id})
+
+    def post(self, action, tasks, **data):
+        return self.client.post(self.url, dict(data, action=action, tasks=[task.id for task in tasks]))
+
+    def test_mark_done(self):
+        """
+        marking tasks as done updates them in one statement, updates the counters of the list\
+        and redirects to the list tasks with the message 'Mark as done: *n* tasks'
+        """
+        # session, user, list ids, update, counters and the savepoint around them
+        with self.assertNumQueries(7):
+            response = self.post('done', self.tasks[:2])
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('DoIt:tasks', kwargs={'pk': self.list1.id}))
+        self.assertEqual(str(messages[0]), 'Mark as done: 2 tasks')
+        self.assertEqual(Task.objects.filter(is_done=True).count(), 2)
+        self.list1.refresh_from_db()
+        self.assertEqual((self.list1.open_task_count, self.list1.done_task_count,
+                          self.list1.remaining_minutes), (2, 2, 20))
+
+    def test_mark_important(self):
+        """
+        marking tasks as important is a single update and doesn't touch the counters
+        """
+        # session, user, lists and users of the tasks, update, stamping the list as changed
+        # and the savepoint around them
+        with self.assertNumQueries(7):
+            self.post('important', self.tasks[1:3])
+        self.assertSequenceEqual(Task.objects.filter(is_important=True).order_by('id'), self.tasks[1:3])
+
+    def test_delete(self):
+        """
+        deleting tasks removes only the selected ones and updates the counters of the list
+        """
+        self.post('delete', self.tasks[:3])
+        self.assertSequenceEqual(Task.objects.filter(list=self.list1), self.tasks[3:])
+        self.list1.refresh_from_db()
+        self.assertEqual((self.list1.open_task_count, self.list1.remaining_minutes), (1, 10))
+
+    def test_move(self):
+        """
+        moving tasks to another list of the user updates the counters of both lists
+        """
+        self.post('move', self.tasks[:3], target=self.list2.id)
+        self.assertEqual(Task.objects.filter(list=self.list2).count(), 3)
+        self.list1.refresh_from_db()
+        self.list2.refresh_from_db()
+        self.assertEqual((self.list1.open_task_count, self.list2.open_task_count), (1, 3))
+        self.assertEqual((self.list1.remaining_minutes, self.list2.remaining_minutes), (10, 30))
+
+    def test_move_goes_last(self):
+        """
+        moved tasks are added after the tasks of the other list in "My order", in the order they had
+        """
+        others = [create_task('list2 task' + str(i), self.list2, 10) for i in range(2)]
+        self.post('move', [self.tasks[2], self.tasks[0]], target=self.list2.id)
+        response = self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.list2.id}), {'sort': 'position'})
+        self.assertEqual([task.name for task in response.context['list_of_task']],
+                         [others[0].name, others[1].name, 'task0', 'task2'])
+        positions = Task.objects.filter(list=self.list2).values_list('position', flat=True)
+        self.assertEqual(len(set(positions)), 4)
+
+    def test_other_users_tasks_and_lists(self):
+        """
+        tasks and lists of other users are never touched
+        """
+        self.post('done', [self.other, self.tasks[0]])
+        self.assertSequenceEqual(Task.objects.filter(is_done=True), [self.tasks[0]])
+        response = self.post('move', self.tasks, target=self.other.list_id)
+        messages = list(get_messages(response.wsgi_request))
+        self.assertIn('Select a valid choice', str(messages[-1]))
+        self.assertEqual(Task.objects.filter(list=self.other.list_id).count(), 1)
+
+    def test_not_allowed(self):
+        """
+        GET returns 405 and users not logged in get 403
+        """
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.post('delete', self.tasks).status_code, 403)
+        self.assertEqual(Task.objects.count(), 5)
+
+
+class TaskOrderTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.list = create_list('list', self.user)
+        self.tasks = [create_task('task' + str(i), self.list) for i in range(5)]
+
+    def order(self):
+        return list(Task.objects.filter(list=self.list).order_by('position', 'id').values_list('name', flat=True))
+
+    def move(self, task, **data):
+        return self.client.post(reverse('DoIt:task_move', kwargs={'pk': task.id}),
+                                {name: neighbour.id for name, neighbour in data.items()})
+
+    def test_new_tasks_go_last(self):
+        """
+        tasks are added at the end of the order of their list, a gap apart, created one by one or in bulk
+        """
+        gap = settings.DOIT_POSITION_GAP
+        self.assertEqual([task.position for task in self.tasks], [gap * i for i in range(1, 6)])
+        Task.objects.bulk_create([Task(name='bulk' + str(i), list_id=self.list.id) for i in range(2)])
+        self.assertEqual(self.order()[-2:], ['bulk0', 'bulk1'])
+        self.assertEqual(Task.objects.get(name='bulk1').position, gap * 7)
+
+    def test_changing_list_goes_last(self):
+        """
+        a task saved in another list is added at the end of its order
+        """
+        other = create_list('other', self.user)
+        create_task('first', other)
+        self.tasks[0].list = other
+        self.tasks[0].save()
+        self.assertEqual(list(Task.objects.filter(list=other).order_by('position', 'id').values_list(
+            'name', flat=True)), ['first', 'task0'])
+        self.tasks[1].list_id = other.id
+        self.tasks[1].save(update_fields=['list'])
+        self.tasks[1].refresh_from_db()
+        self.assertEqual(self.tasks[1].position, settings.DOIT_POSITION_GAP * 3)
+
+    def test_move_is_a_single_row_update(self):
+        """
+        a task moved between two others takes the middle of their positions, only its row is written
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.move(self.tasks[4], after=self.tasks[0])
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "DoIt_task"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('WHERE "DoIt_task"."id" = %d' % self.tasks[4].id, updates[0])
+        self.assertRedirects(response, reverse('DoIt:tasks', kwargs={'pk': self.list.id}) + '?sort=position')
+        self.assertEqual(self.order(), ['task0', 'task4', 'task1', 'task2', 'task3'])
+        self.move(self.tasks[2], before=self.tasks[0])
+        self.move(self.tasks[0])
+        self.move(self.tasks[1], after=self.tasks[3])
+        self.assertEqual(self.order(), ['task0', 'task2', 'task4', 'task3', 'task1'])
+
+    def test_move_after_stale_neighbour(self):
+        """
+        the position of the neighbour is read again in the transaction of the move, a copy loaded earlier is enough
+        """
+        stale = Task.objects.get(pk=self.tasks[1].pk)
+        self.tasks[1].move(after=self.tasks[3])
+        self.assertFalse(self.tasks[4].move(after=stale))
+        self.assertEqual(self.order(), ['task0', 'task2', 'task3', 'task1', 'task4'])
+        Task.objects.filter(pk=self.tasks[0].pk).delete()
+        self.assertFalse(self.tasks[2].move(after=self.tasks[0]))
+        self.assertEqual(self.order(), ['task2', 'task3', 'task1', 'task4'])
+
+    def test_move_without_room(self):
+        """
+        when two neighbours have no room left between them the list is spread out again first
+        """
+        Task.objects.filter(list=self.list).update(position=F('id'))
+        self.move(self.tasks[4], after=self.tasks[1])
+        self.assertEqual(self.order(), ['task0', 'task1', 'task4', 'task2', 'task3'])
+        positions = Task.objects.filter(list=self.list).order_by('position').values_list('position', flat=True)
+        self.assertEqual(min(b - a for a, b in zip(positions, positions[1:])), settings.DOIT_POSITION_GAP // 2)
+
+    def test_rebalance_in_background(self):
+        """
+        once moves leave little room between tasks a rebalance of the list is queued once, which spreads the \
+        positions again in the same order without changing the tasks
+        """
+        for _ in range(12):
+            self.move(self.tasks[4], after=self.tasks[0])
+            self.move(self.tasks[3], after=self.tasks[0])
+        job = Job.objects.get()
+        self.assertEqual((job.kind, job.arguments), ('rebalance_list', {'list': self.list.id}))
+        order = self.order()
+        updated = dict(Task.objects.values_list('id', 'updated_at'))
+        jobs.run(Job.objects.claim())
+        self.assertEqual(self.order(), order)
+        positions = Task.objects.filter(list=self.list).order_by('position').values_list('position', flat=True)
+        self.assertEqual(list(positions), [settings.DOIT_POSITION_GAP * i for i in range(1, 6)])
+        self.assertEqual(dict(Task.objects.values_list('id', 'updated_at')), updated)
+
+    def test_move_not_allowed(self):
+        """
+        tasks of other users are not found, and tasks can only be moved next to tasks of their list
+        """
+        other = create_task('other', create_list('other', create_user('other', 'super123*secure')))
+        self.assertEqual(self.move(other, after=self.tasks[0]).status_code, 404)
+        response = self.move(self.tasks[0], after=other)
+        self.assertIn('Select a valid choice', str(list(get_messages(response.wsgi_request))[0]))
+        self.move(self.tasks[0], after=self.tasks[1], before=self.tasks[2])
+        self.assertEqual(self.order(), ['task0', 'task1', 'task2', 'task3', 'task4'])
+
+    def test_list_in_manual_order(self):
+        """
+        the list tasks can be shown in the order of the user, where they can be dragged
+        """
+        self.move(self.tasks[3])
+        response = self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.list.id}), {'sort': 'position'})
+        self.assertEqual([task.name for task in response.context['list_of_task']],
+                         ['task3', 'task0', 'task1', 'task2', 'task4'])
+        self.assertContains(response, 'draggable="true"', count=5)
+        response = self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.list.id}))
+        self.assertNotContains(response, 'draggable')
+
+
+class ApiTest(TestCase):
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.list1 = create_list('list1', self.user)
+        self.tasks = [create_task('task' + str(i), self.list1, i, is_important=i == 2) for i in range(5)]
+        self.other = create_task('other', create_list('other', create_user('other', 'super123*secure')))
+
+    def send(self, method, url, data):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+    def test_list_tasks_pages(self):
+        """
+        tasks are listed with the ordering and cursor of the list tasks page, and only the fields asked for
+        """
+        url = reverse('DoIt:api_list_tasks', kwargs={'pk': self.list1.id})
+        response = self.client.get(url, {'page_size': 3, 'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['results'], [{'id': task.id, 'name': task.name}
+                                           for task in [self.tasks[2], self.tasks[0], self.tasks[1]]])
+        response = self.client.get(url, {'page_size': 3, 'fields': 'name', 'after': data['next']})
+        self.assertEqual(response.json(), {'results': [{'name': 'task3'}, {'name': 'task4'}], 'next': None})
+
+    def test_lists_of_user(self):
+        """
+        lists returns only the lists of the user with their counters
+        """
+        response = self.client.get(reverse('DoIt:api_lists'))
+        self.assertEqual(response.json(), {'results': [{
+            'id': self.list1.id, 'name': 'list1', 'open_task_count': 5, 'done_task_count': 0,
+            'remaining_minutes': 10,
+        }], 'next': None})
+
+    def test_etag(self):
+        """
+        GET responses have an ETag, asking again with If-None-Match returns 304 until the content changes
+        """
+        url = reverse('DoIt:api_task', kwargs={'pk': self.tasks[0].id})
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.send('patch', url, {'is_done': True})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(response.json()['is_done'], True)
+
+    def test_create_update_delete(self):
+        """
+        tasks and lists can be created, updated and deleted, invalid data returns 400 with the errors
+        """
+        response = self.send('post', reverse('DoIt:api_lists'), {'name': 'list2'})
+        self.assertEqual(response.status_code, 201)
+        list2 = List.objects.get(id=response.json()['id'])
+        self.assertEqual(list2.user, self.user)
+
+        url = reverse('DoIt:api_list_tasks', kwargs={'pk': list2.id})
+        response = self.send('post', url, {'name': 'new', 'time_it_takes': 15, 'end_date': '2021-08-20'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['end_date'], '2021-08-20')
+        task_url = reverse('DoIt:api_task', kwargs={'pk': response.json()['id']})
+        self.assertEqual(self.send('post', url, {'name': ''}).json()['errors']['name'][0]['code'], 'required')
+
+        response = self.send('patch', task_url, {'name': 'renamed'})
+        self.assertEqual(response.json()['name'], 'renamed')
+        self.assertEqual(response.json()['time_it_takes'], 15)
+        response = self.send('put', task_url, {'name': 'replaced'})
+        self.assertIsNone(response.json()['time_it_takes'])
+        self.send('patch', reverse('DoIt:api_list', kwargs={'pk': list2.id}), {'name': 'list3'})
+        self.assertEqual(List.objects.get(id=list2.id).name, 'list3')
+
+        self.assertEqual(self.client.delete(task_url).status_code, 204)
+        self.assertEqual(self.client.delete(reverse('DoIt:api_list', kwargs={'pk': list2.id})).status_code, 204)
+        self.assertFalse(List.objects.filter(id=list2.id).exists())
+
+    def test_not_allowed(self):
+        """
+        objects of other users return 404, unknown fields and bad cursors 400 and users not logged in 403
+        """
+        self.assertEqual(self.client.get(reverse('DoIt:api_task', kwargs={'pk': self.other.id})).status_code, 404)
+        self.assertEqual(self.send('post', reverse('DoIt:api_list_tasks', kwargs={'pk': self.other.list_id}),
+                                   {'name': 'task'}).status_code, 404)
+        response = self.client.get(reverse('DoIt:api_lists'), {'fields': 'id,user'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'detail': 'Unknown fields: user'})
+        self.assertEqual(self.client.get(reverse('DoIt:api_lists'), {'after': 'bad'}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('DoIt:api_lists')).status_code, 403)
+
+    def test_cursor_wrong_types(self):
+        """
+        cursors whose values don't fit the fields of the ordering return 400
+        """
+        for url, values in [(reverse('DoIt:api_lists'), ['x']), (reverse('DoIt:api_lists'), [[1]]),
+                            (reverse('DoIt:api_list_tasks', kwargs={'pk': self.list1.id}), ['x', 1]),
+                            (reverse('DoIt:api_list_tasks', kwargs={'pk': self.list1.id}), [True, 'abc'])]:
+            response = self.client.get(url, {'after': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+            self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+
+class AsyncViewsTest(TestCase):
+    """
+    The read pages served under ASGI, where they run on the event loop and read with the async ORM.
+    """
+
+    def setUp(self):
+        caches[settings.DOIT_PAGE_CACHE].clear()
+        self.user = create_user('test', 'super123*secure')
+        self.async_client.force_login(self.user)
+        self.list1 = create_list('list1', self.user)
+        self.tasks = [create_task('task' + str(i), self.list1, i, is_important=i == 2) for i in range(3)]
+        self.other = create_list('other', create_user('other', 'super123*secure'))
+
+    async def test_index(self):
+        """
+        the index lists the lists of the user
+        """
+        response = await self.async_client.get(reverse('DoIt:index'))
+        self.assertContains(response, 'list1')
+        self.assertNotContains(response, 'other')
+
+    async def test_list_tasks(self):
+        """
+        the list tasks page is paginated and answered with 304 once the browser has it
+        """
+        url = reverse('DoIt:tasks', kwargs={'pk': self.list1.id})
+        self.async_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        response = await self.async_client.get(url, {'page_size': 2})
+        self.assertEqual([task.name for task in response.context['list_of_task']], ['task2', 'task0'])
+        self.assertEqual(response.context['task_stats']['remaining_time'], 3)
+        self.assertTrue(response.context['page_obj'].has_next())
+        response = await self.async_client.get(url, {'page_size': 2}, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_task_details(self):
+        """
+        the task details page shows the task, missing tasks are 404
+        """
+        response = await self.async_client.get(reverse('DoIt:details', kwargs={'pk': self.tasks[1].id}))
+        self.assertContains(response, 'task1')
+        response = await self.async_client.get(reverse('DoIt:details', kwargs={'pk': self.tasks[2].id + 1}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_api(self):
+        """
+        the API lists and retrieves the objects of the user only, and still writes
+        """
+        response = await self.async_client.get(reverse('DoIt:api_list_tasks', kwargs={'pk': self.list1.id}),
+                                               {'fields': 'name'})
+        self.assertEqual(response.json()['results'], [{'name': 'task2'}, {'name': 'task0'}, {'name': 'task1'}])
+        response = await self.async_client.get(reverse('DoIt:api_list_tasks', kwargs={'pk': self.other.id}))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse('DoIt:api_task', kwargs={'pk': self.tasks[0].id}))
+        self.assertEqual(response.json()['name'], 'task0')
+        response = await self.async_client.post(reverse('DoIt:api_lists'), {'name': 'new'},
+                                                content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        # the writer keeps reading from the default database
+        self.assertIn(routers.PRIMARY_COOKIE, response.cookies)
+        self.assertTrue(await List.objects.filter(user=self.user, name='new').aexists())
+
+    async def test_export_streams_async(self):
+        """
+        exports are streamed from an async iterator under ASGI
+        """
+        response = await self.async_client.get(reverse('DoIt:export', kwargs={'file_format': 'csv'}))
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content.decode().splitlines(), [
+            'list,name,description,is_done,start_date,end_date,time_it_takes,is_important,repeat,repeat_every,'
+            'repeat_until',
+            'list1,task2,,,,,2,True,,,',
+            'list1,task0,,,,,0,False,,,',
+            'list1,task1,,,,,1,False,,,',
+        ])
+
+    def test_loadtest_pages(self):
+        """
+        the load test reads pages the user can see, and reports latency percentiles
+        """
+        self.client.force_login(self.user)
+        for name, path in read_pages(self.user).items():
+            with self.subTest(page=name):
+                self.assertEqual(self.client.get(path).status_code, 200)
+        self.assertEqual(percentiles([float(ms) for ms in range(1, 101)]),
+                         {'p50': 50.5, 'p95': 95.05, 'p99': 99.01, 'max': 100.0})
+
+
 class EditTaskTest(TestCase):
 
     def test_user_not_authenticated(self):
@@ -740,3 +2213,968 @@ class DeleteTaskTest(TestCase):
         self.assertEqual(response.url, reverse('DoIt:tasks', kwargs={'pk': listest.id}))
         self.assertEqual(len(messages), 1)
         self.assertEqual(str(messages[0]), 'Task ' + str(task.name) + ' deleted successfully')
+
+
+@override_settings(DOIT_DB_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(TestCase):
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.listest = create_list('list1', self.user)
+        routers._unhealthy_until.clear()
+
+    def in_request(self, primary=False):
+        state = routers.RequestState(primary)
+        token = routers._request_state.set(state)
+        self.addCleanup(routers._request_state.reset, token)
+        return state
+
+    def test_reads_round_robin(self):
+        """
+        reads of DoIt models during a request go to the replicas in turn
+        """
+        self.in_request()
+        with mock.patch('DoIt.routers.is_healthy', return_value=True):
+            aliases = {self.router.db_for_read(Task) for _ in range(4)}
+        self.assertEqual(aliases, {'replica1', 'replica2'})
+
+    def test_primary_reads(self):
+        """
+        other apps, management commands and requests pinned to the primary read from the default database
+        """
+        with mock.patch('DoIt.routers.is_healthy', return_value=True):
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+            self.in_request()
+            self.assertEqual(self.router.db_for_read(User), 'default')
+            self.in_request(primary=True)
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    def test_write_pins_request(self):
+        """
+        after a write, the rest of the request reads from the default database
+        """
+        state = self.in_request()
+        self.assertEqual(self.router.db_for_write(Task), 'default')
+        self.assertTrue(state.wrote)
+        with mock.patch('DoIt.routers.is_healthy', return_value=True):
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    def test_replica_reads_recorded(self):
+        """
+        the request remembers it read from a replica, not when the reads went to the default database
+        """
+        self.in_request()
+        with mock.patch('DoIt.routers.is_healthy', return_value=False):
+            self.router.db_for_read(Task)
+        self.assertFalse(routers.read_from_replica())
+        with mock.patch('DoIt.routers.is_healthy', return_value=True):
+            self.router.db_for_read(Task)
+        self.assertTrue(routers.read_from_replica())
+
+    def test_unhealthy_replica_skipped(self):
+        """
+        a replica that can't be connected to is skipped, and the default database used when none is left
+        """
+        self.in_request()
+        with mock.patch('DoIt.routers.is_healthy', side_effect=lambda alias: alias == 'replica2'):
+            self.assertEqual({self.router.db_for_read(Task) for _ in range(4)}, {'replica2'})
+        with mock.patch('DoIt.routers.is_healthy', return_value=False):
+            self.assertEqual(self.router.db_for_read(Task), 'default')
+
+    def test_health_check_retry(self):
+        """
+        a database that fails to connect isn't tried again until DOIT_REPLICA_RETRY_SECONDS passed
+        """
+        with mock.patch.object(connection, 'ensure_connection', side_effect=OperationalError) as ensure:
+            self.assertFalse(routers.is_healthy('default'))
+            self.assertFalse(routers.is_healthy('default'))
+            self.assertEqual(ensure.call_count, 1)
+        routers._unhealthy_until['default'] = 0
+        self.assertTrue(routers.is_healthy('default'))
+
+    def test_read_your_writes(self):
+        """
+        a user who wrote reads from the default database for a while, others keep reading from the replicas
+        """
+        with mock.patch('DoIt.routers.choose_replica', return_value='default') as choose:
+            self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.listest.id}))
+            self.assertTrue(choose.called)
+            response = self.client.post(reverse('DoIt:new_task', kwargs={'pk': self.listest.id}), {'name': 'task'})
+            cookie = response.cookies[routers.PRIMARY_COOKIE]
+            self.assertEqual(cookie['max-age'], settings.DOIT_READ_YOUR_WRITES_SECONDS)
+            choose.reset_mock()
+            self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.listest.id}))
+            self.assertFalse(choose.called)
+
+    def test_replicas_not_migrated(self):
+        """
+        migrations only run on the default database, the replicas get the schema from it
+        """
+        self.assertFalse(self.router.allow_migrate('replica1', 'DoIt'))
+        self.assertIsNone(self.router.allow_migrate('default', 'DoIt'))
+
+    def test_sync_replicas(self):
+        """
+        the stand-in replication copies an SQLite database file over another
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source, target = os.path.join(directory, 'db.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(source) as database:
+            database.execute('CREATE TABLE t (name TEXT)')
+            database.execute("INSERT INTO t VALUES ('task')")
+        copy_sqlite_database(source, sqlite_path('file:%s?mode=ro' % target))
+        with sqlite3.connect(target) as database:
+            self.assertEqual(database.execute('SELECT name FROM t').fetchall(), [('task',)])
+
+
+class ProfilingTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.log = os.path.join(directory, 'profiling.jsonl')
+        settings_override = override_settings(DOIT_PROFILING=True, DOIT_PROFILING_LOG=self.log)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # the connection was opened before profiling was on
+        profiling.install_query_recorder(sender=None, connection=connection)
+        self.addCleanup(connection.execute_wrappers.remove, profiling.record_query)
+        self.client = Client()
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.listest = create_list('list1', self.user)
+        create_task('task1', self.listest, 10)
+
+    def records(self):
+        with open(self.log) as log:
+            return [json.loads(line) for line in log]
+
+    def test_server_timing(self):
+        """
+        responses carry the wall, database and template time and the number of queries in a Server-Timing header
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.listest.id}))
+        self.assertRegex(response['Server-Timing'],
+                         r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="%d queries", template;dur=[\d.]+$' % len(queries))
+
+    def test_records_by_url_name(self):
+        """
+        every request is logged with its URL name, timings and slowest statements, slowest first
+        """
+        self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.listest.id}))
+        self.client.get(reverse('DoIt:index'))
+        tasks, index = self.records()
+        self.assertEqual((tasks['view'], tasks['method'], tasks['status']), ('DoIt:tasks', 'GET', 200))
+        self.assertEqual(index['view'], 'DoIt:index')
+        self.assertGreater(tasks['template_ms'], 0)
+        self.assertGreaterEqual(tasks['total_ms'], tasks['db_ms'])
+        self.assertEqual(len(tasks['slowest']), min(tasks['queries'], settings.DOIT_PROFILING_SLOW_QUERIES))
+        milliseconds = [ms for ms, sql in tasks['slowest']]
+        self.assertEqual(milliseconds, sorted(milliseconds, reverse=True))
+
+    async def test_async_views(self):
+        """
+        the queries of async views under ASGI, run in other threads, are counted too
+        """
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get(reverse('DoIt:tasks', kwargs={'pk': self.listest.id}))
+        self.assertIn('Server-Timing', response)
+        record, = self.records()
+        self.assertEqual(record['view'], 'DoIt:tasks')
+        # the session, the user, the page of tasks and the stats
+        self.assertGreaterEqual(record['queries'], 4)
+
+    def test_streamed_responses(self):
+        """
+        the queries of a streamed export are counted once the content is read
+        """
+        response = self.client.get(reverse('DoIt:export', kwargs={'file_format': 'csv'}))
+        self.assertFalse(os.path.exists(self.log))
+        b''.join(response.streaming_content)
+        record, = self.records()
+        self.assertEqual(record['view'], 'DoIt:export')
+        # the session, the user, the lists and the tasks of the list
+        self.assertEqual(record['queries'], 4)
+
+    def test_disabled_by_default(self):
+        """
+        without DOIT_PROFILING there is no Server-Timing header nor log
+        """
+        with override_settings(DOIT_PROFILING=False):
+            client = Client()
+            client.force_login(self.user)
+            response = client.get(reverse('DoIt:index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_profile_report(self):
+        """
+        profile_report summarizes the log per view, with a histogram of the wall time
+        """
+        for _ in range(3):
+            self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.listest.id}))
+        self.client.get(reverse('DoIt:index'))
+        stdout = StringIO()
+        call_command('profile_report', '--json', '--top', '2', stdout=stdout)
+        summary = json.loads(stdout.getvalue())
+        self.assertEqual(set(summary), {'DoIt:tasks', 'DoIt:index'})
+        self.assertEqual(summary['DoIt:tasks']['requests'], 3)
+        self.assertEqual(sum(summary['DoIt:tasks']['histogram_ms'].values()), 3)
+        self.assertLessEqual(len(summary['DoIt:tasks']['slowest_sql']), 2)
+        stdout = StringIO()
+        call_command('profile_report', '--view', 'DoIt:index', '--clear', stdout=stdout)
+        self.assertIn('DoIt:index', stdout.getvalue())
+        self.assertNotIn('DoIt:tasks', stdout.getvalue())
+        self.assertEqual(self.records(), [])
+
+
+@override_settings(DOIT_METRICS_TOKEN='secret')
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        caches[settings.DOIT_PAGE_CACHE].clear()
+        metrics.registry.clear()
+        self.user = create_user('test', 'super123*secure')
+        self.listest = create_list('list1', self.user)
+        create_task('task1', self.listest, 10, is_done=True)
+        create_task('task2', self.listest, 5)
+
+    def scrape(self):
+        response = Client().get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode().splitlines()
+
+    def test_requests_and_latency(self):
+        """
+        requests are counted by URL name, method and status, with a latency histogram and their queries
+        """
+        self.client.force_login(self.user)
+        self.client.get(reverse('DoIt:index'))
+        self.client.get(reverse('DoIt:index'))
+        self.client.get(reverse('DoIt:details', kwargs={'pk': 0}))
+        lines = self.scrape()
+        self.assertIn('doit_http_requests_total{view="DoIt:index",method="GET",status="200"} 2', lines)
+        self.assertIn('doit_http_requests_total{view="DoIt:details",method="GET",status="404"} 1', lines)
+        self.assertIn('doit_http_request_duration_seconds_bucket{view="DoIt:index",le="+Inf"} 2', lines)
+        self.assertIn('doit_http_request_duration_seconds_count{view="DoIt:index"} 2', lines)
+        index_bucket = 'doit_http_request_duration_seconds_bucket{view="DoIt:index",'
+        buckets = [line for line in lines if line.startswith(index_bucket)]
+        self.assertEqual(len(buckets), len(metrics.LATENCY_BUCKETS) + 1)
+        counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+        self.assertEqual(counts, sorted(counts))
+        # session, user and lists
+        self.assertIn('doit_db_queries_total{view="DoIt:index"} 6', lines)
+
+    def test_page_cache_hit_ratio(self):
+        """
+        page cache lookups are counted by result, with the share of hits
+        """
+        self.client.force_login(self.user)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        for _ in range(4):
+            self.client.get(reverse('DoIt:index'))
+        lines = self.scrape()
+        self.assertIn('doit_page_cache_requests_total{result="hit"} 3', lines)
+        self.assertIn('doit_page_cache_requests_total{result="miss"} 1', lines)
+        self.assertIn('doit_page_cache_hit_ratio 0.75', lines)
+
+    def test_business_gauges_are_cached(self):
+        """
+        the business gauges come from two aggregates, run again only once they expire from the cache
+        """
+        with self.assertNumQueries(2):
+            lines = self.scrape()
+        for line in ['doit_lists 1', 'doit_tasks 2', 'doit_open_tasks 1', 'doit_users 1', 'doit_signups_last_day 1']:
+            self.assertIn(line, lines)
+        create_list('list2', self.user)
+        with self.assertNumQueries(0):
+            self.assertIn('doit_lists 1', self.scrape())
+
+    def test_token(self):
+        """
+        with DOIT_METRICS_TOKEN set, scrapers must send it as a bearer token, or be logged in as staff
+        """
+        self.assertEqual(Client().get('/metrics').status_code, 403)
+        self.assertEqual(Client().get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(Client().get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(DOIT_METRICS_TOKEN='')
+    def test_no_token(self):
+        """
+        without DOIT_METRICS_TOKEN the metrics are only shown to staff users, never to anyone
+        """
+        self.assertEqual(Client().get('/metrics').status_code, 403)
+        self.assertEqual(Client().get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_registry_threads(self):
+        """
+        counts of many threads add up without locks, including the ones of finished threads
+        """
+        registry = metrics.Registry()
+
+        def count():
+            for _ in range(1000):
+                registry.inc('hits')
+                registry.observe('seconds', (), 0.02)
+
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        registry.inc('hits')
+        totals = registry.collect()
+        self.assertEqual(totals['hits', ()], 8001)
+        self.assertEqual(totals['seconds_count', ()], 8000)
+        self.assertEqual(totals['seconds_bucket', (('le', '0.01'),)], 0)
+        self.assertEqual(totals['seconds_bucket', (('le', '0.025'),)], 8000)
+        # the shards of the finished threads were folded
+        self.assertEqual(registry.collect()['hits', ()], 8001)
+
+
+class UserObjectsTest(TestCase):
+    """
+    lists and tasks are looked up among the ones of the user, with the owner checked by the same query
+    """
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.listest = create_list('list1', self.user)
+        self.task = create_task('task1', self.listest, 5)
+        other = create_user('test2', 'super123*secure')
+        self.other_list = create_list('list2', other)
+        self.other_task = create_task('task2', self.other_list, 5)
+        self.client.force_login(self.user)
+
+    def test_for_user(self):
+        """
+        for_user() returns the objects of the user, and nothing without a query for anonymous users
+        """
+        self.assertEqual(list(List.objects.for_user(self.user)), [self.listest])
+        self.assertEqual(list(Task.objects.for_user(self.user)), [self.task])
+        with self.assertNumQueries(0):
+            self.assertEqual(list(List.objects.for_user(AnonymousUser())), [])
+            self.assertEqual(list(Task.objects.for_user(AnonymousUser())), [])
+
+    def test_other_users_objects_not_found(self):
+        """
+        pages of the lists and tasks of other users return 404, in one query after the session and the user
+        """
+        for name, obj in (('tasks', self.other_list), ('details', self.other_task), ('new_task', self.other_list),
+                          ('task_import', self.other_list), ('list_edit', self.other_list),
+                          ('list_delete', self.other_list), ('task_edit', self.other_task),
+                          ('task_delete', self.other_task)):
+            with self.subTest(name), self.assertNumQueries(3):
+                response = self.client.get(reverse('DoIt:' + name, kwargs={'pk': obj.id}))
+            self.assertEqual(response.status_code, 404)
+
+    def test_other_users_objects_not_changed(self):
+        """
+        posting to the lists and tasks of other users returns 404 and changes nothing
+        """
+        self.assertEqual(self.client.post(reverse('DoIt:task_edit', kwargs={'pk': self.other_task.id}),
+                                          {'name': 'renamed'}).status_code, 404)
+        self.assertEqual(self.client.post(reverse('DoIt:task_delete', kwargs={'pk': self.other_task.id})).status_code,
+                         404)
+        self.assertEqual(self.client.post(reverse('DoIt:list_delete', kwargs={'pk': self.other_list.id})).status_code,
+                         404)
+        self.assertEqual(self.client.post(reverse('DoIt:new_task', kwargs={'pk': self.other_list.id}),
+                                          {'name': 'task3'}).status_code, 404)
+        self.client.post(reverse('DoIt:task_bulk', kwargs={'pk': self.other_list.id}), {'action': 'done',
+                                                                                         'tasks': [self.other_task.id]})
+        self.other_task.refresh_from_db()
+        self.assertEqual(self.other_task.name, 'task2')
+        self.assertIsNone(self.other_task.is_done)
+        self.assertEqual(Task.objects.filter(list=self.other_list).count(), 1)
+
+    def test_own_objects_one_query(self):
+        """
+        the list and task of the user are fetched, owner checked, in one query after the session and the user
+        """
+        for name, obj in (('details', self.task), ('list_delete', self.listest), ('task_delete', self.task)):
+            with self.subTest(name), self.assertNumQueries(3):
+                response = self.client.get(reverse('DoIt:' + name, kwargs={'pk': obj.id}))
+            self.assertEqual(response.status_code, 200)
+
+    def test_not_logged_in(self):
+        """
+        users not logged in get the Access Forbidden page without lookups, and 403 when posting
+        """
+        self.client.logout()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('DoIt:task_edit', kwargs={'pk': self.task.id}))
+        self.assertContains(response, 'Access Forbidden')
+        response = self.client.post(reverse('DoIt:task_edit', kwargs={'pk': self.task.id}), {'name': 'renamed'})
+        self.assertEqual(response.status_code, 403)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.name, 'task1')
+
+
+class JobsTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(MEDIA_ROOT=directory, DOIT_JOB_DELETE_TASKS=3, DOIT_JOB_IMPORT_BYTES=20)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.listest = create_list('list1', self.user)
+        for i in range(3):
+            create_task('task' + str(i), self.listest, 10)
+
+    def run_jobs(self):
+        while True:
+            job = Job.objects.claim()
+            if job is None:
+                break
+            jobs.run(job)
+
+    def test_delete_big_list(self):
+        """
+        lists with DOIT_JOB_DELETE_TASKS tasks or more are deleted by a job, smaller ones right away
+        """
+        response = self.client.post(reverse('DoIt:list_delete', kwargs={'pk': self.listest.id}))
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('DoIt:job', kwargs={'pk': job.id}))
+        self.assertTrue(List.objects.filter(id=self.listest.id).exists())
+        self.assertContains(self.client.get(reverse('DoIt:job', kwargs={'pk': job.id})), 'Queued')
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.total), (Job.DONE, 3, 3))
+        self.assertFalse(Task.objects.exists())
+        self.assertContains(self.client.get(reverse('DoIt:job', kwargs={'pk': job.id})), 'List list1 deleted')
+        small = create_list('list2', self.user)
+        create_task('task', small)
+        self.client.post(reverse('DoIt:list_delete', kwargs={'pk': small.id}))
+        self.assertFalse(List.objects.exists())
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_import(self):
+        """
+        files of DOIT_JOB_IMPORT_BYTES or more are imported by a job, which keeps the rows with errors
+        """
+        upload = SimpleUploadedFile('tasks.csv', b'name,time_it_takes\nimported,5\n,5\nimported2,x\n')
+        response = self.client.post(reverse('DoIt:task_import', kwargs={'pk': self.listest.id}), {'file': upload})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('DoIt:job', kwargs={'pk': job.id}))
+        path = job.file.path
+        self.assertTrue(os.path.exists(path))
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.message, '1 task imported, 2 rows with errors')
+        self.assertEqual([line for line, _ in job.errors], [3, 4])
+        self.assertTrue(Task.objects.filter(name='imported').exists())
+        self.assertFalse(os.path.exists(path))
+        self.assertContains(self.client.get(reverse('DoIt:job', kwargs={'pk': job.id})), 'Line 3')
+
+    def test_import_resumed(self):
+        """
+        an import interrupted after a batch goes on after it when queued again, without inserting it twice
+        """
+        upload = SimpleUploadedFile('tasks.csv', b'name,time_it_takes\nfirst,5\n,5\nsecond,5\n')
+        job = jobs.enqueue(self.user, 'import', upload=upload, list=self.listest.id, format='csv')
+        # what a worker which died after inserting the first batch left
+        create_task('first', self.listest, 5)
+        long_ago = timezone.now() - datetime.timedelta(seconds=settings.DOIT_JOB_TIMEOUT + 1)
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, attempts=1, started_at=long_ago, progress=1,
+                                             arguments=dict(job.arguments, line=2))
+        self.assertEqual(jobs.requeue_lost(), (1, 0))
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), (Job.DONE, '2 tasks imported, 1 row with errors'))
+        self.assertEqual(job.arguments['line'], 4)
+        self.assertEqual(sorted(Task.objects.filter(name__in=['first', 'second']).values_list('name', flat=True)),
+                         ['first', 'second'])
+
+    def test_import_checkpoint(self):
+        """
+        the job is saved with each batch of imported tasks, so a retry knows where to go on
+        """
+        upload = SimpleUploadedFile('tasks.csv', b'name\na\nb\nc\n')
+        job = jobs.enqueue(self.user, 'import', upload=upload, list=self.listest.id, format='csv')
+        saved = []
+        with mock.patch('DoIt.imports.Task.objects.bulk_create', side_effect=lambda batch: saved.append(
+                Job.objects.values_list('progress', 'arguments__line').get(pk=job.pk)) or batch):
+            with mock.patch('DoIt.jobs.import_tasks', lambda *args, **kwargs: import_tasks(
+                    *args, batch_size=2, **kwargs)):
+                self.run_jobs()
+        self.assertEqual(saved, [(0, None), (2, 3)])
+        job.refresh_from_db()
+        self.assertEqual((job.progress, job.arguments['line']), (3, 4))
+
+    def test_export(self):
+        """
+        exports asked with a POST are written by a job and downloaded by their owner only
+        """
+        url = reverse('DoIt:list_export', kwargs={'pk': self.listest.id, 'file_format': 'csv'})
+        job = Job.objects.get(pk=self.client.post(url).url.rsplit('/', 1)[1])
+        download = reverse('DoIt:job_download', kwargs={'pk': job.id})
+        self.assertEqual(self.client.get(download).status_code, 404)
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message, job.progress), (Job.DONE, '3 tasks exported', 3))
+        response = self.client.get(download)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="list1.csv"')
+        self.assertEqual(b''.join(response.streaming_content).decode().count('\n'), 4)
+        self.client.force_login(create_user('test2', 'super123*secure'))
+        self.assertEqual(self.client.get(download).status_code, 404)
+        self.assertEqual(self.client.get(reverse('DoIt:job', kwargs={'pk': job.id})).status_code, 404)
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+    def test_expired_exports(self):
+        """
+        the files of exports finished more than DOIT_EXPORT_KEEP_SECONDS ago are deleted
+        """
+        url = reverse('DoIt:list_export', kwargs={'pk': self.listest.id, 'file_format': 'csv'})
+        old, recent = [Job.objects.get(pk=self.client.post(url).url.rsplit('/', 1)[1]) for _ in range(2)]
+        self.run_jobs()
+        old.refresh_from_db()
+        path = old.file.path
+        Job.objects.filter(pk=old.pk).update(
+            finished_at=timezone.now() - datetime.timedelta(seconds=settings.DOIT_EXPORT_KEEP_SECONDS + 1))
+        self.assertEqual(jobs.delete_expired_exports(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.client.get(reverse('DoIt:job_download', kwargs={'pk': old.id})).status_code, 404)
+        self.assertContains(self.client.get(reverse('DoIt:job', kwargs={'pk': old.id})), 'expired')
+        self.assertEqual(self.client.get(reverse('DoIt:job_download', kwargs={'pk': recent.id})).status_code, 200)
+        self.assertEqual(jobs.delete_expired_exports(), 0)
+
+    def test_api_delete_big_list(self):
+        """
+        the API deletes lists with DOIT_JOB_DELETE_TASKS tasks or more with a job, like the list delete page
+        """
+        response = self.client.delete(reverse('DoIt:api_list', kwargs={'pk': self.listest.id}))
+        job = Job.objects.get()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['job'], job.id)
+        self.assertEqual((job.kind, job.arguments), ('delete_list', {'list': self.listest.id}))
+        self.assertTrue(List.objects.filter(id=self.listest.id).exists())
+        small = create_list('list2', self.user)
+        create_task('task', small)
+        self.assertEqual(self.client.delete(reverse('DoIt:api_list', kwargs={'pk': small.id})).status_code, 204)
+        self.assertFalse(List.objects.filter(id=small.id).exists())
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failed(self):
+        """
+        a job whose list was deleted meanwhile fails with a message
+        """
+        job = jobs.enqueue(self.user, 'export', format='csv', list=self.listest.id)
+        self.listest.delete()
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), (Job.FAILED, 'The list was deleted'))
+
+    def test_claim(self):
+        """
+        jobs are claimed oldest first, each one once
+        """
+        first = jobs.enqueue(self.user, 'delete_list', list=self.listest.id)
+        second = jobs.enqueue(self.user, 'export', format='csv')
+        claimed = Job.objects.claim()
+        self.assertEqual((claimed, claimed.status, claimed.attempts), (first, Job.RUNNING, 1))
+        self.assertEqual(Job.objects.claim(), second)
+        self.assertIsNone(Job.objects.claim())
+
+    def test_requeue_lost(self):
+        """
+        jobs running for too long are queued again, until they were tried DOIT_JOB_ATTEMPTS times
+        """
+        job = jobs.enqueue(self.user, 'export', format='csv')
+        long_ago = timezone.now() - datetime.timedelta(seconds=settings.DOIT_JOB_TIMEOUT + 1)
+        for attempt in range(1, settings.DOIT_JOB_ATTEMPTS + 1):
+            Job.objects.claim()
+            Job.objects.filter(pk=job.pk).update(started_at=long_ago)
+            expected = (1, 0) if attempt < settings.DOIT_JOB_ATTEMPTS else (0, 1)
+            self.assertEqual(jobs.requeue_lost(), expected)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+
+class JobWorkerTest(TransactionTestCase):
+
+    def test_run_jobs(self):
+        """
+        the worker command runs every queued job and exits with --once
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        user = create_user('test', 'super123*secure')
+        lists = [create_list('list' + str(i), user) for i in range(3)]
+        for lst in lists:
+            create_task('task', lst)
+        with override_settings(MEDIA_ROOT=directory):
+            for lst in lists:
+                jobs.enqueue(user, 'export', format='jsonl', list=lst.id)
+            jobs.enqueue(user, 'delete_list', list=lists[0].id)
+            out = StringIO()
+            # one worker, the threads of the in memory test database share its cache and fail instead of waiting
+            call_command('run_jobs', '--once', '--workers', '1', stdout=out)
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {Job.DONE})
+        self.assertEqual(out.getvalue().count(' done in '), 4)
+        self.assertFalse(List.objects.filter(id=lists[0].id).exists())
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Number of queries each view is allowed to run, counting the session and user lookups of the logged in user
+    """
+
+    def setUp(self):
+        self.user = create_user('test', 'super123*secure')
+        self.client.force_login(self.user)
+        self.listest = create_list('list1', self.user)
+        self.tasks = [create_task('task' + str(i), self.listest, i) for i in range(10)]
+
+    def test_index(self):
+        with self.assertNumQueries(3):
+            self.client.get(reverse('DoIt:index'))
+
+    def test_list_tasks(self):
+        with self.assertNumQueries(5):
+            self.client.get(reverse('DoIt:tasks', kwargs={'pk': self.listest.id}))
+
+    def test_task_details(self):
+        with self.assertNumQueries(3):
+            self.client.get(reverse('DoIt:details', kwargs={'pk': self.tasks[0].id}))
+
+    def test_new_list(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('DoIt:new_list'))
+        with self.assertNumQueries(3):
+            self.client.post(reverse('DoIt:new_list'), {'name': 'list2'})
+
+    def test_edit_list(self):
+        url = reverse('DoIt:list_edit', kwargs={'pk': self.listest.id})
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        with self.assertNumQueries(4):
+            self.client.post(url, {'name': 'list2'})
+
+    def test_delete_list(self):
+        url = reverse('DoIt:list_delete', kwargs={'pk': self.listest.id})
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        # session, user, list lookup, the tasks deleted in one chunk and the savepoint around it, then the list
+        with self.assertNumQueries(8):
+            self.client.post(url)
+
+    def test_new_task(self):
+        url = reverse('DoIt:new_task', kwargs={'pk': self.listest.id})
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        # session and user, list lookup, insert, counters update and the savepoint around them
+        with self.assertNumQueries(7):
+            self.client.post(url, {'name': 'task', 'time_it_takes': '5'})
+
+    def test_edit_task(self):
+        url = reverse('DoIt:task_edit', kwargs={'pk': self.tasks[0].id})
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        # the task is read again in the transaction changing it, for its part of the counters
+        with self.assertNumQueries(8):
+            self.client.post(url, {'name': 'task', 'is_done': 'true'})
+
+    def test_delete_task(self):
+        url = reverse('DoIt:task_delete', kwargs={'pk': self.tasks[0].id})
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        # the task is read again in the transaction changing it, for its part of the counters
+        with self.assertNumQueries(8):
+            self.client.post(url)
+
+    def test_sign_up(self):
+        self.client.logout()
+        with self.assertNumQueries(0):
+            self.client.get(reverse('DoIt:signup'))
+
+
+# url name: (url kwargs, max queries, max milliseconds, max response bytes)
+# kwargs values 'list' and 'task' are replaced by the id of the seeded object
+BENCHMARK_BUDGETS = {
+    'index': ({}, 3, 200, 200_000),
+    'tasks': ({'pk': 'list'}, 5, 100, 100_000),
+    'details': ({'pk': 'task'}, 4, 50, 10_000),
+    'task_search': ({}, 3, 100, 50_000),
+    'due_tasks': ({}, 4, 100, 60_000),
+    'new_list': ({}, 2, 50, 10_000),
+    'new_task': ({'pk': 'list'}, 3, 50, 20_000),
+    'task_import': ({'pk': 'list'}, 3, 50, 20_000),
+    'task_bulk': ({'pk': 'list'}, 7, 50, 1_000),
+    'task_move': ({'pk': 'task'}, 9, 50, 1_000),
+    'list_delete': ({'pk': 'list'}, 3, 50, 10_000),
+    'task_delete': ({'pk': 'task'}, 3, 50, 10_000),
+    'list_edit': ({'pk': 'list'}, 3, 50, 20_000),
+    'task_edit': ({'pk': 'task'}, 3, 50, 20_000),
+    # one query per list of the user, 100 of them
+    'export': ({'file_format': 'csv'}, 103, 1000, 5_000_000),
+    'list_export': ({'pk': 'list', 'file_format': 'jsonl'}, 5, 1000, 10_000_000),
+    'job': ({'pk': 'job'}, 3, 50, 10_000),
+    'job_download': ({'pk': 'job'}, 3, 1000, 5_000_000),
+    'signup': ({}, 0, 50, 20_000),
+    'api_lists': ({}, 3, 50, 20_000),
+    'api_list': ({'pk': 'list'}, 3, 50, 1_000),
+    'api_list_tasks': ({'pk': 'list'}, 4, 50, 20_000),
+    'api_task': ({'pk': 'task'}, 3, 50, 1_000),
+}
+# urls measured with a POST of this data, it must be safe to repeat
+BENCHMARK_POSTS = {
+    'task_bulk': {'action': 'important', 'tasks': ['task']},
+    'task_move': {'after': ['next_task']},
+}
+# urls measured with this query string
+BENCHMARK_QUERIES = {
+    'task_search': {'q': 'description 42'},
+}
+
+
+@skipUnless(os.environ.get('DOIT_BENCHMARK'), 'set DOIT_BENCHMARK=1 to run the benchmarks')
+class BenchmarkTest(TestCase):
+    """
+    Seeds a realistic amount of data and checks every DoIt url against the query, time and size budgets above.
+    Volumes can be changed with DOIT_BENCHMARK_LISTS and DOIT_BENCHMARK_TASKS, and the measures are written as
+    JSON to DOIT_BENCHMARK_REPORT (benchmark_report.json by default) to compare releases.
+    """
+    users = 10
+    repeat = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        lists = int(os.environ.get('DOIT_BENCHMARK_LISTS', 1000))
+        tasks = int(os.environ.get('DOIT_BENCHMARK_TASKS', 100000))
+        users = [create_user('user' + str(i), 'super123*secure') for i in range(cls.users)]
+        List.objects.bulk_create([List(name='list' + str(i), user=users[i % cls.users]) for i in range(lists)],
+                                 batch_size=500)
+        list_ids = list(List.objects.order_by('id').values_list('id', flat=True))
+        # the first list gets a fifth of the tasks, the biggest lists have tens of thousands of them
+        big_list = tasks // 5
+        today = timezone.localdate()
+        # one task in a hundred repeats daily, with nothing stored ahead
+        Task.objects.bulk_create((Task(
+            name='task' + str(i),
+            description='description of task ' + str(i),
+            is_done=i % 3 == 0,
+            is_important=i % 7 == 0,
+            time_it_takes=i % 120,
+            end_date=today + datetime.timedelta(days=i % 365 - 180),
+            list_id=list_ids[0] if i < big_list else list_ids[i % len(list_ids)],
+            repeat=Task.DAILY if i % 100 == 0 else '',
+            materialized_until=today + datetime.timedelta(days=i % 365 - 180) if i % 100 == 0 else None,
+        ) for i in range(tasks)), batch_size=1000)
+        List.objects.rebuild_counters()
+        cls.user = users[0]
+        cls.objects = {
+            'list': List.objects.get(id=list_ids[0]),
+            'task': Task.objects.filter(list=list_ids[0]).order_by('id').first(),
+            'next_task': Task.objects.filter(list=list_ids[0]).order_by('id')[1],
+            'job': jobs.run(jobs.enqueue(cls.user, 'export', format='csv', list=list_ids[0])),
+        }
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media)
+        cls.media_override.enable()
+        super(BenchmarkTest, cls).setUpClass()
+        cls.report = {'lists': List.objects.count(), 'tasks': Task.objects.count(), 'urls': {}}
+
+    @classmethod
+    def tearDownClass(cls):
+        path = os.environ.get('DOIT_BENCHMARK_REPORT', 'benchmark_report.json')
+        with open(path, 'w') as report:
+            json.dump(cls.report, report, indent=2, sort_keys=True)
+        super(BenchmarkTest, cls).tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    def measure(self, path, data=None, query=None):
+        timings = []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.client.get(path, query) if data is None else self.client.post(path, data)
+                content = b''.join(response) if response.streaming else response.content
+                timings.append((time.perf_counter() - start) * 1000)
+            self.assertEqual(response.status_code, 200 if data is None else 302)
+        return {
+            'path': path,
+            'queries': len(queries),
+            'milliseconds': round(statistics.median(timings), 2),
+            'bytes': len(content),
+        }
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(BENCHMARK_BUDGETS))
+
+    def test_url_budgets(self):
+        self.client.force_login(self.user)
+        for name, (kwargs, queries, milliseconds, size) in BENCHMARK_BUDGETS.items():
+            kwargs = {key: self.objects[value].id if value in self.objects else value
+                      for key, value in kwargs.items()}
+            with self.subTest(url=name):
+                data = BENCHMARK_POSTS.get(name)
+                if data:
+                    data = {key: [self.objects[value].id if value in self.objects else value for value in values]
+                            if isinstance(values, list) else values for key, values in data.items()}
+                result = self.measure(reverse('DoIt:' + name, kwargs=kwargs), data, BENCHMARK_QUERIES.get(name))
+                self.report['urls'][name] = result
+                self.assertLessEqual(result['queries'], queries)
+                self.assertLessEqual(result['milliseconds'], milliseconds)
+                self.assertLessEqual(result['bytes'], size)
+
+
+@skipUnless(os.environ.get('DOIT_STRESS'), 'set DOIT_STRESS=1 and DOIT_TEST_DATABASE to run the stress test')
+class SQLiteStressTest(TransactionTestCase):
+    """
+    Many users adding tasks at the same time, with the default SQLite settings and with DOIT_SQLITE_PRAGMAS in WAL
+    mode and DOIT_SQLITE_BEGIN, like a server with DOIT_SQLITE_WAL=1.
+    DOIT_STRESS_THREADS and DOIT_STRESS_REQUESTS change the load, the throughput and lock errors of both runs are
+    written as JSON to DOIT_STRESS_REPORT (stress_report.json by default).
+    """
+    # journal_mode is stored in the database file, the other pragmas start from their defaults on each connection
+    default_pragmas = {'journal_mode': 'DELETE'}
+
+    def setUp(self):
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            self.skipTest('needs DOIT_TEST_DATABASE pointing to an SQLite file')
+        self.threads = int(os.environ.get('DOIT_STRESS_THREADS', 8))
+        self.requests = int(os.environ.get('DOIT_STRESS_REQUESTS', 50))
+        self.users = [create_user('user' + str(i), 'super123*secure') for i in range(self.threads)]
+        self.lists = [create_list('list' + str(i), user) for i, user in enumerate(self.users)]
+
+    def hammer(self, pragmas, begin):
+        with override_settings(DOIT_SQLITE_PRAGMAS=pragmas, DOIT_SQLITE_BEGIN=begin):
+            connection.close()
+            results = {'created': 0, 'lock_errors': 0, 'other_errors': 0}
+            lock = threading.Lock()
+            tasks_before = Task.objects.count()
+            connection.close()
+
+            def add_tasks(user, lit):
+                client = Client()
+                client.force_login(user)
+                url = reverse('DoIt:new_task', kwargs={'pk': lit.id})
+                for i in range(self.requests):
+                    try:
+                        response = client.post(url, {'name': 'task' + str(i), 'time_it_takes': '5'})
+                        outcome = 'created' if response.status_code == 302 else 'other_errors'
+                    except OperationalError as error:
+                        outcome = 'lock_errors' if 'locked' in str(error) else 'other_errors'
+                    with lock:
+                        results[outcome] += 1
+                connection.close()
+
+            workers = [threading.Thread(target=add_tasks, args=(user, lit)) for user, lit in zip(self.users, self.lists)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            seconds = time.perf_counter() - start
+            connection.close()
+            results['tasks'] = Task.objects.count() - tasks_before
+            connection.close()
+        results['requests_per_second'] = round(self.threads * self.requests / seconds, 1)
+        return results
+
+    def test_concurrent_new_tasks(self):
+        report = {
+            'threads': self.threads,
+            'requests_per_thread': self.requests,
+            'default': self.hammer(self.default_pragmas, 'DEFERRED'),
+            'tuned': self.hammer(dict(settings.DOIT_SQLITE_PRAGMAS, journal_mode='WAL'), settings.DOIT_SQLITE_BEGIN),
+        }
+        with open(os.environ.get('DOIT_STRESS_REPORT', 'stress_report.json'), 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+        self.assertEqual(report['tuned']['lock_errors'], 0)
+        self.assertEqual(report['tuned']['other_errors'], 0)
+        self.assertEqual(report['tuned']['tasks'], report['tuned']['created'])
+        for lit in List.objects.all():
+            self.assertEqual(lit.open_task_count, lit.task_set.count())
+
+
+@skipUnless(os.environ.get('DOIT_BENCHMARK'), 'set DOIT_BENCHMARK=1 and DOIT_TEST_DATABASE to run the benchmarks')
+class DeleteBenchmarkTest(TransactionTestCase):
+    """
+    Deletes a list of DOIT_BENCHMARK_DELETE_TASKS tasks with the cascade of List.delete() and with
+    List.delete_in_chunks(), while another user keeps adding tasks. The peak Python memory of the delete and the
+    longest time the other user waited for the write lock are written as JSON to DOIT_DELETE_REPORT
+    (delete_report.json by default).
+    """
+
+    def setUp(self):
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            self.skipTest('needs DOIT_TEST_DATABASE pointing to an SQLite file')
+        self.tasks = int(os.environ.get('DOIT_BENCHMARK_DELETE_TASKS', 100000))
+        self.user = create_user('user', 'super123*secure')
+        self.other_list = create_list('other', create_user('other', 'super123*secure'))
+
+    def measure(self, delete):
+        lit = create_list('big', self.user)
+        Task.objects.bulk_create((Task(name='task' + str(i), description='description of task ' + str(i),
+                                       time_it_takes=i % 120, list=lit) for i in range(self.tasks)), batch_size=1000)
+        connection.close()
+        waits = []
+        errors = []
+        deleting = threading.Event()
+        done = threading.Event()
+
+        def add_tasks():
+            deleting.wait()
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    create_task('task', self.other_list, 5)
+                except OperationalError as error:
+                    errors.append(str(error))
+                waits.append((time.perf_counter() - start) * 1000)
+                time.sleep(0.005)
+            connection.close()
+
+        writer = threading.Thread(target=add_tasks)
+        writer.start()
+        tracemalloc.start()
+        start = time.perf_counter()
+        deleting.set()
+        delete(lit)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        done.set()
+        writer.join()
+        self.assertFalse(Task.objects.filter(list=lit.id).exists())
+        return {
+            'seconds': round(seconds, 2),
+            'peak_memory_bytes': peak,
+            'writes_meanwhile': len(waits),
+            'longest_write_wait_ms': round(max(waits), 1),
+            'lock_errors': len(errors),
+        }
+
+    def test_delete_big_list(self):
+        report = {
+            'tasks': self.tasks,
+            'chunk_size': settings.DOIT_DELETE_CHUNK_SIZE,
+            'cascade': self.measure(lambda lit: lit.delete()),
+            'chunked': self.measure(lambda lit: lit.delete_in_chunks()),
+        }
+        with open(os.environ.get('DOIT_DELETE_REPORT', 'delete_report.json'), 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+        self.assertEqual(report['chunked']['lock_errors'], 0)
+        self.assertLess(report['chunked']['longest_write_wait_ms'], report['cascade']['longest_write_wait_ms'])
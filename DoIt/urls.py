@@ -1,18 +1,31 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'DoIt'
 urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('tasks/<int:pk>', views.ListTasksView.as_view(), name='tasks'),
     path('task/<int:pk>', views.DetailsTaskView.as_view(), name='details'),
+    path('search/', views.TaskSearchView.as_view(), name='task_search'),
+    path('due/', views.DueTasksView.as_view(), name='due_tasks'),
     path('new-list/', views.NewListView.as_view(), name='new_list'),
     path('new-task/<int:pk>', views.NewTaskView.as_view(), name='new_task'),
+    path('import-tasks/<int:pk>', views.TaskImportView.as_view(), name='task_import'),
+    path('bulk-tasks/<int:pk>', views.TaskBulkActionView.as_view(), name='task_bulk'),
+    path('move-task/<int:pk>', views.TaskMoveView.as_view(), name='task_move'),
     path('delete-list/<int:pk>', views.ListDeleteView.as_view(), name='list_delete'),
     path('delete-task/<int:pk>', views.TaskDeleteView.as_view(), name='task_delete'),
     path('edit-list/<int:pk>', views.ListEditView.as_view(), name='list_edit'),
     path('edit-task/<int:pk>', views.TaskEditView.as_view(), name='task_edit'),
-    path('sign-up/', views.NewUserView.as_view(), name='signup')
+    path('export/<str:file_format>', views.ExportView.as_view(), name='export'),
+    path('export-list/<int:pk>/<str:file_format>', views.ListExportView.as_view(), name='list_export'),
+    path('job/<int:pk>', views.JobView.as_view(), name='job'),
+    path('job/<int:pk>/download', views.JobDownloadView.as_view(), name='job_download'),
+    path('sign-up/', views.NewUserView.as_view(), name='signup'),
+    path('api/lists', api.ApiListsView.as_view(), name='api_lists'),
+    path('api/lists/<int:pk>', api.ApiListView.as_view(), name='api_list'),
+    path('api/lists/<int:pk>/tasks', api.ApiListTasksView.as_view(), name='api_list_tasks'),
+    path('api/tasks/<int:pk>', api.ApiTaskView.as_view(), name='api_task'),
 
 ]
@@ -1,27 +1,69 @@
 # Create your views here.
+import datetime
 
-from django import forms
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.contrib.messages.views import SuccessMessageMixin, messages
-from django.http import Http404
-from django.shortcuts import get_object_or_404, get_list_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.template.defaultfilters import pluralize
+from django.template.response import TemplateResponse
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.text import slugify
 from django.views import generic
 
-from DoIt.models import List, Task
-
-
-class IndexView(generic.ListView):
+from DoIt.async_views import AsyncDetailView, AsyncListView, AsyncViewMixin, aget_object_or_404, aload_user
+from DoIt.exports import EXPORTERS
+from DoIt.forms import ListForm, TaskBulkActionForm, TaskFilterForm, TaskForm, TaskImportForm, TaskMoveForm
+from DoIt.imports import import_tasks
+from DoIt.jobs import delete_or_enqueue, enqueue, enqueue_once
+from DoIt.models import Job, List, Task
+from DoIt.page_cache import (AsyncConditionalGetMixin, AsyncVersionedPageCacheMixin, get_versions,
+                             list_version_key, user_lists_version_key)
+from DoIt.pagination import AsyncKeysetPaginationMixin, KeysetPaginationMixin, get_page_size
+from DoIt.recurrence import upcoming
+from DoIt.search import search_tasks
+
+
+class UserObjectsMixin:
+    """
+    Views of a list or task of the user. Objects are looked up in the
+    for_user() querysets, so the owner is checked by the query fetching them
+    and the objects of other users are not found. Users not logged in get the
+    Access Forbidden page for GET requests and 403 for the others, without
+    any lookup.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch(request, *args, **kwargs)
+        if not request.user.is_authenticated:
+            return self.forbidden(request)
+        return super(UserObjectsMixin, self).dispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        if not (await aload_user(request)).is_authenticated:
+            return self.forbidden(request)
+        return await super(UserObjectsMixin, self).dispatch(request, *args, **kwargs)
+
+    def forbidden(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            raise PermissionDenied
+        return TemplateResponse(request, 'base_app.html')
+
+
+class IndexView(AsyncVersionedPageCacheMixin, AsyncListView):
     template_name = 'DoIt/index.html'
     context_object_name = 'list_of_lists'
 
     def get_queryset(self):
-        if self.request.user.is_authenticated:
-            try:
-                return get_list_or_404(List, user=self.request.user)
-            except Http404:
-                return []
+        return List.objects.for_user(self.request.user)
 
     def get_context_data(self, *, object_list=None, **kwargs):
         if self.request.user.is_authenticated:
@@ -30,27 +72,172 @@ class IndexView(generic.ListView):
             return context
 
 
-class ListTasksView(generic.ListView):
+class ListTasksView(UserObjectsMixin, AsyncConditionalGetMixin, AsyncVersionedPageCacheMixin,
+                    AsyncKeysetPaginationMixin, AsyncListView):
     template_name = 'DoIt/list_tasks.html'
     context_object_name = 'list_of_task'
+    paginate_by = settings.DOIT_TASKS_PER_PAGE
+    max_paginate_by = settings.DOIT_TASKS_MAX_PER_PAGE
+    keyset_ordering = ('-is_important', 'id')
+    task_list = None
+
+    def get_version_keys(self):
+        # the user's lists are the choices to move tasks to
+        return [list_version_key(self.kwargs['pk']), user_lists_version_key(self.request.user.pk)]
+
+    async def aget_task_list(self):
+        """
+        The list of the user with the numbers of its tasks, read from its
+        stored counters, in one query that also answers 404 for lists of
+        other users.
+        """
+        if self.task_list is None:
+            self.task_list = await aget_object_or_404(
+                List.objects.for_user(self.request.user).with_important_count(), pk=self.kwargs['pk'])
+        return self.task_list
+
+    async def aget_last_modified(self):
+        # a plain lookup of the list row, revalidating doesn't count anything
+        task_list = await aget_object_or_404(List.objects.for_user(self.request.user).only('changed_at'),
+                                             pk=self.kwargs['pk'])
+        return task_list.changed_at
+
+    def get_etag_parts(self):
+        # the other lists of the user aren't covered by changed_at
+        return get_versions([user_lists_version_key(self.request.user.pk)])
+
+    @cached_property
+    def filter_form(self):
+        return TaskFilterForm(self.request.GET)
+
+    def get_keyset_ordering(self):
+        return self.filter_form.ordering()
 
     def get_queryset(self):
-        try:
-            return get_list_or_404(Task.objects.order_by('-is_important'), list=self.kwargs.get('pk'))
-        except Http404:
-            return []
+        tasks = Task.objects.for_user(self.request.user).filter(list=self.kwargs['pk']).select_related('list')
+        return self.filter_form.filter(tasks)
+
+    async def aload(self):
+        task_list = await self.aget_task_list()
+        await super(ListTasksView, self).aload()
+        self.task_stats = task_list.stats()
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super(ListTasksView, self).get_context_data(**kwargs)
+        context['task_stats'] = self.task_stats
+        context['time_finish_list'] = context['task_stats']['remaining_time']
+        context['filter_form'] = self.filter_form
+        # the filters and page size, for the pagination links to keep them
+        query = self.request.GET.copy()
+        query.pop(self.cursor_kwarg, None)
+        query[self.page_size_kwarg] = context['paginator'].per_page
+        context['filter_query'] = query.urlencode()
+        context['bulk_form'] = TaskBulkActionForm(self.request.user)
+        # the tasks can be dragged to another place when they are shown in the order of the user
+        context['manual_order'] = self.get_keyset_ordering()[0] == 'position'
+        return context
+
+
+class DueTasksView(KeysetPaginationMixin, generic.ListView):
+    """
+    The tasks not done of all the lists of the user that are overdue or due
+    in the next `?days=` days, soonest first.
+    """
+    template_name = 'DoIt/due_tasks.html'
+    context_object_name = 'list_of_task'
+    paginate_by = settings.DOIT_TASKS_PER_PAGE
+    max_paginate_by = settings.DOIT_TASKS_MAX_PER_PAGE
+    keyset_ordering = ('end_date', 'id')
+
+    @cached_property
+    def days(self):
+        return get_page_size(self.request, settings.DOIT_DUE_DAYS, settings.DOIT_DUE_MAX_DAYS, 'days')
+
+    def get_queryset(self):
+        today = timezone.localdate()
+        return Task.objects.due(self.request.user, today + datetime.timedelta(days=self.days),
+                                today).select_related('list')
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super(DueTasksView, self).get_context_data(**kwargs)
+        context['days'] = self.days
+        context['today'] = timezone.localdate()
         tasks = context['list_of_task']
-        total = 0
-        for task in tasks:
-            if not task.is_done:
-                total = total + int(task.time_it_takes or 0)
-        context['time_finish_list'] = total
+        context['overdue_count'] = tasks[0].overdue_count if tasks else 0
+        context['due_soon_count'] = tasks[0].due_soon_count if tasks else 0
+        if not self.request.GET.get(self.cursor_kwarg):
+            # occurrences of the repeating tasks not stored as tasks yet, on the first page only
+            context['upcoming'] = upcoming(Task.objects.for_user(self.request.user), context['today'],
+                                           context['today'] + datetime.timedelta(days=self.days),
+                                           self.get_paginate_by(self.object_list))
+        return context
+
+
+class TaskSearchView(KeysetPaginationMixin, generic.ListView):
+    template_name = 'DoIt/task_search.html'
+    context_object_name = 'results'
+    paginate_by = settings.DOIT_TASKS_PER_PAGE
+    max_paginate_by = settings.DOIT_TASKS_MAX_PER_PAGE
+    keyset_ordering = ('search_rank', 'id')
+
+    def get_queryset(self):
+        tasks = Task.objects.for_user(self.request.user).select_related('list')
+        return search_tasks(tasks, self.request.GET.get('q', ''))
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super(TaskSearchView, self).get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
         return context
 
 
+class ExportView(AsyncViewMixin, generic.View):
+    """
+    Streams the tasks of all the lists of the user, rows are fetched in chunks
+    so memory use doesn't depend on the number of tasks. Under ASGI the rows
+    are read with the async ORM, WSGI servers can only stream sync iterators.
+    A POST queues the export as a background job instead.
+    """
+
+    async def aget_queryset(self):
+        return List.objects.for_user(self.request.user)
+
+    def get_filename(self):
+        return 'tasks'
+
+    async def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+        try:
+            exporter, async_exporter, content_type = EXPORTERS[kwargs['file_format']]
+        except KeyError:
+            raise Http404('Unknown export format')
+        if isinstance(request, ASGIRequest):
+            exporter = async_exporter
+        response = StreamingHttpResponse(exporter(await self.aget_queryset()), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (self.get_filename(),
+                                                                             kwargs['file_format'])
+        return response
+
+    async def post(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+        if kwargs['file_format'] not in EXPORTERS:
+            raise Http404('Unknown export format')
+        await self.aget_queryset()
+        job = await sync_to_async(enqueue)(request.user, 'export', format=kwargs['file_format'],
+                                           list=kwargs.get('pk'))
+        return redirect('DoIt:job', pk=job.id)
+
+
+class ListExportView(ExportView):
+    async def aget_queryset(self):
+        self.task_list = await aget_object_or_404(List.objects.for_user(self.request.user), id=self.kwargs['pk'])
+        return List.objects.filter(id=self.task_list.id)
+
+    def get_filename(self):
+        return slugify(self.task_list.name) or 'list'
+
+
 class NewListView(SuccessMessageMixin, generic.CreateView):
     model = List
     fields = ('name',)
@@ -69,13 +256,16 @@ class NewListView(SuccessMessageMixin, generic.CreateView):
         return super(NewListView, self).form_valid(form)
 
 
-class ListEditView(SuccessMessageMixin, generic.UpdateView):
+class ListEditView(UserObjectsMixin, SuccessMessageMixin, generic.UpdateView):
     model = List
-    fields = '__all__'
+    form_class = ListForm
+
+    def get_queryset(self):
+        return List.objects.for_user(self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super(ListEditView, self).get_context_data(**kwargs)
-        context['page_title'] = 'Edit List ' + get_object_or_404(List, id=self.kwargs['pk']).name
+        context['page_title'] = 'Edit List ' + self.object.name
         return context
 
     def get_success_url(self):
@@ -83,26 +273,26 @@ class ListEditView(SuccessMessageMixin, generic.UpdateView):
         return reverse_lazy('DoIt:index')
 
 
-class ListDeleteView(generic.DeleteView):
+class ListDeleteView(UserObjectsMixin, generic.DeleteView):
     model = List
 
-    def get_success_url(self):
-        messages.info(self.request,
-                      'List ' + get_object_or_404(List, id=self.kwargs['pk']).name + ' deleted successfully')
-        return reverse_lazy('DoIt:index')
+    def get_queryset(self):
+        return List.objects.for_user(self.request.user)
 
+    def form_valid(self, form):
+        # big lists are deleted by a background job
+        job = delete_or_enqueue(self.request.user, self.object)
+        if job is None:
+            return redirect(self.get_success_url())
+        messages.info(self.request, 'List ' + self.object.name + ' is being deleted')
+        return redirect('DoIt:job', pk=job.id)
 
-class TaskForm(forms.ModelForm):
-    class Meta:
-        model = Task
-        fields = ('name', 'description', 'is_done', 'start_date', 'end_date', 'time_it_takes', 'is_important')
-        widgets = {
-            'start_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
-            'end_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
-        }
+    def get_success_url(self):
+        messages.info(self.request, 'List ' + self.object.name + ' deleted successfully')
+        return reverse_lazy('DoIt:index')
 
 
-class NewTaskView(SuccessMessageMixin, generic.CreateView):
+class NewTaskView(UserObjectsMixin, SuccessMessageMixin, generic.CreateView):
     model = Task
     form_class = TaskForm
 
@@ -112,49 +302,149 @@ class NewTaskView(SuccessMessageMixin, generic.CreateView):
             'pk': self.kwargs['pk']
         })
 
+    @cached_property
+    def task_list(self):
+        # the position to add the task at is read with the list
+        lists = List.objects.for_user(self.request.user).with_last_position()
+        return get_object_or_404(lists, id=self.kwargs['pk'])
+
     def form_valid(self, form):
-        lst = get_object_or_404(List, id=self.kwargs['pk'])
-        form.instance.list = lst
+        form.instance.list = self.task_list
         return super(NewTaskView, self).form_valid(form)
 
     def get_context_data(self, **kwargs):
         context = super(NewTaskView, self).get_context_data(**kwargs)
-        context['list'] = get_object_or_404(List, id=self.kwargs['pk'])
+        context['list'] = self.task_list
         context['page_title'] = 'Adding a new task to the list'
         return context
 
 
-class DetailsTaskView(generic.DetailView):
-    model = Task
+class TaskBulkActionView(UserObjectsMixin, generic.View):
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        form = TaskBulkActionForm(request.user, request.POST)
+        if form.is_valid():
+            changed = form.apply(Task.objects.for_user(request.user).filter(list=kwargs['pk']))
+            messages.info(request, '%s: %d task%s' % (dict(form.ACTIONS)[form.cleaned_data['action']],
+                                                      changed, pluralize(changed)))
+        else:
+            for errors in form.errors.values():
+                messages.error(request, ' '.join(errors))
+        return redirect('DoIt:tasks', pk=kwargs['pk'])
+
+
+class TaskMoveView(UserObjectsMixin, generic.detail.SingleObjectMixin, generic.View):
+    """
+    Moves a task where it was dropped in the order of its list, with a
+    single-row update. The list is rebalanced in the background when the
+    room left between positions gets small.
+    """
+    http_method_names = ['post']
+
+    def get_queryset(self):
+        return Task.objects.for_user(self.request.user).select_related('list')
+
+    def post(self, request, *args, **kwargs):
+        task = self.get_object()
+        form = TaskMoveForm(task, request.POST)
+        if form.is_valid():
+            if task.move(form.cleaned_data['after'], form.cleaned_data['before']):
+                enqueue_once(request.user, 'rebalance_list', list=task.list_id)
+        else:
+            for errors in form.errors.values():
+                messages.error(request, ' '.join(errors))
+        return redirect(reverse_lazy('DoIt:tasks', kwargs={'pk': task.list_id}) + '?sort=position')
+
+
+class TaskImportView(UserObjectsMixin, generic.FormView):
+    form_class = TaskImportForm
+    template_name = 'DoIt/task_import.html'
+
+    @cached_property
+    def task_list(self):
+        return get_object_or_404(List.objects.for_user(self.request.user), id=self.kwargs['pk'])
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        if upload.size >= settings.DOIT_JOB_IMPORT_BYTES:
+            job = enqueue(self.request.user, 'import', upload=upload, list=self.task_list.id,
+                          format=form.cleaned_data['format'])
+            messages.info(self.request, 'The file is being imported')
+            return redirect('DoIt:job', pk=job.id)
+        result = import_tasks(self.task_list, upload.file, form.cleaned_data['format'])
+        if result.errors:
+            return self.render_to_response(self.get_context_data(form=form, result=result))
+        messages.info(self.request, str(result).capitalize())
+        return redirect('DoIt:tasks', pk=self.task_list.id)
+
+    def get_context_data(self, **kwargs):
+        context = super(TaskImportView, self).get_context_data(**kwargs)
+        context['list'] = self.task_list
+        context['page_title'] = 'Importing tasks into the list'
+        return context
+
+
+class DetailsTaskView(UserObjectsMixin, AsyncConditionalGetMixin, AsyncDetailView):
     template_name = 'DoIt/task_details.html'
 
+    def get_queryset(self):
+        return Task.objects.for_user(self.request.user).select_related('list')
 
-class TaskEditView(SuccessMessageMixin, generic.UpdateView):
-    model = Task
+    async def aget_last_modified(self):
+        changes = await Task.objects.for_user(self.request.user).filter(pk=self.kwargs['pk']).values_list(
+            'updated_at', 'list__updated_at').afirst()
+        return max(changes) if changes else None
+
+
+class TaskEditView(UserObjectsMixin, SuccessMessageMixin, generic.UpdateView):
     form_class = TaskForm
 
+    def get_queryset(self):
+        return Task.objects.for_user(self.request.user).select_related('list')
+
     def get_success_url(self):
         messages.info(self.request, 'Task ' + self.request.POST['name'] + ' edited')
-        return reverse_lazy('DoIt:tasks', kwargs={'pk': get_object_or_404(Task, id=self.kwargs['pk']).list.id})
+        return reverse_lazy('DoIt:tasks', kwargs={'pk': self.object.list_id})
 
     def get_context_data(self, **kwargs):
         context = super(TaskEditView, self).get_context_data(**kwargs)
-        context['list'] = get_object_or_404(List, id=get_object_or_404(Task, id=self.kwargs['pk']).list.id)
+        context['list'] = self.object.list
         context['page_title'] = 'Editing task of'
         return context
 
 
-class TaskDeleteView(generic.DeleteView):
-    model = Task
+class TaskDeleteView(UserObjectsMixin, generic.DeleteView):
+    def get_queryset(self):
+        return Task.objects.for_user(self.request.user).select_related('list')
 
     def get_success_url(self):
-        task = get_object_or_404(Task, id=self.kwargs['pk'])
-        messages.info(self.request, 'Task ' + task.name + ' deleted successfully')
+        messages.info(self.request, 'Task ' + self.object.name + ' deleted successfully')
         return reverse_lazy('DoIt:tasks', kwargs={
-            'pk': task.list.id
+            'pk': self.object.list_id
         })
 
 
+class JobView(UserObjectsMixin, generic.DetailView):
+    template_name = 'DoIt/job.html'
+
+    def get_queryset(self):
+        return Job.objects.for_user(self.request.user)
+
+
+class JobDownloadView(UserObjectsMixin, generic.detail.SingleObjectMixin, generic.View):
+    """
+    The file written by a finished export job.
+    """
+
+    def get_queryset(self):
+        return Job.objects.for_user(self.request.user).filter(kind='export', status=Job.DONE).exclude(file='')
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.arguments['filename'])
+
+
 class NewUserForm(UserCreationForm):
     class Meta:
         model = User
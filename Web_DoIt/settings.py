@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'DoIt.profiling.ProfilingMiddleware',
+    'DoIt.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'DoIt.routers.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -75,11 +79,69 @@ WSGI_APPLICATION = 'Web_DoIt.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'DoIt.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Pragmas run on every new SQLite connection, see DoIt.sqlite. busy_timeout is
+# in milliseconds, mmap_size in bytes and a negative cache_size in KiB.
+# journal_mode is stored in the database file instead, so WAL is only turned
+# on with DOIT_SQLITE_WAL=1, which servers should set: the db.sqlite3 checked
+# in for development keeps its rollback journal and no -wal and -shm files
+# are left next to it
+DOIT_SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32 * 1024,
+    'temp_store': 'MEMORY',
+}
+if os.environ.get('DOIT_SQLITE_WAL'):
+    DOIT_SQLITE_PRAGMAS['journal_mode'] = 'WAL'
+
+# How DoIt.backends.sqlite3 begins transactions: DEFERRED, IMMEDIATE or EXCLUSIVE
+DOIT_SQLITE_BEGIN = 'IMMEDIATE'
+
+# DOIT_TEST_DATABASE=path runs the tests on that SQLite file instead of in
+# memory, the concurrency stress test needs it
+if os.environ.get('DOIT_TEST_DATABASE'):
+    DATABASES['default']['TEST'] = {'NAME': os.environ['DOIT_TEST_DATABASE']}
+
+# Aliases of read replicas of the default database, read by the DoIt pages
+# of GET requests, see DoIt.routers. A user reads from the default database
+# for DOIT_READ_YOUR_WRITES_SECONDS after a write, and a replica that can't be
+# connected to is skipped for DOIT_REPLICA_RETRY_SECONDS
+DATABASE_ROUTERS = ['DoIt.routers.ReplicaRouter']
+DOIT_DB_REPLICAS = []
+DOIT_READ_YOUR_WRITES_SECONDS = 10
+DOIT_REPLICA_RETRY_SECONDS = 30
+
+# DOIT_SQLITE_REPLICAS=2 adds read only SQLite replicas db-replica1.sqlite3 and
+# db-replica2.sqlite3, copied from db.sqlite3 by `manage.py sync_replicas`
+for number in range(1, int(os.environ.get('DOIT_SQLITE_REPLICAS', 0)) + 1):
+    DATABASES['replica%d' % number] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:%s?mode=ro' % (BASE_DIR / ('db-replica%d.sqlite3' % number)),
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DOIT_DB_REPLICAS.append('replica%d' % number)
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache used for the index and list tasks pages, and how long a page is kept in
+# seconds. Pages are also dropped as soon as the lists or tasks they show change
+DOIT_PAGE_CACHE = 'default'
+DOIT_PAGE_CACHE_TIMEOUT = 300
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -129,3 +191,65 @@ LOGOUT_REDIRECT_URL = '/login'
 # development email are saved in the directory "sent_emails"
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = str(BASE_DIR.joinpath('sent_emails'))
+
+# Tasks shown per page on the list tasks page, clients may ask for a different
+# amount with ?page_size= up to the maximum
+DOIT_TASKS_PER_PAGE = 50
+DOIT_TASKS_MAX_PER_PAGE = 500
+
+# Request profiling, see DoIt.profiling. DOIT_PROFILING=1 adds a Server-Timing
+# header to every response and appends a record of every request, with its
+# DOIT_PROFILING_SLOW_QUERIES slowest statements, to DOIT_PROFILING_LOG, which
+# `manage.py profile_report` summarizes
+DOIT_PROFILING = os.environ.get('DOIT_PROFILING') == '1'
+DOIT_PROFILING_LOG = os.environ.get('DOIT_PROFILING_LOG', str(BASE_DIR / 'profiling.jsonl'))
+DOIT_PROFILING_SLOW_QUERIES = 5
+
+# Prometheus metrics at /metrics, see DoIt.metrics. The business gauges are
+# computed again every DOIT_METRICS_GAUGES_SECONDS at most. Scrapers must send
+# DOIT_METRICS_TOKEN as a bearer token, without one set only staff users
+# logged in see the metrics
+DOIT_METRICS = True
+DOIT_METRICS_GAUGES_SECONDS = 60
+DOIT_METRICS_TOKEN = os.environ.get('DOIT_METRICS_TOKEN', '')
+
+# Default and maximum number of days ahead shown by the due tasks page
+DOIT_DUE_DAYS = 7
+DOIT_DUE_MAX_DAYS = 365
+
+# Background jobs, see DoIt.jobs. Deleting a list of DOIT_JOB_DELETE_TASKS tasks
+# or more, importing a file of DOIT_JOB_IMPORT_BYTES or more and exports asked
+# for with a POST are queued and run by `manage.py run_jobs` in
+# DOIT_JOB_WORKERS threads. A job running for more than DOIT_JOB_TIMEOUT
+# seconds lost its worker and is queued again, up to DOIT_JOB_ATTEMPTS times.
+# The files of the exports are deleted DOIT_EXPORT_KEEP_SECONDS after they
+# were written
+DOIT_JOB_WORKERS = 2
+DOIT_JOB_DELETE_TASKS = 5000
+DOIT_JOB_IMPORT_BYTES = 1024 * 1024
+DOIT_JOB_TIMEOUT = 3600
+DOIT_JOB_ATTEMPTS = 3
+DOIT_EXPORT_KEEP_SECONDS = 24 * 3600
+
+# Tasks deleted per transaction by List.delete_in_chunks(), which the list
+# deletion jobs use so other writers wait for one chunk at most. On SQLite
+# each commit also merges the search index, so smaller chunks shorten the
+# waits but make the whole delete slower
+DOIT_DELETE_CHUNK_SIZE = 5000
+
+# Occurrences of the repeating tasks stored ahead by `manage.py
+# materialize_occurrences`, in days. Later ones are computed when a page shows
+# them, so a thousand daily tasks only ever store a few weeks of occurrences
+DOIT_RECURRENCE_DAYS = 14
+
+# Sparse positions of the order of the tasks chosen by the user. New tasks are
+# added DOIT_POSITION_GAP after the last one and a moved task takes the middle
+# of its neighbours, so a list is rebalanced in the background once a move
+# leaves less than DOIT_POSITION_MIN_GAP on a side, after about ten moves to
+# the same spot, and right away when there is no room left at all
+DOIT_POSITION_GAP = 2 ** 16
+DOIT_POSITION_MIN_GAP = 64
+
+# Files of the jobs, uploaded imports and written exports. They are not served
+# as media, exports are downloaded from the job page by their owner only
+MEDIA_ROOT = BASE_DIR / 'media'
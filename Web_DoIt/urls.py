@@ -16,8 +16,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from DoIt.metrics import MetricsView
+
 urlpatterns = [
     path('DoIt/', include('DoIt.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('', include('django.contrib.auth.urls')),
 ]